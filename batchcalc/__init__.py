@@ -1,6 +1,5 @@
 
 __version__ = "0.3.1"
 
-from . import controller
-from . import dialogs
-from . import model
+# the GUI modules (zbc, controller, dialogs) are not imported here so that
+# the calculation core (calculator, model, db) can be used without wxPython
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+from __future__ import print_function, unicode_literals
+
+import datetime
+import gzip
+import io
+import json
+import os
+import tarfile
+import tempfile
+
+from sqlalchemy.orm import Session
+
+from batchcalc import migrations
+from batchcalc.db import get_engine
+from batchcalc.model import Base
+
+__version__ = "0.3.1"
+
+
+# identifier and version of the archive layout
+ARCHIVE_FORMAT = "zbc-archive"
+ARCHIVE_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+
+def get_tables():
+    '''
+    Return the tables of the model ordered so that the referenced tables come
+    before the tables referencing them.
+    '''
+
+    return Base.metadata.sorted_tables
+
+
+def get_member_name(table):
+    return "{0:s}.jsonl.gz".format(table.name)
+
+
+def dump_table(session, table, fobj, chunk_size=1000):
+    '''
+    Write the rows of the `table` to the binary file `fobj` as JSON lines,
+    the rows are fetched `chunk_size` at a time. Return the number of rows.
+    '''
+
+    columns = [c.name for c in table.columns]
+    query = session.query(*table.columns).order_by(*table.primary_key.columns)
+
+    nrows = 0
+    for row in query.yield_per(chunk_size):
+        line = json.dumps(dict(zip(columns, row)), sort_keys=True) + "\n"
+        fobj.write(line.encode("utf-8"))
+        nrows += 1
+    return nrows
+
+
+def export_database(session, path, chunk_size=1000):
+    '''
+    Write all the tables of the database to the archive at `path` and return
+    its manifest.
+
+    The archive is a tar file with a gzipped JSON lines file per table and
+    the `manifest.json` with the archive version, the schema version of the
+    database and the number of rows of each table. The rows are streamed
+    through a temporary file, so the memory used does not depend on the size
+    of the database.
+
+    The rows are read in a separate read-only session on the database of
+    `session`, so the changes not yet committed in `session` are neither
+    exported nor committed, and the database is never written to.
+    '''
+
+    session = Session(bind=session.get_bind())
+    try:
+        return write_archive(session, path, chunk_size)
+    finally:
+        session.close()
+
+
+def write_archive(session, path, chunk_size=1000):
+    '''
+    Write the archive at `path` reading the rows with `session`, see
+    `export_database`.
+    '''
+
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "schema_version": migrations.read_schema_version(session.connection()),
+        "created": datetime.datetime.now().isoformat(),
+        "tables": [],
+    }
+
+    with tarfile.open(path, "w") as tar:
+        for table in get_tables():
+            with tempfile.TemporaryFile() as tmp:
+                gz = gzip.GzipFile(filename="", mode="wb", fileobj=tmp)
+                try:
+                    nrows = dump_table(session, table, gz, chunk_size)
+                finally:
+                    gz.close()
+                info = tarfile.TarInfo(get_member_name(table))
+                info.size = tmp.tell()
+                tmp.seek(0)
+                tar.addfile(info, tmp)
+            manifest["tables"].append({"name": table.name, "rows": nrows})
+
+        data = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+        info = tarfile.TarInfo(MANIFEST)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+    return manifest
+
+
+def read_manifest(tar):
+    '''
+    Return the manifest of the open archive `tar` after checking that it can
+    be imported.
+    '''
+
+    try:
+        manifest = json.loads(tar.extractfile(MANIFEST).read().decode("utf-8"))
+    except KeyError:
+        raise ValueError("not a database archive, {0:s} is missing".format(MANIFEST))
+
+    if manifest.get("format") != ARCHIVE_FORMAT:
+        raise ValueError("not a database archive: {0}".format(manifest.get("format")))
+    if manifest.get("version", 0) > ARCHIVE_VERSION:
+        raise ValueError("archive version {0} is newer than the supported "
+                         "version {1}".format(manifest["version"], ARCHIVE_VERSION))
+    if manifest.get("schema_version", 0) > migrations.get_latest_version():
+        raise ValueError("archive was exported from a newer database schema "
+                         "version {0}".format(manifest["schema_version"]))
+    return manifest
+
+
+def iter_rows(tar, table):
+    '''
+    Generator yielding the rows of the `table` from the open archive `tar` as
+    dictionaries.
+    '''
+
+    gz = gzip.GzipFile(mode="rb", fileobj=tar.extractfile(get_member_name(table)))
+    try:
+        for line in gz:
+            yield json.loads(line.decode("utf-8"))
+    finally:
+        gz.close()
+
+
+def import_database(path, dbpath, chunk_size=1000):
+    '''
+    Create a new database at `dbpath` with the contents of the archive at
+    `path` written by `export_database`, the records keep their ids. All the
+    rows are inserted in a single transaction with `chunk_size` rows per
+    executemany, on errors no database is left behind. Return a dictionary
+    with the number of rows per table.
+    '''
+
+    if os.path.exists(dbpath):
+        raise ValueError("database already exists: {0}".format(dbpath))
+
+    counts = {}
+    engine = get_engine(dbpath)
+    try:
+        with tarfile.open(path, "r") as tar:
+            manifest = read_manifest(tar)
+            archived = set(t["name"] for t in manifest["tables"])
+
+            Base.metadata.create_all(engine)
+            migrations.upgrade(engine)
+
+            with engine.begin() as conn:
+                for table in get_tables():
+                    if table.name not in archived:
+                        continue
+                    columns = [c.name for c in table.columns]
+                    counts[table.name] = 0
+                    chunk = []
+                    for row in iter_rows(tar, table):
+                        chunk.append(dict((c, row.get(c)) for c in columns))
+                        if len(chunk) >= chunk_size:
+                            conn.execute(table.insert(), chunk)
+                            counts[table.name] += len(chunk)
+                            chunk = []
+                    if chunk:
+                        conn.execute(table.insert(), chunk)
+                        counts[table.name] += len(chunk)
+    except Exception:
+        engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(dbpath + suffix):
+                os.remove(dbpath + suffix)
+        raise
+    engine.dispose()
+
+    return counts
@@ -31,12 +31,15 @@ from __future__ import print_function, unicode_literals
 
 import operator
 import re
+import threading
 
-from numpy.linalg import solve, lstsq
+from collections import OrderedDict, namedtuple
+
+from numpy.linalg import solve, pinv
 import numpy as np
 
-from batchcalc import controller as ctrl
-from batchcalc.model import Chemical, Component, Batch
+# the database layer (and SQLAlchemy with it) is imported only when a
+# calculation needs it to keep the import of the calculator fast
 
 __version__ = "0.3.1"
 
@@ -44,6 +47,116 @@ __version__ = "0.3.1"
 _MINWIDTH = 15
 
 
+# result of a single reentrant calculation, see `calculate`
+BatchResult = namedtuple("BatchResult", ["recipe", "moles", "masses", "volumes"])
+
+
+class BatchSolver(object):
+    '''
+    Factorized batch matrix holding the solution operator of the system
+    B^T * X = A.
+
+    For square systems the LU factorization (LAPACK gesv through `solve`) is
+    used once to form the inverse of B^T, otherwise the pseudo-inverse giving
+    the least squares solution is stored, so every subsequent solve for new
+    compositions is a single matrix product.
+    '''
+
+    def __init__(self, B):
+
+        self.B = np.array(B, dtype=float)
+        BT = np.transpose(self.B)
+        if BT.shape[0] == BT.shape[1]:
+            self.operator = solve(BT, np.eye(BT.shape[0]))
+        else:
+            self.operator = pinv(BT)
+
+        self.B.flags.writeable = False
+        self.operator.flags.writeable = False
+
+    def solve(self, A):
+        '''
+        Return X for the vector or matrix (one composition per column) `A`.
+        '''
+
+        return np.dot(self.operator, A)
+
+
+class SolverCache(object):
+    '''
+    Least recently used cache of BatchSolver (or Recipe) instances holding
+    at most `maxsize` entries, it can be shared between threads.
+    '''
+
+    def __init__(self, maxsize=32):
+
+        self.maxsize = maxsize
+        self._solvers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._solvers)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._solvers
+
+    def get(self, key):
+        '''
+        Return the solver stored under `key` or None and mark it as the most
+        recently used.
+        '''
+
+        with self._lock:
+            solver = self._solvers.pop(key, None)
+            if solver is not None:
+                self._solvers[key] = solver
+        return solver
+
+    def put(self, key, solver):
+        '''
+        Store the `solver` evicting the least recently used entries above
+        `maxsize`.
+        '''
+
+        with self._lock:
+            self._solvers.pop(key, None)
+            self._solvers[key] = solver
+            while len(self._solvers) > self.maxsize:
+                self._solvers.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._solvers.clear()
+
+
+def calculate(catalog, selection, moles):
+    '''
+    Calculate the masses of the chemicals without any shared mutable state,
+    so that many calculations can run concurrently in threads sharing one
+    catalog.
+
+    Args:
+        catalog : Catalog
+            catalog of the database, see `batchcalc.catalog.get_catalog`
+        selection : Selection
+            ids of the selected components and chemicals and the
+            concentrations of the chemicals
+        moles : array_like
+            molar composition (1D) or compositions (2D, one per row)
+
+    Returns:
+        BatchResult with the recipe used, the moles, the masses and the
+        volumes of the liquid chemicals (`recipe.liquids`)
+    '''
+
+    recipe = catalog.get_recipe(selection)
+    moles = np.array(moles, dtype=float)
+    masses = recipe.apply(moles)
+    return BatchResult(recipe, moles, masses, recipe.volumes(masses))
+
+
 class BatchCalculator(object):
 
     def __init__(self):
@@ -59,6 +172,7 @@ class BatchCalculator(object):
         self.A = np.zeros(1)
         self.B = np.zeros(1)
         self.X = np.zeros(1)
+        self._state = None
 
         self.scale_all = 100.0
         self.sample_scale = 1.0
@@ -66,6 +180,8 @@ class BatchCalculator(object):
         self.item_scale = 1.0
         self.selections = []
 
+        self.solvers = SolverCache()
+
     def reset(self):
         '''
         Clear the state of the calculation by reseting all the list and
@@ -80,6 +196,7 @@ class BatchCalculator(object):
         self.A = np.zeros(1)
         self.B = np.zeros(1)
         self.X = np.zeros(1)
+        self._state = None
 
         self.scale_all = 100.0
         self.sample_scale = 1.0
@@ -87,6 +204,42 @@ class BatchCalculator(object):
         self.item_scale = 1.0
         self.selections = []
 
+    @property
+    def state(self):
+        '''
+        CalculationState with the results for the current selection, a new
+        state with the values taken from the selected objects is created
+        whenever the selection changes.
+        '''
+
+        from batchcalc.state import CalculationState
+
+        if self._state is None or \
+                not self._state.matches(self.components, self.chemicals):
+            self._state = CalculationState(self.components, self.chemicals)
+        return self._state
+
+    def new_state(self):
+        '''
+        Create a new CalculationState from the current values of the selected
+        objects and return it.
+        '''
+
+        self._state = None
+        return self.state
+
+    def restore_state(self, masses, moles):
+        '''
+        Create a new CalculationState for the current selection with the
+        `masses` of the chemicals and the `moles` of the components saved
+        from an earlier state, e.g. in a .zbc file, and return it.
+        '''
+
+        state = self.new_state()
+        state.masses[:] = masses
+        state.moles[:] = moles
+        return state
+
     # this can be probably removed since base chemical has is_undefined method
     @staticmethod
     def is_empty(item):
@@ -111,12 +264,17 @@ class BatchCalculator(object):
         else:
             return None
 
-    def calculate_masses(self, session):
+    def check_selection(self, session=None):
         '''
-        Solve the linear system of equations  B * X = C
+        Check that both components and chemicals are selected and that every
+        component has a source among the selected chemicals, all the
+        components without a source are reported in a single error.
+
+        The sources are taken from the catalog index of the database bound to
+        `session` (default: the `DB` session).
         '''
 
-        db = ctrl.DB()
+        from batchcalc.catalog import get_catalog
 
         if len(self.components) == 0:
             raise ValueError("No Zeolite components selected")
@@ -124,193 +282,321 @@ class BatchCalculator(object):
         if len(self.chemicals) == 0:
             raise ValueError("No chemicals selected")
 
-        for comp in self.components:
-            temp = db.get_chemicals(components=[comp])
-            if len(set([t.id for t in temp]) & set([r.id for r in self.chemicals])) == 0:
-                raise ValueError("some components need their sources: {0:s}".format(comp.name))
+        if session is None:
+            from batchcalc.db import DB
+            session = DB().session
 
+        missing = get_catalog(session).get_uncovered(self.components,
+                                                     self.chemicals)
+        if len(missing) > 0:
+            raise ValueError("some components need their sources: {0:s}".format(
+                ", ".join(c.name for c in missing)))
+
+    def calculate_masses(self, session):
+        '''
+        Solve the linear system of equations  B * X = C
+
+        The masses are stored in the `state`, the selected Chemical objects
+        are left untouched.
+        '''
+
+        self.new_state()
         self.A = self.get_A_matrix()
-        self.B = self.get_B_matrix(session)
+        solver = self.get_solver(session)
+        self.B = solver.B
 
         try:
-            if self.B.shape[0] == self.B.shape[1]:
-                self.X = solve(np.transpose(self.B), self.A)
-            else:
-                self.X, resid, rank, s = lstsq(np.transpose(self.B), self.A)
-            # assign calculated masses to the chemicals
-            for chemical, x in zip(self.chemicals, self.X):
-                if chemical.kind == "reactant":
-                    chemical.mass = x / chemical.concentration
-                else:
-                    chemical.mass = x
+            self.X = solver.solve(self.A)
+            self.assign_masses()
         except Exception as e:
             raise e
         else:
             self.calculated = True
 
-    def calculate_moles(self, session):
+    def assign_masses(self):
         '''
-        Calculate the composition matrix by multiplying C = B * X
+        Set the masses of the chemicals in the `state` from the solution
+        vector `X`
         '''
 
-        db = ctrl.DB()
+        state = self.state
+        np.divide(self.X, state.divisors, out=state.masses)
 
-        if len(self.components) == 0:
-            raise ValueError("No Zeolite components selected")
+    def update_moles(self, session, component, moles):
+        '''
+        Set the number of moles of a single component and update the masses
+        of the chemicals without solving the system again.
+
+        Since the masses are linear in the component masses a change of a
+        single entry of `A` changes the solution by the corresponding column
+        of the cached solution operator scaled by the change.
+
+        Args:
+            session :
+                SQLAlchemy session
+            component : Component
+                One of the selected components
+            moles : float
+                New number of moles of the `component`
+
+        Returns:
+            True if the masses were updated, False if there was nothing to
+            update since the masses were not calculated yet
+        '''
 
-        if len(self.chemicals) == 0:
-            raise ValueError("No chemicals selected")
+        component.moles = moles
+        state = self.state
+
+        if not self.calculated or self.A is None or \
+                len(self.A) != len(self.components):
+            return False
 
-        for comp in self.components:
-            temp = db.get_chemicals(components=[comp])
-            if len(set([t.id for t in temp]) & set([r.id for r in self.chemicals])) == 0:
-                raise ValueError("some components need their sources: {0:s}".format(comp.name))
+        solver = self.solvers.get(self.selection_key(session))
+        if solver is None:
+            # the selection changed since the last calculation
+            self.calculate_masses(session)
+            return True
+
+        j = state.index(component, kind="components")
+        state.moles[j] = moles
+        newA = moles * state.molwt[j]
+        self.X += solver.operator[:, j] * (newA - self.A[j])
+        self.A[j] = newA
+        self.assign_masses()
+        return True
+
+    def calculate_masses_many(self, session, moles):
+        '''
+        Calculate the masses of chemicals for many compositions at once.
+
+        Args:
+            session :
+                SQLAlchemy session
+            moles : array_like
+                2D array of molar compositions with one row per target
+                composition and one column per selected component
+
+        Returns:
+            2D array of masses with one row per target composition and one
+            column per selected chemical
+
+        The factorized batch matrix is shared by all the targets, that are
+        solved with a single matrix product, the selected Chemical and
+        Component objects are left untouched.
+        '''
+
+        moles = np.atleast_2d(np.asarray(moles, dtype=float))
+        if moles.ndim != 2 or moles.shape[1] != len(self.components):
+            raise ValueError("compositions should have {0:d} columns, got shape {1}".format(
+                len(self.components), moles.shape))
 
-        masses = []
-        for chemical in self.chemicals:
-            if chemical.kind == "reactant":
-                masses.append(chemical.mass * chemical.concentration)
-            else:
-                masses.append(chemical.mass)
+        return self.compile_recipe(session).apply(moles)
+
+    def compile_recipe(self, session):
+        '''
+        Compile the current selection of components and chemicals into a
+        Recipe, that calculates the masses of the chemicals for any molar
+        composition without the database.
 
-        self.X = np.array(masses, dtype=float)
+        Args:
+            session :
+                SQLAlchemy session
+
+        Returns:
+            Recipe
+        '''
+
+        from batchcalc.catalog import get_catalog
+
+        return get_catalog(session).get_recipe(self.get_selection())
+
+    def get_selection(self):
+        '''
+        Return the immutable Selection of the current components and
+        chemicals, that can be passed to `calculate`.
+        '''
+
+        from batchcalc.catalog import get_selection
+
+        return get_selection(self.components, self.chemicals)
+
+    def calculate_moles(self, session):
+        '''
+        Calculate the composition matrix by multiplying C = B * X
+
+        The masses are taken from the selected Chemical objects and the moles
+        are stored in the `state`, the selected Component objects are left
+        untouched.
+        '''
+
+        self.check_selection(session)
+
+        state = self.new_state()
+        self.X = state.masses * state.divisors
         self.B = self.get_B_matrix(session)
 
         try:
             self.A = np.dot(np.transpose(self.B), self.X)
-            for comp, a in zip(self.components, self.A):
-                comp.moles = a / comp.molwt
+            np.divide(self.A, state.molwt, out=state.moles)
         except Exception as e:
             raise e
         else:
             self.calculated = True
 
-    def get_A_matrix(self):
+    def calculate_moles_many(self, session, masses, reference=None,
+                             reference_moles=1.0):
         '''
-        Compose the [A] matrix with masses of zeolite components.
+        Calculate the molar compositions for many sets of masses at once.
+
+        Args:
+            session :
+                SQLAlchemy session
+            masses : array_like
+                2D array of masses with one row per batch and one column per
+                selected chemical
+            reference : Component
+                If given, every composition is rescaled so that the
+                `reference` component has `reference_moles` moles, as in
+                `rescale_to_item`
+            reference_moles : float
+                Number of moles of the `reference` component
+
+        Returns:
+            2D array of moles with one row per batch and one column per
+            selected component
+
+        All the batches are converted with a single matrix product, the
+        selected Chemical and Component objects are left untouched.
         '''
 
-        return np.asarray([z.moles * z.molwt for z in self.components],
-                          dtype=float)
+        masses = np.atleast_2d(np.asarray(masses, dtype=float))
+        if masses.ndim != 2 or masses.shape[1] != len(self.chemicals):
+            raise ValueError("masses should have {0:d} columns, got shape {1}".format(
+                len(self.chemicals), masses.shape))
 
-    def get_B_matrix(self, session):
-        '''
-        Construct and return the batch matrix [B].
-        '''
+        self.check_selection(session)
+        B = self.get_B_matrix(session)
+        molwt = np.asarray([c.molwt for c in self.components], dtype=float)
 
-        B = np.zeros((len(self.chemicals), len(self.components)), dtype=float)
+        moles = np.dot(masses * self.get_concentrations(), B) / molwt
 
-        for i, chemical in enumerate(self.chemicals):
-            comps = session.query(Batch, Component).\
-                    filter(Batch.chemical_id == chemical.id).\
-                    filter(Component.id == Batch.component_id).all()
-            wfs = self.get_weight_fractions(i, comps, session)
-            for j, comp in enumerate(self.components):
-                for cid, wf in wfs:
-                    if comp.id == cid:
-                        B[i, j] = wf
-        return B
+        if reference is not None:
+            ref = moles[:, self.components.index(reference)]
+            if np.any(ref == 0.0):
+                raise ValueError("{0:s} is absent in batches: {1}".format(
+                    reference.listctrl_label(), np.flatnonzero(ref == 0.0).tolist()))
+            moles *= (float(reference_moles) / ref)[:, np.newaxis]
 
-    def get_weight_fractions(self, rindex, comps, session):
-        '''
-        Calculate the weight fractions corresponding to a specific reactant
-        and coupled zolite componts.
+        return moles
 
-        lower case "m": mass in grmas
-        upper case "M": molecular weight [gram/mol]
+    def selection_key(self, session):
+        '''
+        Return the key identifying the batch matrix of the current selection,
+        composed of the database, the catalog version and the ordered
+        chemicals (with their concentrations) and components.
         '''
 
-        res = []
+        from batchcalc.db import get_catalog_version
 
-        if self.chemicals[rindex].kind == "mixture":
-            for batch, comp in comps:
-                res.append((comp.id, batch.coefficient))
-            return res
+        return (str(session.get_bind().url), get_catalog_version(),
+                tuple(c.id for c in self.chemicals),
+                tuple(c.concentration for c in self.chemicals),
+                tuple(c.id for c in self.components))
+
+    def get_solver(self, session):
+        '''
+        Return the BatchSolver for the current selection, the batch matrix is
+        only built and factorized when the selection or the catalog changes.
+        The selection is checked (see `check_selection`) before a new solver
+        is built, a cached solver implies that the same selection was already
+        checked against the same catalog.
+        '''
 
-        elif self.chemicals[rindex].kind == "solution":
-            if len(comps) > 2:
-                raise ValueError("cannot handle cases of zeoindexes > 2")
+        key = self.selection_key(session)
+        solver = self.solvers.get(key)
+        if solver is None:
+            self.check_selection(session)
+            solver = BatchSolver(self.get_B_matrix(session))
+            self.solvers.put(key, solver)
+        return solver
 
-            rct = self.chemicals[rindex]
+    def get_concentrations(self):
+        '''
+        Return the vector of factors converting the solved masses into the
+        masses of chemicals, that is the concentration for reactants and one
+        for the other kinds.
+        '''
 
-            h2o = session.query(Chemical).filter(Chemical.formula == "H2O").one()
-            M_solv = h2o.molwt
+        return np.asarray([c.concentration if c.kind == "reactant" else 1.0
+                           for c in self.chemicals], dtype=float)
 
-            M_solu = rct.molwt
+    def get_A_matrix(self):
+        '''
+        Compose the [A] matrix with masses of zeolite components.
+        '''
 
-            if abs(rct.concentration - 1.0) > 0.0001:
-                n_solu = M_solu * M_solv / (M_solv + (1.0 - rct.concentration) * M_solu / rct.concentration) / M_solu
-                n_solv = M_solu * M_solv / (M_solu + rct.concentration * M_solv / (1.0 - rct.concentration)) / M_solv
-            else:
-                n_solu = 1.0
-                n_solv = 0.0
+        return np.asarray([z.moles * z.molwt for z in self.components],
+                          dtype=float)
 
-            masses = list()
+    def get_B_matrix(self, session):
+        '''
+        Construct and return the batch matrix [B].
 
-            for batch, comp in comps:
-                if comp.formula != "H2O":
-                    masses.append(batch.coefficient * n_solu * comp.molwt)
-                else:
-                    masses.append((batch.coefficient * n_solu + n_solv) * comp.molwt)
+        The matrix is sliced from the weight fractions of the whole catalog,
+        that are computed once per database version (see
+        `batchcalc.catalog.Catalog`), so no queries are issued for a new
+        selection of chemicals or components.
+        '''
 
-            tot_mass = sum(masses)
-            for batch, comp in comps:
-                if comp.formula != "H2O":
-                    res.append((comp.id, batch.coefficient * n_solu * comp.molwt / tot_mass))
-                else:
-                    res.append((comp.id, (batch.coefficient * n_solu + n_solv) * comp.molwt / tot_mass))
-            return res
-
-        elif self.chemicals[rindex].kind == "reactant":
-            if len(comps) > 1:
-                tot_mass = sum([b.coefficient * c.molwt for b, c in comps])
-                for batch, comp in comps:
-                    res.append((comp.id, batch.coefficient * comp.molwt / tot_mass))
-            else:
-                res.append((comps[0][1].id, 1.0))
-            return res
+        from batchcalc.catalog import get_catalog
 
-        else:
-            raise ValueError("Unknown chemical kind: {}".format(self.chemicals[rindex].kind))
+        return get_catalog(session).get_B_matrix(self.chemicals, self.components)
 
     def rescale_all(self):
         '''
-        Rescale all masses of chemicals by a `scale_all` factor.
+        Rescale all masses of chemicals in the `state` by a `scale_all`
+        factor in place and return them.
         '''
 
-        res = [s.mass / self.scale_all for s in self.chemicals]
-        return res
+        masses = self.state.masses
+        masses /= self.scale_all
+        return masses
 
     def rescale_to_chemical(self, chemical, desired_mass):
         '''
-        Rescale all masses by a factor, so that the selected item has the mass
-        specified by the user.
+        Rescale all masses in the `state` in place by a factor, so that the
+        selected item has the mass specified by the user, and return them.
         '''
 
-        self.item_scale = chemical.mass / float(desired_mass)
-        res = [s.mass / self.item_scale for s in self.chemicals]
-        return res
+        masses = self.state.masses
+        self.item_scale = masses[self.state.index(chemical)] / float(desired_mass)
+        masses /= self.item_scale
+        return masses
 
     def rescale_to_sample(self, selected):
         '''
         Rescale all masses by a factor chosen in such a way that the sum of
         masses of a selected subset of chemicals is equal to the chosen sample
-        size.
+        size. The masses in the `state` are rescaled in place and returned.
         '''
 
-        self.sample_scale = sum([s.mass for s in selected]) / float(self.sample_size)
-        res = [s.mass / self.sample_scale for s in self.chemicals]
-        return res
+        masses = self.state.masses
+        idx = [self.state.index(s) for s in selected]
+        self.sample_scale = masses[idx].sum() / float(self.sample_size)
+        masses /= self.sample_scale
+        return masses
 
     def rescale_to_item(self, component, desired_moles):
         '''
         Rescale all mole numbers by a factor chosen in such a way that the
-        selected *item* has th number of moles equal to *amount*.
+        selected *item* has th number of moles equal to *amount*. The moles in
+        the `state` are rescaled in place and returned.
         '''
 
-        self.item_scale = component.moles / desired_moles
-        res = [s.moles / self.item_scale for s in self.components]
-        return res
+        moles = self.state.moles
+        self.item_scale = moles[self.state.index(component, kind="components")] / desired_moles
+        moles /= self.item_scale
+        return moles
 
     def print_A(self):
         '''
@@ -322,7 +608,7 @@ class BatchCalculator(object):
         print(" "*5 + "{l:^{wl}}  |{mol:^15s}|{mas:^15s}".format(
                     l="Formula", wl=width, mol="Moles", mas="Mass [g]"))
         print(" "*5 + "-"*(width+4+30))
-        for comp in self.components:
+        for comp in self.state.components:
             print(" "*5+"{l:>{wl}}  |{mol:>15.4f}|{mas:>15.4f}".format(
                     l=comp.listctrl_label(), wl=width, mol=comp.moles, mas=comp.mass))
 
@@ -0,0 +1,430 @@
+# file: catalog.py
+#
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from __future__ import print_function, unicode_literals
+
+import threading
+
+from collections import namedtuple
+
+import numpy as np
+
+from batchcalc.calculator import BatchSolver, SolverCache
+from batchcalc.db import get_catalog_version
+from batchcalc.model import (Batch, BaseChemical, Chemical, Component, Kind,
+                             PhysicalForm)
+from batchcalc.recipe import Recipe
+
+__version__ = "0.3.1"
+
+
+# batch record linking a chemical to one of its components
+Link = namedtuple("Link", ["component_id", "formula", "molwt", "coefficient"])
+
+# data of a chemical that determines its weight fractions, the label and
+# the density (None unless the chemical is a liquid)
+ChemicalData = namedtuple("ChemicalData", ["id", "kind", "molwt", "concentration",
+                                           "label", "density"])
+
+# data of a component
+ComponentData = namedtuple("ComponentData", ["id", "formula", "molwt", "label"])
+
+# immutable selection of components and chemicals by their ids, the
+# concentrations of the chemicals are None for the values from the database
+Selection = namedtuple("Selection", ["component_ids", "chemical_ids",
+                                     "concentrations"])
+
+
+def get_selection(components, chemicals):
+    '''
+    Return the Selection of the Component and Chemical objects with the
+    current concentrations of the chemicals.
+    '''
+
+    return Selection(tuple(c.id for c in components),
+                     tuple(c.id for c in chemicals),
+                     tuple(c.concentration for c in chemicals))
+
+
+def get_label(name, short_name):
+    '''
+    Return the label displayed for a chemical or component, see
+    `BaseChemical.listctrl_label`.
+    '''
+
+    return name if BaseChemical.is_undefined(short_name) else short_name
+
+
+def get_weight_fractions(kind, molwt, concentration, links, solvent_molwt=None):
+    '''
+    Calculate the weight fractions corresponding to a specific chemical
+    and coupled zeolite components.
+
+    Args:
+        kind : str
+            kind of the chemical: "mixture", "solution" or "reactant"
+        molwt : float
+            molecular weight of the chemical
+        concentration : float
+            concentration of the chemical as weight fraction
+        links : list of Link
+            batch records linking the chemical to the components
+        solvent_molwt : float
+            molecular weight of water, required for solutions
+
+    Returns:
+        list of (component id, weight fraction) tuples
+
+    lower case "m": mass in grmas
+    upper case "M": molecular weight [gram/mol]
+    '''
+
+    res = []
+
+    if any(link.coefficient is None for link in links):
+        raise ValueError("batch record without a coefficient")
+
+    if kind == "mixture":
+        for link in links:
+            res.append((link.component_id, link.coefficient))
+        return res
+
+    elif kind == "solution":
+        if len(links) > 2:
+            raise ValueError("cannot handle cases of zeoindexes > 2")
+
+        if solvent_molwt is None:
+            raise ValueError("water (H2O) is required to calculate solutions")
+
+        if concentration is None or not 0.0 < concentration <= 1.0:
+            raise ValueError("concentration of a solution should be in (0, 1], "
+                             "got {0}".format(concentration))
+
+        M_solv = solvent_molwt
+        M_solu = molwt
+
+        if abs(concentration - 1.0) > 0.0001:
+            n_solu = M_solu * M_solv / (M_solv + (1.0 - concentration) * M_solu / concentration) / M_solu
+            n_solv = M_solu * M_solv / (M_solu + concentration * M_solv / (1.0 - concentration)) / M_solv
+        else:
+            n_solu = 1.0
+            n_solv = 0.0
+
+        masses = list()
+
+        for link in links:
+            if link.formula != "H2O":
+                masses.append(link.coefficient * n_solu * link.molwt)
+            else:
+                masses.append((link.coefficient * n_solu + n_solv) * link.molwt)
+
+        tot_mass = sum(masses)
+        if tot_mass <= 0.0:
+            raise ValueError("solution with zero total mass of components")
+        for link, mass in zip(links, masses):
+            res.append((link.component_id, mass / tot_mass))
+        return res
+
+    elif kind == "reactant":
+        # the masses of the reactants are divided by their concentration
+        if concentration is None or concentration <= 0.0:
+            raise ValueError("concentration of a reactant should be positive, "
+                             "got {0}".format(concentration))
+        if len(links) > 1:
+            tot_mass = sum([l.coefficient * l.molwt for l in links])
+            if tot_mass <= 0.0:
+                raise ValueError("reactant with zero total mass of components")
+            for link in links:
+                res.append((link.component_id, link.coefficient * link.molwt / tot_mass))
+        elif len(links) == 1:
+            res.append((links[0].component_id, 1.0))
+        else:
+            raise ValueError("reactant without components")
+        return res
+
+    else:
+        raise ValueError("Unknown chemical kind: {}".format(kind))
+
+
+class Catalog(object):
+    '''
+    Read-only snapshot of the chemicals, components and batch records of a
+    database with the precomputed weight fractions of all the chemicals.
+
+    The weight fractions are stored as a sparse chemical x component matrix
+    in the compressed sparse row format (`indptr`, `indices`, `data`) so the
+    batch matrix of any selection is a fancy-index slice of it and no
+    database queries are needed after the catalog is built. The `sources`
+    index maps the component ids to the ids of their source chemicals.
+
+    The catalog is never modified after it is built and the recipes compiled
+    from it are cached under a lock, so a single catalog can be shared by
+    many threads calculating concurrently without a database session.
+    '''
+
+    def __init__(self, session, version=None, maxrecipes=128):
+
+        self.version = get_catalog_version() if version is None else version
+
+        chemicals = session.query(Chemical.id, Kind.name, Chemical.molwt,
+                                  Chemical.concentration, Chemical.name,
+                                  Chemical.short_name, Chemical.density,
+                                  PhysicalForm.form).\
+            join(Kind, Chemical._kind_id == Kind.id).\
+            outerjoin(PhysicalForm,
+                      Chemical._physical_form_id == PhysicalForm.id).\
+            order_by(Chemical.id).all()
+        components = session.query(Component.id, Component.formula,
+                                   Component.molwt, Component.name,
+                                   Component.short_name).\
+            order_by(Component.id).all()
+        batches = session.query(Batch.chemical_id, Batch.component_id,
+                                Batch.coefficient).\
+            order_by(Batch.id).all()
+        water = session.query(Chemical.molwt).\
+            filter(Chemical.formula == "H2O").order_by(Chemical.id).first()
+
+        self.solvent_molwt = water[0] if water is not None else None
+
+        self.chemicals = [
+            ChemicalData(cid, kind, molwt, conc, get_label(name, short),
+                         density if form == "liquid" else None)
+            for cid, kind, molwt, conc, name, short, density, form in chemicals]
+        self.components = [
+            ComponentData(cid, formula, molwt, get_label(name, short))
+            for cid, formula, molwt, name, short in components]
+        self.chemical_rows = dict((c.id, i) for i, c in enumerate(self.chemicals))
+        self.component_cols = dict((c.id, j) for j, c in enumerate(self.components))
+        self.shape = (len(self.chemicals), len(self.components))
+
+        self.links = dict()
+        sources = dict()
+        for chem_id, comp_id, coeff in batches:
+            sources.setdefault(comp_id, set()).add(chem_id)
+            if comp_id in self.component_cols:
+                comp = self.components[self.component_cols[comp_id]]
+                self.links.setdefault(chem_id, []).append(
+                    Link(comp.id, comp.formula, comp.molwt, coeff))
+
+        # ids of the chemicals that are sources of each component
+        self.sources = dict((k, frozenset(v)) for k, v in sources.items())
+
+        # errors of the chemicals whose weight fractions cannot be
+        # calculated (e.g. invalid records), raised only when such chemical
+        # is selected
+        self.errors = dict()
+
+        indptr = [0]
+        indices = []
+        data = []
+        for chem in self.chemicals:
+            try:
+                wfs = self.weight_fractions(chem.id, chem.concentration)
+            except (ValueError, TypeError, ArithmeticError) as err:
+                self.errors[chem.id] = ValueError(
+                    "chemical {0}: {1}".format(chem.id, err))
+                wfs = []
+            for cid, wf in wfs:
+                indices.append(self.component_cols[cid])
+                data.append(wf)
+            indptr.append(len(indices))
+
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.data = np.asarray(data, dtype=float)
+        for arr in (self.indptr, self.indices, self.data):
+            arr.flags.writeable = False
+
+        self._recipes = SolverCache(maxsize=maxrecipes)
+
+    def weight_fractions(self, chemical_id, concentration):
+        '''
+        Return the list of (component id, weight fraction) tuples of the
+        chemical with the given concentration.
+        '''
+
+        chem = self.chemicals[self.chemical_rows[chemical_id]]
+        return get_weight_fractions(chem.kind, chem.molwt, concentration,
+                                    self.links.get(chem.id, []),
+                                    self.solvent_molwt)
+
+    def get_uncovered(self, components, chemicals):
+        '''
+        Return the list of `components` that have no source among the
+        `chemicals`.
+        '''
+
+        chemids = set(c.id for c in chemicals)
+        return [comp for comp in components
+                if self.sources.get(comp.id, frozenset()).isdisjoint(chemids)]
+
+    def get_B_matrix(self, chemicals, components):
+        '''
+        Return the batch matrix for the lists of selected Chemical and
+        Component objects.
+        '''
+
+        return self.get_selection_B_matrix(get_selection(components, chemicals))
+
+    def get_selection_B_matrix(self, selection):
+        '''
+        Return the batch matrix for the `selection`.
+
+        The rows of solutions whose concentration was changed with respect
+        to the database are recalculated from the stored batch records.
+        '''
+
+        rows = np.asarray([self.get_row(i) for i in selection.chemical_ids],
+                          dtype=np.intp)
+        cols = np.asarray([self.get_col(i) for i in selection.component_ids],
+                          dtype=np.intp)
+
+        B = np.zeros((len(rows), len(cols)), dtype=float)
+        if len(rows) == 0 or len(cols) == 0:
+            return B
+
+        colpos = np.full(self.shape[1], -1, dtype=np.intp)
+        colpos[cols] = np.arange(len(cols))
+
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        offsets = np.cumsum(counts) - counts
+        entries = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+        rowpos = np.repeat(np.arange(len(rows)), counts)
+        colsel = colpos[self.indices[entries]]
+        mask = colsel >= 0
+        B[rowpos[mask], colsel[mask]] = self.data[entries[mask]]
+
+        for i, conc in enumerate(self.get_concentrations(selection)):
+            chem = self.chemicals[rows[i]]
+            if chem.kind == "solution" and conc != chem.concentration:
+                B[i, :] = 0.0
+                for cid, wf in self.weight_fractions(chem.id, conc):
+                    if colpos[self.component_cols[cid]] >= 0:
+                        B[i, colpos[self.component_cols[cid]]] = wf
+        return B
+
+    def get_concentrations(self, selection):
+        '''
+        Return the concentrations of the selected chemicals, taken from the
+        catalog where the `selection` does not give them.
+        '''
+
+        if selection.concentrations is None:
+            concentrations = [None] * len(selection.chemical_ids)
+        else:
+            concentrations = selection.concentrations
+        return [self.chemicals[self.get_row(i)].concentration if c is None else c
+                for i, c in zip(selection.chemical_ids, concentrations)]
+
+    def get_recipe(self, selection):
+        '''
+        Return the Recipe compiled for the `selection`, recipes are cached
+        so that every selection is factorized only once.
+
+        Raises ValueError if some of the selected components have no source
+        among the selected chemicals.
+        '''
+
+        recipe = self._recipes.get(selection)
+        if recipe is not None:
+            return recipe
+
+        chemids = set(selection.chemical_ids)
+        missing = [self.components[self.get_col(i)].label
+                   for i in selection.component_ids
+                   if self.sources.get(i, frozenset()).isdisjoint(chemids)]
+        if len(missing) > 0:
+            raise ValueError("some components need their sources: {0:s}".format(
+                ", ".join(missing)))
+
+        chemicals = [self.chemicals[self.get_row(i)] for i in selection.chemical_ids]
+        components = [self.components[self.get_col(i)]
+                      for i in selection.component_ids]
+        concentrations = self.get_concentrations(selection)
+
+        recipe = Recipe(
+            operator=BatchSolver(self.get_selection_B_matrix(selection)).operator,
+            molwt=[c.molwt for c in components],
+            divisors=[conc if chem.kind == "reactant" else 1.0
+                      for chem, conc in zip(chemicals, concentrations)],
+            kinds=[c.kind for c in chemicals],
+            components=[c.label for c in components],
+            chemicals=[c.label for c in chemicals],
+            densities=[np.nan if c.density is None else c.density
+                       for c in chemicals])
+        self._recipes.put(selection, recipe)
+        return recipe
+
+    def get_row(self, chemical_id):
+        '''
+        Return the row of the chemical, raise the error recorded for the
+        chemical if its weight fractions could not be calculated.
+        '''
+
+        if chemical_id not in self.chemical_rows:
+            raise ValueError("chemical not in the catalog: {0}".format(chemical_id))
+        if chemical_id in self.errors:
+            raise self.errors[chemical_id]
+        return self.chemical_rows[chemical_id]
+
+    def get_col(self, component_id):
+        '''
+        Return the column of the component.
+        '''
+
+        if component_id not in self.component_cols:
+            raise ValueError("component not in the catalog: {0}".format(component_id))
+        return self.component_cols[component_id]
+
+
+_catalogs = dict()
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(session):
+    '''
+    Return the Catalog of the database bound to the `session`, the catalog is
+    built once per database and catalog version. It is safe to call from many
+    threads, each with its own session.
+    '''
+
+    url = str(session.get_bind().url)
+    version = get_catalog_version()
+    catalog = _catalogs.get(url)
+    if catalog is None or catalog.version != version:
+        with _catalogs_lock:
+            catalog = _catalogs.get(url)
+            if catalog is None or catalog.version != version:
+                catalog = Catalog(session, version=version)
+                _catalogs[url] = catalog
+    return catalog
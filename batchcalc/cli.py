@@ -0,0 +1,432 @@
+# file: cli.py
+#
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import io
+import json
+import os
+import sys
+
+from collections import OrderedDict
+
+from batchcalc.calculator import BatchCalculator, _MINWIDTH
+from batchcalc.db import open_session
+from batchcalc.model import Chemical, Component
+from batchcalc.utils import index_names, read_records
+
+__version__ = "0.3.1"
+
+
+class Lookup(object):
+    '''
+    Resolve the chemicals and components given by the user (ids, names, short
+    names or formulas) to the database records, all the records are loaded
+    once with a single query per table.
+    '''
+
+    def __init__(self, session):
+
+        self.chemicals = self.index(
+            session.query(Chemical).order_by(Chemical.id).all(),
+            ["name", "short_name"])
+        self.components = self.index(
+            session.query(Component).order_by(Component.id).all(),
+            ["formula", "short_name", "name"])
+
+    @staticmethod
+    def index(records, attrs):
+        '''
+        Return a dictionary mapping the ids and the lower case values of the
+        `attrs` to the records, on duplicates the first match wins.
+        '''
+
+        return index_names([(r, r.id, [getattr(r, attr) for attr in attrs])
+                            for r in records])
+
+    def get_chemical(self, key):
+        try:
+            return self.chemicals[str(key).strip().lower()]
+        except KeyError:
+            raise ValueError("unknown chemical: {0}".format(key))
+
+    def get_component(self, key):
+        try:
+            return self.components[str(key).strip().lower()]
+        except KeyError:
+            raise ValueError("unknown component: {0}".format(key))
+
+
+def setup_calculator(calculator, lookup, composition, chemicals):
+    '''
+    Select the components and chemicals in the `calculator`, `composition`
+    is a string understood by `BatchCalculator.parse_formulas` and
+    `chemicals` a list of chemical ids, names or short names.
+    '''
+
+    calculator.reset()
+
+    formulas = calculator.parse_formulas(composition)
+    if len(formulas) == 0:
+        raise ValueError("no components in the composition: {0}".format(composition))
+
+    for formula, nmol in formulas:
+        component = lookup.get_component(formula)
+        component.moles = nmol
+        calculator.components.append(component)
+
+    for key in chemicals:
+        calculator.chemicals.append(lookup.get_chemical(key))
+
+
+def get_positive(value, name):
+    '''
+    Return the `value` as a float after checking that it is a positive
+    finite number.
+    '''
+
+    number = float(value)
+    if not 0.0 < number < float("inf"):
+        raise ValueError("{0:s} should be a positive number: {1}".format(name, value))
+    return number
+
+
+def apply_scaling(calculator, lookup, scaling):
+    '''
+    Rescale the calculated masses in place, `scaling` is a tuple with the
+    mode ("all", "sample" or "chemical") followed by its arguments:
+
+        ("all", factor)
+        ("sample", sample_size, [chemicals, ...])
+        ("chemical", chemical, mass)
+
+    the list of chemicals for the "sample" mode can be empty, in which case
+    all the chemicals are used.
+    '''
+
+    mode = scaling[0]
+    if mode == "all":
+        calculator.scale_all = get_positive(scaling[1], "scaling factor")
+        calculator.rescale_all()
+    elif mode == "sample":
+        calculator.sample_size = get_positive(scaling[1], "sample size")
+        if len(scaling) > 2 and scaling[2]:
+            ids = set(lookup.get_chemical(k).id for k in scaling[2])
+            selected = [c for c in calculator.chemicals if c.id in ids]
+            if len(selected) != len(ids):
+                raise ValueError("sample chemicals must be selected chemicals")
+        else:
+            selected = calculator.chemicals
+        calculator.selections = selected
+        calculator.rescale_to_sample(selected)
+    elif mode == "chemical":
+        chemical = calculator.select_item("chemicals", "id",
+                                          lookup.get_chemical(scaling[1]).id)
+        if chemical is None:
+            raise ValueError("chemical to rescale to is not selected: {0}".format(scaling[1]))
+        calculator.rescale_to_chemical(chemical, get_positive(scaling[2], "mass"))
+    else:
+        raise ValueError("wrong scaling mode: {0}".format(mode))
+
+
+def format_results(calculator):
+    '''
+    Return the table of masses and volumes of the chemicals as a string.
+    '''
+
+    width = max([len(c.listctrl_label()) for c in calculator.chemicals] + [_MINWIDTH])
+    lines = ["{l:<{wl}s}  |{mas:^15s}|{vol:^15s}".format(
+        l="Chemical", wl=width, mas="Mass [g]", vol="Volume [cm3]")]
+    lines.append("-" * (width + 34))
+    for chemical in calculator.state.chemicals:
+        volume = chemical.volume
+        lines.append("{l:<{wl}s}  |{mas:>15.4f}|{vol:>15s}".format(
+            l=chemical.listctrl_label(), wl=width, mas=chemical.mass,
+            vol="" if volume is None else "{0:.4f}".format(volume)))
+    return "\n".join(lines)
+
+
+def split_list(value):
+    '''
+    Return a list of strings from a list or a string with items separated by
+    semicolons.
+    '''
+
+    if value is None:
+        return []
+    elif isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value]
+    else:
+        return [v.strip() for v in str(value).split(";") if v.strip() != ""]
+
+
+def is_set(job, key):
+    return job.get(key) not in (None, "")
+
+
+def get_job_number(job, key):
+    '''
+    Return the value of `key` in the `job` as a float, the numbers are
+    strings in the CSV files.
+    '''
+
+    if not is_set(job, key):
+        raise ValueError("missing {0:s}".format(key))
+    value = job[key]
+    if isinstance(value, bool):
+        raise ValueError("{0:s} is not a number: {1}".format(key, value))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError("{0:s} is not a number: {1}".format(key, value))
+
+
+def get_job_text(job, key):
+    '''
+    Return the value of `key` in the `job` after checking that it is a
+    string.
+    '''
+
+    if not is_set(job, key):
+        raise ValueError("missing {0:s}".format(key))
+    # str and unicode on python 2
+    if not isinstance(job[key], (str, type(""))):
+        raise ValueError("{0:s} should be a string: {1}".format(key, job[key]))
+    return job[key]
+
+
+def get_job_scaling(job):
+    '''
+    Return the scaling tuple (see `apply_scaling`) of a batch `job` or None,
+    the keys mirror the command line options: `scale_all`, `sample_size`
+    with `sample_chemicals` and `rescale_to` with `rescale_mass`.
+    '''
+
+    if is_set(job, "scale_all"):
+        return ("all", get_job_number(job, "scale_all"))
+    elif is_set(job, "sample_size"):
+        return ("sample", get_job_number(job, "sample_size"),
+                split_list(job.get("sample_chemicals")))
+    elif is_set(job, "rescale_to"):
+        return ("chemical", job["rescale_to"], get_job_number(job, "rescale_mass"))
+    else:
+        return None
+
+
+def run_job(calculator, lookup, session, job):
+    '''
+    Calculate a single batch `job` and return the list of results for the
+    chemicals.
+    '''
+
+    setup_calculator(calculator, lookup, get_job_text(job, "composition"),
+                     split_list(job.get("chemicals")))
+    calculator.calculate_masses(session)
+    scaling = get_job_scaling(job)
+    if scaling is not None:
+        apply_scaling(calculator, lookup, scaling)
+
+    return [OrderedDict([("id", c.id),
+                         ("label", c.listctrl_label()),
+                         ("mass", float(c.mass)),
+                         ("volume", None if c.volume is None else float(c.volume))])
+            for c in calculator.state.chemicals]
+
+
+def read_jobs(fobj, fmt):
+    '''
+    Generator yielding the jobs read from a JSONL or CSV stream one at a time,
+    lines that cannot be parsed are yielded as ValueError instances.
+    '''
+
+    return read_records(fobj, fmt, name="job")
+
+
+def run_batch(session, fin, fout, fmt="jsonl"):
+    '''
+    Run the jobs read from `fin` (JSONL or CSV, see `read_jobs`) and write one
+    JSON line with the result or the error per job to `fout`, return the
+    number of failed jobs.
+
+    Each job has a `composition`, a list of `chemicals` (a semicolon separated
+    string in CSV) and optionally the scaling keys (see `get_job_scaling`)
+    and an `id` copied to the result. Jobs are processed as they are read and
+    the factorized batch matrix is cached per selection of chemicals and
+    components, so it is built only once for every distinct selection.
+    '''
+
+    lookup = Lookup(session)
+    calculator = BatchCalculator()
+
+    nfailed = 0
+    for n, job in enumerate(read_jobs(fin, fmt)):
+        result = OrderedDict([("job", n)])
+        try:
+            if isinstance(job, Exception):
+                raise job
+            if is_set(job, "id"):
+                result["id"] = job["id"]
+            result["chemicals"] = run_job(calculator, lookup, session, job)
+            # NaN and infinite masses are not valid JSON
+            line = json.dumps(result, allow_nan=False)
+        except KeyError as err:
+            error = "missing key: {0}".format(err)
+        except (ValueError, TypeError, AttributeError, ArithmeticError) as err:
+            error = str(err)
+        else:
+            error = None
+
+        if error is not None:
+            result.pop("chemicals", None)
+            result["error"] = error
+            line = json.dumps(result)
+            nfailed += 1
+        fout.write(line + "\n")
+    return nfailed
+
+
+def get_parser():
+
+    parser = argparse.ArgumentParser(
+        prog="zbc-calc",
+        description="Calculate the masses of chemicals for a batch with a "
+                    "given molar composition.")
+    parser.add_argument("composition", nargs="?",
+                        help='molar composition, e.g. "1.0 Al2O3 : 30 SiO2 : 500 H2O"')
+    parser.add_argument("-c", "--chemicals", nargs="+", metavar="CHEMICAL",
+                        help="chemicals given by id, name or short name")
+    parser.add_argument("--db", default=None,
+                        help="path to the database (default: bundled database)")
+
+    scaling = parser.add_mutually_exclusive_group()
+    scaling.add_argument("--scale-all", type=float, metavar="FACTOR",
+                         help="divide all the masses by FACTOR")
+    scaling.add_argument("--sample-size", type=float, metavar="MASS",
+                         help="rescale so that the masses of the sample "
+                              "chemicals sum up to MASS")
+    scaling.add_argument("--rescale-to", nargs=2, metavar=("CHEMICAL", "MASS"),
+                         help="rescale so that CHEMICAL has the mass MASS")
+    parser.add_argument("--sample-chemicals", nargs="+", metavar="CHEMICAL",
+                        default=[],
+                        help="chemicals summed up for --sample-size "
+                             "(default: all)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run the jobs from a JSONL or CSV file ('-' for "
+                             "stdin) writing one JSON line per job")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="format of the --batch file (default: guessed "
+                             "from the extension, jsonl for stdin)")
+    parser.add_argument("-o", "--output", metavar="FILE", default=None,
+                        help="output file for --batch (default: stdout)")
+    parser.add_argument("--version", action="version",
+                        version="%(prog)s {0:s}".format(__version__))
+    return parser
+
+
+def get_scaling(args):
+    '''
+    Return the scaling tuple (see `apply_scaling`) from the parsed arguments
+    or None if no scaling was requested.
+    '''
+
+    if args.scale_all is not None:
+        return ("all", args.scale_all)
+    elif args.sample_size is not None:
+        return ("sample", args.sample_size, args.sample_chemicals)
+    elif args.rescale_to is not None:
+        return ("chemical", args.rescale_to[0], args.rescale_to[1])
+    else:
+        return None
+
+
+def main(argv=None):
+    '''
+    Entry point of the zbc-calc command.
+    '''
+
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.batch is None and (args.composition is None or args.chemicals is None):
+        parser.error("the composition and --chemicals are required without --batch")
+
+    session = open_session(args.db)
+
+    if args.batch is not None:
+        return main_batch(session, args)
+
+    calculator = BatchCalculator()
+    try:
+        lookup = Lookup(session)
+        setup_calculator(calculator, lookup, args.composition, args.chemicals)
+        calculator.calculate_masses(session)
+        scaling = get_scaling(args)
+        if scaling is not None:
+            apply_scaling(calculator, lookup, scaling)
+    except (ValueError, ArithmeticError) as err:
+        print("zbc-calc: error: {0}".format(err), file=sys.stderr)
+        return 1
+
+    print(format_results(calculator))
+    return 0
+
+
+def main_batch(session, args):
+    '''
+    Run the --batch mode, returns 1 if any of the jobs failed.
+    '''
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if os.path.splitext(args.batch)[1].lower() == ".csv" else "jsonl"
+
+    if args.batch == "-":
+        fin = sys.stdin
+    else:
+        fin = io.open(args.batch, "r", newline="" if fmt == "csv" else None)
+
+    fout = sys.stdout if args.output is None else io.open(args.output, "w")
+
+    try:
+        nfailed = run_batch(session, fin, fout, fmt)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    return 1 if nfailed > 0 else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
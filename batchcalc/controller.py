@@ -38,145 +38,58 @@ import sys
 from collections import OrderedDict
 
 from ObjectListView import ObjectListView
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from batchcalc import dialogs
-from batchcalc.model import (Chemical, Component, Electrolyte, Kind, Category,
-                             Reaction, PhysicalForm, Batch, Synthesis,
-                             SynthesisComponent, SynthesisChemical)
-
-from batchcalc.utils import get_columns, get_resource_path
+from batchcalc.model import SynthesisComponent, SynthesisChemical
+
+# the database access layer lives in the GUI-free batchcalc.db module, it is
+# imported here for backwards compatibility
+from batchcalc.db import (DB, Singleton, bump_catalog_version,
+                          changes_catalog, get_catalog_version, print_attrs,
+                          add_batch_record, delete_batch_record,
+                          modify_batch_record, add_chemical_record,
+                          delete_chemical_record, modify_chemical_record,
+                          add_component_record, delete_component_record,
+                          modify_component_record, add_reaction_record,
+                          delete_reaction_record, modify_reaction_record,
+                          add_category_record, delete_category_record,
+                          modify_category_record, fill_kinds_table,
+                          add_kind_record, delete_kind_record,
+                          modify_kind_record, fill_physical_forms_table,
+                          add_physical_form_record,
+                          delete_physical_form_record,
+                          modify_physical_form_record,
+                          fill_electrolytes_table, add_electrolyte_record,
+                          delete_electrolyte_record,
+                          modify_electrolyte_record, add_synthesis_record,
+                          modify_synthesis_record, delete_synthesis_record)
+from batchcalc.utils import get_columns
 
 
 __version__ = "0.3.1"
 
-
-#['batches', 'components', 'categories', 'chemicals', 'electrolytes', 'kinds',
-# 'reactions', 'physical_forms', 'syntheses']
-
-
-class Singleton(type):
-
-    _instances = {}
-
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
-
-
-class DB(object):
-    __metaclass__ = Singleton
-
-    def __init__(self):
-
-        self.session = self.get_session()
-
-    @property
-    def dbpath(self):
-        '''
-        Depending on the execution environment get the proper database path.
-        '''
-
-        return get_resource_path('data', 'zeolite.db')
-
-    def get_session(self):
-        '''
-        When the new database is chosen, close the old session and establish a
-        new one.
-        '''
-
-        engine = create_engine("sqlite:///{path:s}".format(path=self.dbpath),
-                               echo=False)
-        Session = sessionmaker(bind=engine, expire_on_commit=False,
-                               autoflush=False)
-        return Session()
-
-    def switch_session(self, dbpath):
-
-        try:
-            self.session.close()
-        except:
-            pass
-
-        engine = create_engine("sqlite:///{path:s}".format(path=dbpath),
-                               echo=False)
-        Session = sessionmaker(bind=engine, expire_on_commit=False,
-                               autoflush=False)
-        self.session = Session()
-
-    def get_batches(self):
-        '''
-        Return all batch records from the database.
-        '''
-
-        return self.session.query(Batch).order_by(Batch.id).all()
-
-    def get_components(self):
-        '''
-        Return all component records from the database.
-        '''
-
-        return self.session.query(Component).order_by(Component.id).all()
-
-    def get_categories(self):
-        '''
-        Return the list of category records from the database.
-        '''
-
-        return self.session.query(Category).order_by(Category.id).all()
-
-    def get_chemicals(self, components=None, showall=False):
-        '''
-        Return chemicals that are sources for the components present in the
-        components list, of the list is empty return all the components.
-        '''
-
-        if showall:
-            query = self.session.query(Chemical).order_by(Chemical.id).all()
-        else:
-            compset = set()
-            for comp in components:
-                temp = self.session.query(Chemical).join(Batch).\
-                    filter(Batch.component_id == comp.id).all()
-                compset.update(temp)
-                query = sorted(list(compset), key=lambda x: x.id)
-        return query
-
-    def get_electrolytes(self):
-        '''
-        Return the list of electrolyte records from the database.
-        '''
-
-        return self.session.query(Electrolyte).order_by(Electrolyte.id).all()
-
-    def get_kinds(self):
-        '''
-        Return the list of kind records from the database.
-        '''
-
-        return self.session.query(Kind).order_by(Kind.id).all()
-
-    def get_physical_forms(self):
-        '''
-        Return the list of physicalform records from the database.
-        '''
-
-        return self.session.query(PhysicalForm).order_by(PhysicalForm.id).all()
-
-    def get_reactions(self):
-        '''
-        Return the list of reaction records from the database.
-        '''
-
-        return self.session.query(Reaction).order_by(Reaction.id).all()
-
-    def get_syntheses(self):
-        '''
-        Return the list of synthesis records from the database.
-        '''
-
-        return self.session.query(Synthesis).order_by(Synthesis.id).all()
+__all__ = [
+    # dialogs
+    "ChemicalsDialog", "ComponentsDialog", "AddModifyBatchRecordDialog",
+    "AddModifyChemicalRecordDialog", "AddModifyComponentRecordDialog",
+    "AddModifySynthesisRecordDialog",
+    # re-exported from batchcalc.db
+    "DB", "Singleton", "bump_catalog_version", "changes_catalog",
+    "get_catalog_version", "print_attrs",
+    "add_batch_record", "delete_batch_record", "modify_batch_record",
+    "add_chemical_record", "delete_chemical_record", "modify_chemical_record",
+    "add_component_record", "delete_component_record",
+    "modify_component_record",
+    "add_reaction_record", "delete_reaction_record", "modify_reaction_record",
+    "add_category_record", "delete_category_record", "modify_category_record",
+    "fill_kinds_table", "add_kind_record", "delete_kind_record",
+    "modify_kind_record",
+    "fill_physical_forms_table", "add_physical_form_record",
+    "delete_physical_form_record", "modify_physical_form_record",
+    "fill_electrolytes_table", "add_electrolyte_record",
+    "delete_electrolyte_record", "modify_electrolyte_record",
+    "add_synthesis_record", "modify_synthesis_record",
+    "delete_synthesis_record",
+]
 
 
 class ChemicalsDialog(wx.Dialog):
@@ -1136,7 +1049,7 @@ class AddModifySynthesisRecordDialog(wx.Dialog):
         self.comp_olv.SetColumns(olv_cols)
 
         if self.add_record:
-            self.comp_olv.SetObjects(self.model.components)
+            self.comp_olv.SetObjects(self.model.state.components)
         else:
             if self.record is not None:
                 components = [c.component for c in self.record.components]
@@ -1152,7 +1065,7 @@ class AddModifySynthesisRecordDialog(wx.Dialog):
         self.chem_olv.SetColumns(olv_cols)
 
         if self.add_record:
-            self.chem_olv.SetObjects(self.model.chemicals)
+            self.chem_olv.SetObjects(self.model.state.chemicals)
         else:
             if self.record is not None:
                 chemicals = [c.chemical for c in self.record.chemicals]
@@ -1264,444 +1177,13 @@ class AddModifySynthesisRecordDialog(wx.Dialog):
         '''
 
         data = {'components': [], 'chemicals': []}
-        for component in self.model.components:
+        for component in self.model.state.components:
             data['components'].append(SynthesisComponent(component_id=component.id,
-                                                         component=component,
+                                                         component=component.object,
                                                          moles=component.moles))
-        for chemical in self.model.chemicals:
+        for chemical in self.model.state.chemicals:
             data['chemicals'].append(SynthesisChemical(chemical_id=chemical.id,
-                                                       chemical=chemical,
+                                                       chemical=chemical.object,
                                                        mass=chemical.mass))
 
         return data
-
-
-def print_attrs(inst):
-
-    print("Class {0}".format(inst.__class__.__name__))
-    for key in sorted(inst.__dict__.keys()):
-        if not key.startswith("_"):
-            print("{0:s} : {1:s}".format(key, str(getattr(inst, key))))
-
-
-################################################################################
-# controller methods
-################################################################################
-
-# Batch controller methods
-
-
-def add_batch_record(session, data):
-    """
-    Add a Batch record to the database, the data should be in the form of
-    a dictionary:
-
-    data = {'chemical_id' : '1', 'component_id' : '1', 'coefficient' : 0.5,
-            'reaction_id' : 3,}
-    """
-
-    batch = Batch(**data)
-    session.add(batch)
-    session.commit()
-
-
-def delete_batch_record(session, id_num):
-    """
-    Delete an exisitng Batch record.
-    """
-
-    batch = session.query(Batch).get(id_num)
-    session.delete(batch)
-    session.commit()
-
-
-def modify_batch_record(session, id_num, data):
-    """
-    Edit/Modify an existing Batch record.
-    """
-
-    batch = session.query(Batch).get(id_num)
-    batch.coefficient = data['coefficient']
-    if data['chemical_id'] is not None:
-        batch._chemical = session.query(Chemical).get(data['chemical_id'])
-    if data['component_id'] is not None:
-        batch._component = session.query(Component).get(data['component_id'])
-    if data['reaction_id'] is not None:
-        batch._reaction = session.query(Reaction).get(data['reaction_id'])
-    session.add(batch)
-    session.commit()
-
-
-# Chemical controller methods
-
-
-def add_chemical_record(session, data):
-    """
-    Add a Chemical record to the database, the data should be in the form of
-    a dictionary:
-
-    data = {'name' : 'water', 'formula' : 'H2O', 'molwt' : 18.0152,
-            '_kind_id' : 3, 'concentration' : 1.0, 'cas' : '7732-18-5',
-            '_physical_form_id' : 3, 'density' : 0.997}
-    """
-
-    kind = data.pop("kind", None)
-    electrolyte = data.pop("electrolyte", None)
-    if electrolyte == "Undefined":
-        electrolyte = None
-    physical_form = data.pop("physical_form", None)
-    if physical_form == "Undefined":
-        physical_form = None
-
-    for k, v in data.items():
-        if v == "":
-            data[k] = None
-
-    chemical = Chemical(**data)
-    chemical._kind = session.query(Kind).filter(Kind.name == kind).one()
-
-    if physical_form is not None:
-        chemical._physical_form = session.query(PhysicalForm).filter(PhysicalForm.form == physical_form).one()
-
-    if electrolyte is not None:
-        chemical._electrolyte = session.query(Electrolyte).filter(Electrolyte.name == electrolyte).one()
-
-    session.add(chemical)
-    session.commit()
-
-
-def delete_chemical_record(session, id_num):
-    """
-    Delete a Chemical record.
-    """
-
-    chemical = session.query(Chemical).get(id_num)
-    session.delete(chemical)
-    session.commit()
-
-
-def modify_chemical_record(session, id_num, data):
-    """
-    Edit/Modify Chemical record in the database,
-    """
-
-    kind = data.pop("kind", None)
-    electrolyte = data.pop("electrolyte", None)
-    if electrolyte == "Undefined":
-        electrolyte = None
-    physical_form = data.pop("physical_form", None)
-    if physical_form == "Undefined":
-        physical_form = None
-
-    chemical = session.query(Chemical).get(id_num)
-
-    for k, v in data.items():
-        if v == "":
-            data[k] = None
-        setattr(chemical, k, data[k])
-
-    chemical._kind = session.query(Kind).filter(Kind.name == kind).one()
-
-    if physical_form is not None:
-        chemical._physical_form = session.query(PhysicalForm).filter(PhysicalForm.form == physical_form).one()
-
-    if electrolyte is not None:
-        chemical._electrolyte = session.query(Electrolyte).filter(Electrolyte.name == electrolyte).one()
-
-    session.add(chemical)
-    session.commit()
-
-
-# Compoment controller methods
-
-
-def add_component_record(session, data):
-    """
-    Add a Component record to the database, the data should be in the form of
-    a dictionary:
-
-    data = {'name' : 'water', 'formula' : 'H2O', 'molwt' : 18.0152,
-            '_catgory_id' : 3, 'short_name' : ''}
-    """
-
-    category = data.pop("category", None)
-    if category == "Undefined":
-        category = None
-
-    component = Component(**data)
-
-    if category is not None:
-        component._category = session.query(Category).filter(Category.name == category).one()
-
-    session.add(component)
-    session.commit()
-
-
-def delete_component_record(session, id_num):
-    """
-    Delete a Component record.
-    """
-
-    component = session.query(Component).get(id_num)
-    session.delete(component)
-    session.commit()
-
-
-def modify_component_record(session, id_num, data):
-    """
-    Edit/Modify Component record in the database,
-    """
-
-    category = data.pop("category", None)
-    if category == "Undefined":
-        category = None
-
-    component = session.query(Component).get(id_num)
-
-    for k in data.keys():
-        setattr(component, k, data[k])
-
-    if category is not None:
-        component._category = session.query(Category).filter(Category.name == category).one()
-
-    session.add(component)
-    session.commit()
-
-
-# Reaction controller methods
-
-
-def add_reaction_record(session, data):
-
-    reaction = Reaction(reaction=data)
-    session.add(reaction)
-    session.commit()
-
-
-def delete_reaction_record(session, id_num):
-    """
-    Delete a Reaction record.
-    """
-
-    reaction = session.query(Reaction).get(id_num)
-    session.delete(reaction)
-    session.commit()
-
-
-def modify_reaction_record(session, id_num, data):
-    """
-    Modify/Edit an existing Reaction record in the database
-    """
-
-    reaction = session.query(Reaction).get(id_num)
-    reaction.reaction = data
-    session.add(reaction)
-    session.commit()
-
-
-# Category controller methods
-
-
-def add_category_record(session, data):
-
-    category = Category(name=data)
-    session.add(category)
-    session.commit()
-
-
-def delete_category_record(session, id_num):
-    """
-    Delete a category record.
-    """
-
-    category = session.query(Category).get(id_num)
-    session.delete(category)
-    session.commit()
-
-
-def modify_category_record(session, id_num, data):
-    """
-    Modify/Edit an existing Category record in the database
-    """
-
-    category = session.query(Category).get(id_num)
-    category.name = data
-    session.add(category)
-    session.commit()
-
-
-# Kinds controller methods
-
-
-def fill_kinds_table(session):
-    """
-    Fill the kinds table with allowed values
-    """
-
-    kinds = ["mixture", "solution", "reactant"]
-
-    for kind in kinds:
-        add_kind_record(session, kind)
-
-
-def add_kind_record(session, data):
-    """
-    Add a Kind record.
-    """
-
-    kind = Kind(name=data)
-    session.add(kind)
-    session.commit()
-
-
-def delete_kind_record(session, id_num):
-    """
-    Delete a Kind record.
-    """
-
-    kind = session.query(Kind).get(id_num)
-    session.delete(kind)
-    session.commit()
-
-
-def modify_kind_record(session, id_num, data):
-    """
-    Modify/Edit an existing Kind record in the database
-    """
-
-    kind = session.query(Kind).get(id_num)
-    kind.name = data
-    session.add(kind)
-    session.commit()
-
-
-# Physical_forms controller methods
-
-
-def fill_physical_forms_table(session):
-    """
-    Fill the physical_forms table with allowed values
-    """
-
-    phfs = ["crystals", "solid", "liquid", "gas"]
-
-    for phf in phfs:
-        add_physical_form_record(session, phf)
-
-
-def add_physical_form_record(session, data):
-    """
-    Add a PhysicalForm record.
-    """
-
-    phf = PhysicalForm(form=data)
-    session.add(phf)
-    session.commit()
-
-
-def delete_physical_form_record(session, id_num):
-    """
-    Delete a PhysicalForm record.
-    """
-
-    phf = session.query(PhysicalForm).get(id_num)
-    session.delete(phf)
-    session.commit()
-
-
-def modify_physical_form_record(session, id_num, data):
-    """
-    Modify/Edit an existing PhysicalForm record in the database
-    """
-
-    phf = session.query(PhysicalForm).get(id_num)
-    phf.form = data
-    session.add(phf)
-    session.commit()
-
-
-# Electrolyte controller methods
-
-
-def fill_electrolytes_table(session):
-    """
-    Fill the electrolyte table with allowed values
-    """
-
-    elecs = ["nonelectrolyte", "strong acid", "strong base", "weak acid",
-             "weak base"]
-
-    for elec in elecs:
-        add_electrolyte_record(session, elec)
-
-
-def add_electrolyte_record(session, data):
-    """
-    Add a Electrolyte record.
-    """
-
-    elec = Electrolyte(name=data)
-    session.add(elec)
-    session.commit()
-
-
-def delete_electrolyte_record(session, id_num):
-    """
-    Delete a Electrolyte record.
-    """
-
-    elec = session.query(Electrolyte).get(id_num)
-    session.delete(elec)
-    session.commit()
-
-
-def modify_electrolyte_record(session, id_num, data):
-    """
-    Modify/Edit an existing Electrolyte record in the database
-    """
-
-    elec = session.query(Electrolyte).get(id_num)
-    elec.name = data
-    session.add(elec)
-    session.commit()
-
-
-# Synthesis controller methods
-
-
-def add_synthesis_record(session, data):
-    """
-    Add a Synthesis record.
-    """
-
-    synth = Synthesis(**data)
-    if 'chemicals' in data.keys():
-        synth.chemicals = data['chemicals']
-    if 'components' in data.keys():
-        synth.components = data['components']
-    session.add(synth)
-    session.commit()
-
-
-def modify_synthesis_record(session, id_num, data):
-    """
-    Modify/Edit an existing Synthesis record in the database
-    """
-
-    synth = session.query(Synthesis).get(id_num)
-
-    for k in data.keys():
-        setattr(synth, k, data[k])
-
-    session.add(synth)
-    session.commit()
-
-
-def delete_synthesis_record(session, id_num):
-    """
-    Delete a Synthesis record.
-    """
-
-    synth = session.query(Synthesis).get(id_num)
-    session.delete(synth)
-    session.commit()
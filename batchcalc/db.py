@@ -0,0 +1,1043 @@
+# db.py
+#
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import print_function, unicode_literals
+
+import functools
+import multiprocessing
+import os
+import threading
+import warnings
+
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import (joinedload, load_only, scoped_session,
+                            selectinload, sessionmaker)
+from sqlalchemy.pool import QueuePool
+from batchcalc.model import (Chemical, Component, Electrolyte, Kind, Category,
+                             Reaction, PhysicalForm, Batch, Synthesis,
+                             SynthesisChemical, SynthesisComponent)
+
+from batchcalc import migrations, search
+from batchcalc.utils import get_resource_path
+
+
+__version__ = "0.3.1"
+
+
+#['batches', 'components', 'categories', 'chemicals', 'electrolytes', 'kinds',
+# 'reactions', 'physical_forms', 'syntheses']
+
+
+_catalog_version = [0]
+
+
+def get_catalog_version():
+    '''
+    Return the version stamp of the catalog, it changes every time a record
+    is added, modified or deleted and when the database is switched.
+    '''
+
+    return _catalog_version[0]
+
+
+def bump_catalog_version():
+    '''
+    Mark the catalog as changed, invalidating the data derived from it.
+    '''
+
+    _catalog_version[0] += 1
+
+
+# last value of the catalog_changes counter read from each database (by url)
+_change_counters = {}
+
+
+def refresh_catalog_version(session):
+    '''
+    Read the counter of changes kept in the database of the `session` by
+    triggers (see `migrations.add_catalog_changes`) and bump the catalog
+    version if it changed since the last refresh, so that the changes made
+    by other connections or processes (e.g. zbc-import) are seen. Return
+    True if the catalog version was bumped.
+
+    The counter is read only here, at the points where the records could
+    have been changed elsewhere (e.g. when the application window is
+    activated), so the calculations never query the database for it.
+    '''
+
+    if session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                            "AND name = 'catalog_changes'")).first() is None:
+        return False
+
+    url = str(session.get_bind().url)
+    counter = session.execute(text("SELECT counter FROM catalog_changes")).scalar()
+    previous = _change_counters.get(url)
+    _change_counters[url] = counter
+    if counter == previous:
+        return False
+    bump_catalog_version()
+    return True
+
+
+def changes_catalog(func):
+    '''
+    Decorator for the controller methods modifying the database records.
+    '''
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bump_catalog_version()
+    return wrapper
+
+
+class Singleton(type):
+
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __call__(cls, *args, **kwargs):
+        if cls not in cls._instances:
+            with cls._lock:
+                if cls not in cls._instances:
+                    cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+# PRAGMA settings applied to every new SQLite connection, "default" keeps
+# the SQLite defaults
+SQLITE_PROFILES = {
+    "default": OrderedDict(),
+    "performance": OrderedDict([
+        # readers do not block the writer and commits append to the log
+        ("journal_mode", "WAL"),
+        # with WAL the database stays consistent without a sync per commit
+        ("synchronous", "NORMAL"),
+        # 64 MB page cache (negative values are in KiB)
+        ("cache_size", -65536),
+        ("mmap_size", 268435456),
+        ("temp_store", "MEMORY"),
+        # wait for locks held by other connections instead of failing
+        ("busy_timeout", 5000),
+    ]),
+}
+
+
+def is_bundled_or_read_only(dbpath):
+    '''
+    Return True for the database bundled with the package and for the
+    databases in a read-only file or directory. Their schema and journal
+    mode are never changed, the bundled database is shipped at the latest
+    schema version.
+    '''
+
+    dbpath = os.path.abspath(dbpath)
+    return dbpath == os.path.abspath(get_resource_path('data', 'zeolite.db')) or \
+        not os.access(os.path.dirname(dbpath), os.W_OK) or \
+        (os.path.exists(dbpath) and not os.access(dbpath, os.W_OK))
+
+
+def get_pragmas(dbpath, profile):
+    '''
+    Return the PRAGMA settings of the `profile` (name from SQLITE_PROFILES
+    or a dict) for the database at `dbpath`.
+
+    The journal mode is stored in the database file and WAL needs to create
+    files next to it, so it is left out for the database bundled with the
+    package and for read-only databases, see `is_bundled_or_read_only`.
+    Without WAL the synchronous
+    setting is not relaxed below the SQLite default, as the database could
+    be corrupted by a power loss.
+    '''
+
+    if isinstance(profile, dict):
+        pragmas = OrderedDict(profile)
+    else:
+        pragmas = OrderedDict(SQLITE_PROFILES[profile])
+
+    if "journal_mode" in pragmas and is_bundled_or_read_only(dbpath):
+        del pragmas["journal_mode"]
+    if str(pragmas.get("journal_mode", "")).upper() != "WAL" and \
+            str(pragmas.get("synchronous", "")).upper() in ("OFF", "NORMAL", "0", "1"):
+        del pragmas["synchronous"]
+    return pragmas
+
+
+def get_pool_size():
+    '''
+    Return the default number of connections kept open by the pool of an
+    engine, two per CPU.
+    '''
+
+    return 2 * multiprocessing.cpu_count()
+
+
+def get_engine(dbpath, profile="performance", pool_size=None):
+    '''
+    Return an engine for the SQLite database at `dbpath` with a pool of
+    connections that can be used from any thread, one at a time. The PRAGMA
+    settings of the `profile` are applied to each new connection.
+
+    The pool keeps up to `pool_size` connections open (default from
+    `get_pool_size`), the threads needing more get new connections that are
+    closed when returned, so the number of threads is not limited.
+    '''
+
+    if pool_size is None:
+        pool_size = get_pool_size()
+    engine = create_engine("sqlite:///{path:s}".format(path=dbpath), echo=False,
+                           poolclass=QueuePool, pool_size=pool_size, max_overflow=-1,
+                           connect_args={"check_same_thread": False})
+
+    pragmas = get_pragmas(dbpath, profile)
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute("PRAGMA {0:s} = {1}".format(name, value))
+            cursor.close()
+
+    return engine
+
+
+def open_engine(dbpath, profile="performance", pool_size=None):
+    '''
+    Return the engine for the database at `dbpath` (see `get_engine`) with
+    the schema upgraded to the latest version, see `batchcalc.migrations`,
+    and the full text indexes created when SQLite supports them, see
+    `batchcalc.search.update_indexes`. The bundled and the read-only
+    databases are used as they are.
+    '''
+
+    engine = get_engine(dbpath, profile, pool_size)
+    _change_counters.pop(str(engine.url), None)
+    if is_bundled_or_read_only(dbpath):
+        return engine
+    try:
+        migrations.upgrade(engine)
+        search.update_indexes(engine)
+    except OperationalError as err:
+        # e.g. a database locked by another process, it can still be used
+        # as it is
+        warnings.warn("cannot upgrade the schema of {0}: {1}".format(dbpath, err))
+    return engine
+
+
+def open_session(dbpath=None, profile="performance"):
+    '''
+    Return a new session of the database at `dbpath` (default: the bundled
+    database) for the command line tools, which use a single database and
+    do not need the application wide `DB`.
+    '''
+
+    if dbpath is None:
+        dbpath = get_resource_path('data', 'zeolite.db')
+    return sessionmaker(bind=open_engine(dbpath, profile),
+                        expire_on_commit=False, autoflush=False)()
+
+
+# base class created with the metaclass in a way that works with both
+# python 2 and 3
+_SingletonBase = Singleton(str("_SingletonBase"), (object,), {})
+
+
+# relationships behind the association proxies shown in the record listings
+LISTED_RELATIONSHIPS = {
+    Batch: [Batch._chemical, Batch._component, Batch._reaction],
+    Chemical: [Chemical._kind, Chemical._electrolyte, Chemical._physical_form],
+    Component: [Component._category],
+}
+
+# loader option of the relationships for each loading strategy, "lazy"
+# keeps the default of loading each related record when first accessed
+LOADERS = {
+    "joined": joinedload,
+    "selectin": selectinload,
+    "lazy": None,
+}
+
+
+def get_loader_options(model, loading):
+    '''
+    Return the query options loading the `LISTED_RELATIONSHIPS` of the
+    `model` with the `loading` strategy (see `LOADERS`).
+    '''
+
+    try:
+        loader = LOADERS[loading]
+    except KeyError:
+        raise ValueError("unknown loading strategy: {0}".format(loading))
+
+    if loader is None:
+        return []
+    return [loader(rel) for rel in LISTED_RELATIONSHIPS.get(model, [])]
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses"])
+
+
+class ReferenceCache(object):
+    '''
+    Read-through cache of the records of the reference tables (kinds,
+    categories, electrolytes, physical forms). The records are kept in the
+    `info` of the session they were loaded by, so the threads never share
+    them, and are loaded again after the catalog version changes, i.e. after
+    any of the controller methods modifying the records was called. The
+    hits are served without any database query.
+    '''
+
+    def __init__(self):
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, session, model):
+        '''
+        Return the list of all the `model` records ordered by id.
+        '''
+
+        version = get_catalog_version()
+        cached = session.info.get("references")
+        if cached is None or cached[0] != version:
+            cached = (version, {})
+            session.info["references"] = cached
+
+        records = cached[1].get(model)
+        hit = records is not None and all(r in session for r in records)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            records = cached[1][model] = session.query(model).order_by(model.id).all()
+        return list(records)
+
+    def cache_info(self):
+        '''
+        Return the numbers of hits and misses as a CacheInfo tuple.
+        '''
+
+        with self._lock:
+            return CacheInfo(self.hits, self.misses)
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+class DB(_SingletonBase):
+    '''
+    Access to the database shared by the whole application.
+
+    Every thread gets its own session (and connection when it queries) from
+    the `session` property, all the sessions are created from the same
+    engine. Threads should call `remove_session` when they are done with
+    the database.
+
+    The connections are configured with the SQLite settings of `profile`,
+    see SQLITE_PROFILES, and up to `pool_size` of them are kept open, see
+    `get_engine`. The listing methods load the records shown through
+    association proxies with the `loading` strategy, see LOADERS, and the
+    records of the reference tables are cached in `references`.
+    '''
+
+    profile = "performance"
+    loading = "joined"
+    pool_size = None
+
+    def __init__(self):
+
+        self._lock = threading.RLock()
+        self.references = ReferenceCache()
+        self.engine = self.open_engine(self.dbpath)
+        self.Session = self.get_session()
+
+    @property
+    def session(self):
+        '''
+        Return the session of the current thread.
+        '''
+
+        return self.Session()
+
+    @property
+    def dbpath(self):
+        '''
+        Depending on the execution environment get the proper database path.
+        '''
+
+        return get_resource_path('data', 'zeolite.db')
+
+    def open_engine(self, dbpath):
+        '''
+        Return the engine for the database at `dbpath`, see `open_engine`.
+        '''
+
+        return open_engine(dbpath, self.profile, self.pool_size)
+
+    def get_session(self):
+        '''
+        Return the registry of thread-local sessions bound to the engine.
+        '''
+
+        return scoped_session(sessionmaker(bind=self.engine,
+                                           expire_on_commit=False,
+                                           autoflush=False))
+
+    def remove_session(self):
+        '''
+        Close the session of the current thread and return its connection to
+        the pool.
+        '''
+
+        self.Session.remove()
+
+    def switch_session(self, dbpath, profile=None):
+        '''
+        Switch all the threads to the database at `dbpath`, optionally with a
+        different SQLite `profile`.
+
+        The new engine and session registry replace the old ones at once, so
+        every thread gets a session of the new database the next time it
+        asks for `session`.
+        '''
+
+        if profile is not None:
+            self.profile = profile
+        engine = self.open_engine(dbpath)
+        with self._lock:
+            old_engine, old_session = self.engine, self.Session
+            self.engine = engine
+            self.Session = self.get_session()
+            bump_catalog_version()
+
+        try:
+            old_session.remove()
+        except Exception:
+            pass
+        old_engine.dispose()
+
+    def query(self, model, loading=None):
+        '''
+        Return a query for the `model` records loading the related records
+        with the `loading` strategy, `DB.loading` by default.
+        '''
+
+        if loading is None:
+            loading = self.loading
+        return self.session.query(model).options(*get_loader_options(model, loading))
+
+    def search(self, model, keywords, limit=None, loading=None):
+        '''
+        Return the `model` records (chemicals, components or syntheses)
+        matching all the words of `keywords` as prefixes, best matches
+        first, see `batchcalc.search`.
+        '''
+
+        query = search.search(self.query(model, loading), model, keywords)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def get_batches(self, loading=None):
+        '''
+        Return all batch records from the database.
+        '''
+
+        return self.query(Batch, loading).order_by(Batch.id).all()
+
+    def get_components(self, loading=None):
+        '''
+        Return all component records from the database.
+        '''
+
+        return self.query(Component, loading).order_by(Component.id).all()
+
+    def get_categories(self):
+        '''
+        Return the list of category records from the database.
+        '''
+
+        return self.references.get(self.session, Category)
+
+    def get_chemicals(self, components=None, showall=False, loading=None):
+        '''
+        Return chemicals that are sources for the components present in the
+        components list ordered by id, if the list is empty or `showall` is
+        True return all the chemicals.
+
+        The sources are found with a single query and remembered in the
+        session for the ids of the components until the catalog changes or
+        the records are expunged from the session.
+        '''
+
+        if showall or not components:
+            return self.query(Chemical, loading).order_by(Chemical.id).all()
+
+        if loading is None:
+            loading = self.loading
+        ids = tuple(sorted(set(comp.id for comp in components)))
+        version = get_catalog_version()
+
+        cached = self.session.info.get("chemical_sources")
+        if cached is None or cached[0] != version:
+            cached = (version, {})
+            self.session.info["chemical_sources"] = cached
+        sources = cached[1]
+
+        result = sources.get((ids, loading))
+        if result is None or not all(chem in self.session for chem in result):
+            result = sources[(ids, loading)] = self.query(Chemical, loading).join(Batch).\
+                filter(Batch.component_id.in_(ids)).\
+                distinct().order_by(Chemical.id).all()
+        return list(result)
+
+    def get_electrolytes(self):
+        '''
+        Return the list of electrolyte records from the database.
+        '''
+
+        return self.references.get(self.session, Electrolyte)
+
+    def get_kinds(self):
+        '''
+        Return the list of kind records from the database.
+        '''
+
+        return self.references.get(self.session, Kind)
+
+    def get_physical_forms(self):
+        '''
+        Return the list of physicalform records from the database.
+        '''
+
+        return self.references.get(self.session, PhysicalForm)
+
+    def get_reactions(self):
+        '''
+        Return the list of reaction records from the database.
+        '''
+
+        return self.session.query(Reaction).order_by(Reaction.id).all()
+
+    def get_syntheses(self):
+        '''
+        Return the list of synthesis records from the database.
+        '''
+
+        return self.session.query(Synthesis).order_by(Synthesis.id).all()
+
+    def query_synthesis_list(self):
+        '''
+        Return the query of the syntheses loading only the columns shown in
+        the list of syntheses, see `get_synthesis` for the details.
+        '''
+
+        return self.session.query(Synthesis).options(load_only(
+            Synthesis.name, Synthesis.target_material, Synthesis.laborant,
+            Synthesis.reference, Synthesis.temperature, Synthesis.description))
+
+    def get_synthesis(self, id_num):
+        '''
+        Return the synthesis record with its components and chemicals.
+        '''
+
+        return self.session.query(Synthesis).options(
+            selectinload(Synthesis.components).joinedload(SynthesisComponent.component),
+            selectinload(Synthesis.chemicals).joinedload(SynthesisChemical.chemical),
+        ).populate_existing().filter(Synthesis.id == id_num).one()
+
+
+def print_attrs(inst):
+
+    print("Class {0}".format(inst.__class__.__name__))
+    for key in sorted(inst.__dict__.keys()):
+        if not key.startswith("_"):
+            print("{0:s} : {1:s}".format(key, str(getattr(inst, key))))
+
+
+################################################################################
+# controller methods
+################################################################################
+
+# Batch controller methods
+
+
+@changes_catalog
+def add_batch_record(session, data):
+    """
+    Add a Batch record to the database, the data should be in the form of
+    a dictionary:
+
+    data = {'chemical_id' : '1', 'component_id' : '1', 'coefficient' : 0.5,
+            'reaction_id' : 3,}
+    """
+
+    batch = Batch(**data)
+    session.add(batch)
+    session.commit()
+
+
+@changes_catalog
+def delete_batch_record(session, id_num):
+    """
+    Delete an exisitng Batch record.
+    """
+
+    batch = session.query(Batch).get(id_num)
+    session.delete(batch)
+    session.commit()
+
+
+@changes_catalog
+def modify_batch_record(session, id_num, data):
+    """
+    Edit/Modify an existing Batch record.
+    """
+
+    batch = session.query(Batch).get(id_num)
+    batch.coefficient = data['coefficient']
+    if data['chemical_id'] is not None:
+        batch._chemical = session.query(Chemical).get(data['chemical_id'])
+    if data['component_id'] is not None:
+        batch._component = session.query(Component).get(data['component_id'])
+    if data['reaction_id'] is not None:
+        batch._reaction = session.query(Reaction).get(data['reaction_id'])
+    session.add(batch)
+    session.commit()
+
+
+# Chemical controller methods
+
+
+@changes_catalog
+def add_chemical_record(session, data):
+    """
+    Add a Chemical record to the database, the data should be in the form of
+    a dictionary:
+
+    data = {'name' : 'water', 'formula' : 'H2O', 'molwt' : 18.0152,
+            '_kind_id' : 3, 'concentration' : 1.0, 'cas' : '7732-18-5',
+            '_physical_form_id' : 3, 'density' : 0.997}
+    """
+
+    kind = data.pop("kind", None)
+    electrolyte = data.pop("electrolyte", None)
+    if electrolyte == "Undefined":
+        electrolyte = None
+    physical_form = data.pop("physical_form", None)
+    if physical_form == "Undefined":
+        physical_form = None
+
+    for k, v in data.items():
+        if v == "":
+            data[k] = None
+
+    chemical = Chemical(**data)
+    chemical._kind = session.query(Kind).filter(Kind.name == kind).one()
+
+    if physical_form is not None:
+        chemical._physical_form = session.query(PhysicalForm).filter(PhysicalForm.form == physical_form).one()
+
+    if electrolyte is not None:
+        chemical._electrolyte = session.query(Electrolyte).filter(Electrolyte.name == electrolyte).one()
+
+    session.add(chemical)
+    session.commit()
+
+
+@changes_catalog
+def delete_chemical_record(session, id_num):
+    """
+    Delete a Chemical record.
+    """
+
+    chemical = session.query(Chemical).get(id_num)
+    session.delete(chemical)
+    session.commit()
+
+
+@changes_catalog
+def modify_chemical_record(session, id_num, data):
+    """
+    Edit/Modify Chemical record in the database,
+    """
+
+    kind = data.pop("kind", None)
+    electrolyte = data.pop("electrolyte", None)
+    if electrolyte == "Undefined":
+        electrolyte = None
+    physical_form = data.pop("physical_form", None)
+    if physical_form == "Undefined":
+        physical_form = None
+
+    chemical = session.query(Chemical).get(id_num)
+
+    for k, v in data.items():
+        if v == "":
+            data[k] = None
+        setattr(chemical, k, data[k])
+
+    chemical._kind = session.query(Kind).filter(Kind.name == kind).one()
+
+    if physical_form is not None:
+        chemical._physical_form = session.query(PhysicalForm).filter(PhysicalForm.form == physical_form).one()
+
+    if electrolyte is not None:
+        chemical._electrolyte = session.query(Electrolyte).filter(Electrolyte.name == electrolyte).one()
+
+    session.add(chemical)
+    session.commit()
+
+
+# Compoment controller methods
+
+
+@changes_catalog
+def add_component_record(session, data):
+    """
+    Add a Component record to the database, the data should be in the form of
+    a dictionary:
+
+    data = {'name' : 'water', 'formula' : 'H2O', 'molwt' : 18.0152,
+            '_catgory_id' : 3, 'short_name' : ''}
+    """
+
+    category = data.pop("category", None)
+    if category == "Undefined":
+        category = None
+
+    component = Component(**data)
+
+    if category is not None:
+        component._category = session.query(Category).filter(Category.name == category).one()
+
+    session.add(component)
+    session.commit()
+
+
+@changes_catalog
+def delete_component_record(session, id_num):
+    """
+    Delete a Component record.
+    """
+
+    component = session.query(Component).get(id_num)
+    session.delete(component)
+    session.commit()
+
+
+@changes_catalog
+def modify_component_record(session, id_num, data):
+    """
+    Edit/Modify Component record in the database,
+    """
+
+    category = data.pop("category", None)
+    if category == "Undefined":
+        category = None
+
+    component = session.query(Component).get(id_num)
+
+    for k in data.keys():
+        setattr(component, k, data[k])
+
+    if category is not None:
+        component._category = session.query(Category).filter(Category.name == category).one()
+
+    session.add(component)
+    session.commit()
+
+
+# Reaction controller methods
+
+
+@changes_catalog
+def add_reaction_record(session, data):
+
+    reaction = Reaction(reaction=data)
+    session.add(reaction)
+    session.commit()
+
+
+@changes_catalog
+def delete_reaction_record(session, id_num):
+    """
+    Delete a Reaction record.
+    """
+
+    reaction = session.query(Reaction).get(id_num)
+    session.delete(reaction)
+    session.commit()
+
+
+@changes_catalog
+def modify_reaction_record(session, id_num, data):
+    """
+    Modify/Edit an existing Reaction record in the database
+    """
+
+    reaction = session.query(Reaction).get(id_num)
+    reaction.reaction = data
+    session.add(reaction)
+    session.commit()
+
+
+# Category controller methods
+
+
+@changes_catalog
+def add_category_record(session, data):
+
+    category = Category(name=data)
+    session.add(category)
+    session.commit()
+
+
+@changes_catalog
+def delete_category_record(session, id_num):
+    """
+    Delete a category record.
+    """
+
+    category = session.query(Category).get(id_num)
+    session.delete(category)
+    session.commit()
+
+
+@changes_catalog
+def modify_category_record(session, id_num, data):
+    """
+    Modify/Edit an existing Category record in the database
+    """
+
+    category = session.query(Category).get(id_num)
+    category.name = data
+    session.add(category)
+    session.commit()
+
+
+# Kinds controller methods
+
+
+def fill_kinds_table(session):
+    """
+    Fill the kinds table with allowed values
+    """
+
+    kinds = ["mixture", "solution", "reactant"]
+
+    for kind in kinds:
+        add_kind_record(session, kind)
+
+
+@changes_catalog
+def add_kind_record(session, data):
+    """
+    Add a Kind record.
+    """
+
+    kind = Kind(name=data)
+    session.add(kind)
+    session.commit()
+
+
+@changes_catalog
+def delete_kind_record(session, id_num):
+    """
+    Delete a Kind record.
+    """
+
+    kind = session.query(Kind).get(id_num)
+    session.delete(kind)
+    session.commit()
+
+
+@changes_catalog
+def modify_kind_record(session, id_num, data):
+    """
+    Modify/Edit an existing Kind record in the database
+    """
+
+    kind = session.query(Kind).get(id_num)
+    kind.name = data
+    session.add(kind)
+    session.commit()
+
+
+# Physical_forms controller methods
+
+
+def fill_physical_forms_table(session):
+    """
+    Fill the physical_forms table with allowed values
+    """
+
+    phfs = ["crystals", "solid", "liquid", "gas"]
+
+    for phf in phfs:
+        add_physical_form_record(session, phf)
+
+
+@changes_catalog
+def add_physical_form_record(session, data):
+    """
+    Add a PhysicalForm record.
+    """
+
+    phf = PhysicalForm(form=data)
+    session.add(phf)
+    session.commit()
+
+
+@changes_catalog
+def delete_physical_form_record(session, id_num):
+    """
+    Delete a PhysicalForm record.
+    """
+
+    phf = session.query(PhysicalForm).get(id_num)
+    session.delete(phf)
+    session.commit()
+
+
+@changes_catalog
+def modify_physical_form_record(session, id_num, data):
+    """
+    Modify/Edit an existing PhysicalForm record in the database
+    """
+
+    phf = session.query(PhysicalForm).get(id_num)
+    phf.form = data
+    session.add(phf)
+    session.commit()
+
+
+# Electrolyte controller methods
+
+
+def fill_electrolytes_table(session):
+    """
+    Fill the electrolyte table with allowed values
+    """
+
+    elecs = ["nonelectrolyte", "strong acid", "strong base", "weak acid",
+             "weak base"]
+
+    for elec in elecs:
+        add_electrolyte_record(session, elec)
+
+
+@changes_catalog
+def add_electrolyte_record(session, data):
+    """
+    Add a Electrolyte record.
+    """
+
+    elec = Electrolyte(name=data)
+    session.add(elec)
+    session.commit()
+
+
+@changes_catalog
+def delete_electrolyte_record(session, id_num):
+    """
+    Delete a Electrolyte record.
+    """
+
+    elec = session.query(Electrolyte).get(id_num)
+    session.delete(elec)
+    session.commit()
+
+
+@changes_catalog
+def modify_electrolyte_record(session, id_num, data):
+    """
+    Modify/Edit an existing Electrolyte record in the database
+    """
+
+    elec = session.query(Electrolyte).get(id_num)
+    elec.name = data
+    session.add(elec)
+    session.commit()
+
+
+# Synthesis controller methods
+
+
+@changes_catalog
+def add_synthesis_record(session, data):
+    """
+    Add a Synthesis record.
+    """
+
+    synth = Synthesis(**data)
+    if 'chemicals' in data.keys():
+        synth.chemicals = data['chemicals']
+    if 'components' in data.keys():
+        synth.components = data['components']
+    session.add(synth)
+    session.commit()
+
+
+@changes_catalog
+def modify_synthesis_record(session, id_num, data):
+    """
+    Modify/Edit an existing Synthesis record in the database
+    """
+
+    synth = session.query(Synthesis).get(id_num)
+
+    for k in data.keys():
+        setattr(synth, k, data[k])
+
+    session.add(synth)
+    session.commit()
+
+
+@changes_catalog
+def delete_synthesis_record(session, id_num):
+    """
+    Delete a Synthesis record.
+    """
+
+    synth = session.query(Synthesis).get(id_num)
+    session.delete(synth)
+    session.commit()
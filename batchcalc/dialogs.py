@@ -492,9 +492,9 @@ class RescaleToSampleDialog(wx.Dialog):
 
         self.olv.SetColumns(cols)
         self.olv.CreateCheckStateColumn()
-        for item in model.chemicals:
+        for item in model.state.chemicals:
             self.olv.Check(item)
-        self.olv.SetObjects(model.chemicals)
+        self.olv.SetObjects(model.state.chemicals)
 
     def GetCurrentSelections(self):
         '''
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import io
+import os
+import sys
+
+from collections import namedtuple
+
+from sqlalchemy.exc import DBAPIError
+
+from batchcalc.db import bump_catalog_version, open_session
+from batchcalc.model import (Batch, Category, Chemical, Component, Electrolyte,
+                             Kind, PhysicalForm, Reaction)
+from batchcalc.utils import index_names, read_records
+
+__version__ = "0.3.1"
+
+
+ImportReport = namedtuple("ImportReport", ["inserted", "errors"])
+
+# values of the optional references meaning "no reference"
+UNDEFINED = ("", "undefined", "none", "null")
+
+
+def index_columns(session, columns):
+    '''
+    Return a dictionary mapping the ids and the lower case values of the
+    `columns` to the ids, see `batchcalc.utils.index_names`. All the
+    `columns` have to be attributes of the same mapped class.
+    '''
+
+    idcol = columns[0].class_.id
+    rows = session.query(idcol, *columns).order_by(idcol).all()
+    return index_names([(row[0], row[0], row[1:]) for row in rows])
+
+
+class ReferenceLookup(object):
+    '''
+    Resolve the names of the referenced records to their ids, the tables are
+    read once with a single query each so that no queries are issued while
+    the rows are converted.
+    '''
+
+    def __init__(self, session):
+
+        self.tables = {
+            "kind": index_columns(session, [Kind.name]),
+            "category": index_columns(session, [Category.name]),
+            "electrolyte": index_columns(session, [Electrolyte.name]),
+            "physical_form": index_columns(session, [PhysicalForm.form]),
+            "reaction": index_columns(session, [Reaction.reaction]),
+            "chemical": index_columns(session, [Chemical.name, Chemical.short_name]),
+            "component": index_columns(session, [Component.formula,
+                                                 Component.short_name,
+                                                 Component.name]),
+        }
+
+    def get_id(self, table, key, required=False):
+        '''
+        Return the id of the `table` record given by its id or name, None
+        for undefined optional references.
+        '''
+
+        if key is None or str(key).strip().lower() in UNDEFINED:
+            if required:
+                raise ValueError("missing {0}".format(table))
+            return None
+        try:
+            return self.tables[table][str(key).strip().lower()]
+        except KeyError:
+            raise ValueError("unknown {0}: {1}".format(table, key))
+
+
+def get_value(row, key, required=False):
+    '''
+    Return the stripped string value of `key` in the `row`, empty values are
+    returned as None.
+    '''
+
+    value = row.get(key)
+    if value is not None:
+        value = str(value).strip()
+        if value == "":
+            value = None
+    if value is None and required:
+        raise ValueError("missing {0}".format(key))
+    return value
+
+
+def get_float(row, key, required=False):
+
+    value = get_value(row, key, required)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError("{0} is not a number: {1}".format(key, value))
+
+
+def convert_chemical(row, lookup):
+    '''
+    Return the column values of the chemicals table for the `row`.
+    '''
+
+    return {
+        "name": get_value(row, "name", required=True),
+        "formula": get_value(row, "formula", required=True),
+        "molwt": get_float(row, "molwt", required=True),
+        "short_name": get_value(row, "short_name"),
+        "concentration": get_float(row, "concentration"),
+        "cas": get_value(row, "cas"),
+        "density": get_float(row, "density"),
+        "pk": get_float(row, "pk"),
+        "smiles": get_value(row, "smiles"),
+        "kind_id": lookup.get_id("kind", row.get("kind"), required=True),
+        "electrolyte_id": lookup.get_id("electrolyte", row.get("electrolyte")),
+        "physical_form_id": lookup.get_id("physical_form", row.get("physical_form")),
+    }
+
+
+def convert_component(row, lookup):
+    '''
+    Return the column values of the components table for the `row`.
+    '''
+
+    return {
+        "name": get_value(row, "name", required=True),
+        "formula": get_value(row, "formula", required=True),
+        "molwt": get_float(row, "molwt", required=True),
+        "short_name": get_value(row, "short_name"),
+        "category_id": lookup.get_id("category", row.get("category")),
+    }
+
+
+def convert_batch(row, lookup):
+    '''
+    Return the column values of the batch table for the `row`, the chemical,
+    component and reaction are given by their ids or names.
+    '''
+
+    return {
+        "chemical_id": lookup.get_id("chemical", row.get("chemical"), required=True),
+        "component_id": lookup.get_id("component", row.get("component"), required=True),
+        "reaction_id": lookup.get_id("reaction", row.get("reaction")),
+        "coefficient": get_float(row, "coefficient", required=True),
+    }
+
+
+# table name: (mapped class, row converter)
+TABLES = {
+    "chemicals": (Chemical, convert_chemical),
+    "components": (Component, convert_component),
+    "batch": (Batch, convert_batch),
+}
+
+
+def read_rows(fobj, fmt):
+    '''
+    Generator yielding the rows read from a CSV or JSONL stream one at a time
+    as dictionaries, lines that cannot be parsed are yielded as ValueError
+    instances.
+    '''
+
+    return read_records(fobj, fmt, name="row")
+
+
+def insert_rows(session, table, pending, errors):
+    '''
+    Insert the `pending` list of (row number, values) tuples with a single
+    executemany in one transaction. If the database rejects the batch the
+    rows are retried one at a time to find the offending ones, which are
+    appended to `errors`. Return the number of inserted rows.
+    '''
+
+    try:
+        session.execute(table.insert(), [values for _, values in pending])
+        session.commit()
+        return len(pending)
+    except DBAPIError:
+        session.rollback()
+
+    inserted = 0
+    for n, values in pending:
+        try:
+            session.execute(table.insert(), [values])
+            session.commit()
+            inserted += 1
+        except DBAPIError as err:
+            session.rollback()
+            errors.append((n, str(err.orig)))
+    return inserted
+
+
+def import_rows(session, table, rows, batch_size=500):
+    '''
+    Insert the `rows` (dictionaries, see `read_rows`) into `table` (one of
+    `TABLES`) and return an `ImportReport` with the number of inserted rows
+    and the list of (row number, message) tuples of the rejected rows.
+
+    Chemicals have the columns of the `Chemical` record with the `kind`,
+    `electrolyte` and `physical_form` given by name, components have the
+    `category` given by name and the batch links have the `chemical`,
+    `component` and `reaction` given by id or name and the `coefficient`.
+
+    Rows are inserted in transactions of `batch_size` rows, rejected rows
+    do not stop the import.
+    '''
+
+    try:
+        model, convert = TABLES[table]
+    except KeyError:
+        raise ValueError("cannot import table: {0}".format(table))
+
+    lookup = ReferenceLookup(session)
+    inserted = 0
+    errors = []
+    pending = []
+    for n, row in enumerate(rows, start=1):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            pending.append((n, convert(row, lookup)))
+        except ValueError as err:
+            errors.append((n, str(err)))
+        if len(pending) >= batch_size:
+            inserted += insert_rows(session, model.__table__, pending, errors)
+            pending = []
+    if len(pending) > 0:
+        inserted += insert_rows(session, model.__table__, pending, errors)
+
+    if inserted > 0:
+        bump_catalog_version()
+    return ImportReport(inserted, sorted(errors))
+
+
+def import_file(session, table, path, fmt=None, batch_size=500):
+    '''
+    Import the rows of a CSV or JSONL file, the format is guessed from the
+    extension if not given, see `import_rows`.
+    '''
+
+    if fmt is None:
+        fmt = "csv" if os.path.splitext(path)[1].lower() == ".csv" else "jsonl"
+
+    with io.open(path, "r", newline="" if fmt == "csv" else None) as fobj:
+        return import_rows(session, table, read_rows(fobj, fmt), batch_size)
+
+
+def get_parser():
+
+    parser = argparse.ArgumentParser(
+        prog="zbc-import",
+        description="Import chemicals, components or batch links from a CSV "
+                    "or JSONL file.")
+    parser.add_argument("table", choices=sorted(TABLES.keys()))
+    parser.add_argument("file", help="CSV or JSONL file with the records")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="format of the file (default: guessed from the "
+                             "extension)")
+    parser.add_argument("--db", default=None,
+                        help="path to the database (default: bundled database)")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="number of rows inserted per transaction")
+    parser.add_argument("--version", action="version",
+                        version="%(prog)s {0:s}".format(__version__))
+    return parser
+
+
+def main(argv=None):
+    '''
+    Entry point of the zbc-import command, returns 1 if any row was rejected.
+    '''
+
+    args = get_parser().parse_args(argv)
+
+    report = import_file(open_session(args.db), args.table, args.file, args.format,
+                         args.batch_size)
+    for n, message in report.errors:
+        print("zbc-import: row {0:d}: {1:s}".format(n, message), file=sys.stderr)
+    print("imported {0:d} {1:s}, rejected {2:d} rows".format(
+        report.inserted, args.table, len(report.errors)))
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from __future__ import print_function, unicode_literals
+
+import datetime
+
+from collections import namedtuple
+
+from sqlalchemy import text
+
+from batchcalc.model import Batch, SynthesisChemical, SynthesisComponent
+
+__version__ = "0.3.1"
+
+
+Migration = namedtuple("Migration", ["version", "description", "function"])
+
+# migrations ordered by version, see `migration`
+MIGRATIONS = []
+
+
+def migration(version, description):
+    '''
+    Decorator registering a function as the migration step upgrading the
+    schema to `version`, the function gets a connection with an open
+    transaction.
+    '''
+
+    def decorator(func):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError("duplicate migration version: {0}".format(version))
+        MIGRATIONS.append(Migration(version, description, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+def create_index(conn, index):
+    '''
+    Create the SQLAlchemy `index` unless it already exists.
+    '''
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS {0:s} ON {1:s} ({2:s})".format(
+        index.name, index.table.name, ", ".join(c.name for c in index.columns))))
+
+
+def read_schema_version(conn):
+    '''
+    Return the version of the schema without modifying the database, 0 for
+    databases never migrated.
+    '''
+
+    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                               "AND name = 'schema_version'")).first()
+    if exists is None:
+        return 0
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return 0 if version is None else version
+
+
+def get_schema_version(conn):
+    '''
+    Return the version of the schema, 0 for databases never migrated, after
+    creating the table the applied migrations are recorded in.
+    '''
+
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version ("
+                      "version INTEGER PRIMARY KEY, "
+                      "description VARCHAR, "
+                      "applied VARCHAR)"))
+    return read_schema_version(conn)
+
+
+def get_latest_version():
+    '''
+    Return the version the schema is upgraded to by `upgrade`.
+    '''
+
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def upgrade(engine):
+    '''
+    Apply in order all the migrations newer than the schema version of the
+    database, each in its own transaction, and return the list of applied
+    versions.
+    '''
+
+    applied = []
+    with engine.begin() as conn:
+        current = get_schema_version(conn)
+    if current >= get_latest_version():
+        return applied
+
+    for step in MIGRATIONS:
+        if step.version <= current:
+            continue
+        with engine.begin() as conn:
+            step.function(conn)
+            conn.execute(text("INSERT INTO schema_version (version, description, applied) "
+                              "VALUES (:version, :description, :applied)"),
+                         {"version": step.version, "description": step.description,
+                          "applied": datetime.datetime.now().isoformat()})
+        applied.append(step.version)
+    return applied
+
+
+@migration(1, "indexes on the batch and synthesis join columns")
+def add_join_indexes(conn):
+
+    for table in (Batch, SynthesisChemical, SynthesisComponent):
+        for index in table.__table__.indexes:
+            create_index(conn, index)
+
+
+# tables the catalog of chemicals and components is built from
+CATALOG_TABLES = ["batch", "categories", "chemicals", "components", "electrolytes",
+                  "kinds", "physical_forms", "reactions"]
+
+
+@migration(2, "counter of the changes to the catalog tables")
+def add_catalog_changes(conn):
+
+    conn.execute(text("CREATE TABLE IF NOT EXISTS catalog_changes ("
+                      "id INTEGER PRIMARY KEY CHECK (id = 1), "
+                      "counter INTEGER NOT NULL)"))
+    conn.execute(text("INSERT OR IGNORE INTO catalog_changes (id, counter) VALUES (1, 0)"))
+    for table in CATALOG_TABLES:
+        for event in ("insert", "update", "delete"):
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS {0:s}_changes_{1:s} AFTER {2:s} ON {0:s} "
+                "BEGIN UPDATE catalog_changes SET counter = counter + 1; END".format(
+                    table, event, event.upper())))
@@ -31,7 +31,7 @@ from __future__ import print_function, unicode_literals
 
 import re
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship, reconstructor
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.associationproxy import association_proxy
@@ -159,6 +159,10 @@ class Synthesis(ObjRepr, Base):
 
 class SynthesisChemical(ObjRepr, Base):
     __tablename__ = "synthesischemicals"
+    __table_args__ = (
+        Index("ix_synthesischemicals_synthesis_id", "synthesis_id",
+              "chemical_id", "mass"),
+    )
 
     id = Column(Integer, primary_key=True)
     synthesis_id = Column(Integer, ForeignKey("synthesis.id"))
@@ -169,6 +173,10 @@ class SynthesisChemical(ObjRepr, Base):
 
 class SynthesisComponent(ObjRepr, Base):
     __tablename__ = "synthesiscomponents"
+    __table_args__ = (
+        Index("ix_synthesiscomponents_synthesis_id", "synthesis_id",
+              "component_id", "moles"),
+    )
 
     id = Column(Integer, primary_key=True)
     synthesis_id = Column(Integer, ForeignKey("synthesis.id"))
@@ -268,6 +276,13 @@ class Batch(Base):
     '''
 
     __tablename__ = 'batch'
+    # covering indexes for the lookups of the batch records by chemical and
+    # by component
+    __table_args__ = (
+        Index("ix_batch_chemical_id", "chemical_id", "component_id",
+              "coefficient"),
+        Index("ix_batch_component_id", "component_id", "chemical_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     chemical_id = Column(Integer, ForeignKey('chemicals.id'), nullable=False)
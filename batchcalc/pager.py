@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+from __future__ import print_function, unicode_literals
+
+from sqlalchemy import and_, or_
+
+__version__ = "0.3.1"
+
+
+def after_key(column, idcol, value, ident, descending=False):
+    '''
+    Return the condition selecting the rows that come after the row with
+    the `value` of the `column` and the id `ident` in the order given by
+    `get_order`. SQLite puts NULLs first in ascending order and last in
+    descending order.
+    '''
+
+    if value is None:
+        if descending:
+            return and_(column.is_(None), idcol < ident)
+        return or_(column.isnot(None), and_(column.is_(None), idcol > ident))
+
+    if descending:
+        return or_(column < value, and_(column == value, idcol < ident),
+                   column.is_(None))
+    return or_(column > value, and_(column == value, idcol > ident))
+
+
+def get_order(column, idcol, descending=False):
+    '''
+    Return the ORDER BY clauses for the `column` with the id breaking ties.
+    '''
+
+    if descending:
+        return [column.desc(), idcol.desc()]
+    return [column.asc(), idcol.asc()]
+
+
+class KeysetPager(object):
+    '''
+    Pages of the records of a query sorted by one of the columns. Every page
+    is fetched with a single query continuing after the last record of the
+    previous page (keyset pagination), so the cost of a page does not depend
+    on how far it is from the first one.
+
+    Args:
+        get_query : callable
+            function returning the query of the records, called for every
+            page so that the current session is used
+        model : class
+            mapped class of the records
+        page_size : int
+            number of records per page
+    '''
+
+    def __init__(self, get_query, model, page_size=100):
+
+        self.get_query = get_query
+        self.model = model
+        self.page_size = page_size
+        self.column = model.id
+        self.descending = False
+        self.records = []
+        self.has_next = False
+        # keys of the last records before each of the visited pages
+        self._starts = [None]
+
+    @property
+    def page(self):
+        '''Number of the current page counting from 0.'''
+
+        return len(self._starts) - 1
+
+    @property
+    def has_previous(self):
+        return len(self._starts) > 1
+
+    def get_key(self, record):
+        return (getattr(record, self.column.key), record.id)
+
+    def fetch(self, start):
+        '''
+        Return the records of the page after the `start` key.
+        '''
+
+        query = self.get_query()
+        if start is not None:
+            query = query.filter(after_key(self.column, self.model.id,
+                                           start[0], start[1], self.descending))
+        records = query.order_by(*get_order(self.column, self.model.id, self.descending)).\
+            limit(self.page_size + 1).all()
+        self.has_next = len(records) > self.page_size
+        self.records = records[:self.page_size]
+        return self.records
+
+    def sort(self, column, descending=False):
+        '''
+        Sort the records by the `column` (attribute of the model) and return
+        the first page.
+        '''
+
+        self.column = column
+        self.descending = descending
+        return self.first()
+
+    def first(self):
+        self._starts = [None]
+        return self.fetch(None)
+
+    def next(self):
+        '''
+        Return the next page, the current page is returned on the last page.
+        '''
+
+        if not self.has_next:
+            return self.records
+        self._starts.append(self.get_key(self.records[-1]))
+        return self.fetch(self._starts[-1])
+
+    def previous(self):
+        '''
+        Return the previous page, the first page is returned on the first page.
+        '''
+
+        if self.has_previous:
+            self._starts.pop()
+        return self.fetch(self._starts[-1])
+
+    def refresh(self):
+        '''
+        Fetch the current page again, e.g. after records were modified.
+        '''
+
+        return self.fetch(self._starts[-1])
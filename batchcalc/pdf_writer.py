@@ -37,7 +37,7 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.platypus.flowables import KeepTogether
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
-from batchcalc import controller as ctrl
+from batchcalc.db import DB
 
 
 __version__ = "0.3.1"
@@ -97,9 +97,9 @@ def create_header(model, no_moles, **kwargs):
     story.append(Paragraph(kwargs['title'], styles['BlueTitle']))
     story.append(Spacer(1, 16))
     if no_moles:
-        story.append(Paragraph(r' : '.join(['{0}'.format(x.html_label()) for x in model.components]), styles['Compo']))
+        story.append(Paragraph(r' : '.join(['{0}'.format(x.html_label()) for x in model.state.components]), styles['Compo']))
     else:
-        story.append(Paragraph(r' : '.join(['{0}{1}'.format(x.moles, x.html_label()) for x in model.components]), styles['Compo']))
+        story.append(Paragraph(r' : '.join(['{0}{1}'.format(x.moles, x.html_label()) for x in model.state.components]), styles['Compo']))
     story.append(Spacer(1, 12))
     story.append(Paragraph(kwargs['author'], styles['CenterJ']))
     return story
@@ -108,7 +108,7 @@ def create_header(model, no_moles, **kwargs):
 def chemicals_table(model):
 
     data = [['Chemical', 'Mass [g]', 'Concentration', 'Mol. wt. [g/mol]']]
-    for chem in model.chemicals:
+    for chem in model.state.chemicals:
         data.append([chem.formula, "{0:10.4f}".format(chem.mass), "{0:10.4f}".format(chem.concentration), "{0:10.4f}".format(chem.molwt)])
 
     tab = Table(data)
@@ -119,14 +119,14 @@ def chemicals_table(model):
 def components_table(model, no_moles=False):
 
     if no_moles:
-        data = [['Compound']+[c.formula for c in model.components],
-                ['Weight [g]']+["{0:10.3f}".format(c.mass) for c in model.components],
-                ['Mol. wt. [g/mol]']+["{0:10.3f}".format(c.molwt) for c in model.components]]
+        data = [['Compound']+[c.formula for c in model.state.components],
+                ['Weight [g]']+["{0:10.3f}".format(c.mass) for c in model.state.components],
+                ['Mol. wt. [g/mol]']+["{0:10.3f}".format(c.molwt) for c in model.state.components]]
     else:
-        data = [['Compound']+[c.formula for c in model.components],
-                ['Mole ratio']+["{0:10.3f}".format(c.moles) for c in model.components],
-                ['Weight [g]']+["{0:10.3f}".format(c.mass) for c in model.components],
-                ['Mol. wt. [g/mol]']+["{0:10.3f}".format(c.molwt) for c in model.components]]
+        data = [['Compound']+[c.formula for c in model.state.components],
+                ['Mole ratio']+["{0:10.3f}".format(c.moles) for c in model.state.components],
+                ['Weight [g]']+["{0:10.3f}".format(c.mass) for c in model.state.components],
+                ['Mol. wt. [g/mol]']+["{0:10.3f}".format(c.molwt) for c in model.state.components]]
 
     tab = Table(data)
     tab.setStyle(tab_style)
@@ -136,7 +136,7 @@ def components_table(model, no_moles=False):
 def composition_results_table(model):
 
     data = [['Component', 'Moles', 'Mass [g]']]
-    for comp in model.components:
+    for comp in model.state.components:
         data.append([comp.formula, "{0:10.4f}".format(comp.moles), "{0:10.4f}".format(comp.mass)])
 
     tab = Table(data)
@@ -146,13 +146,13 @@ def composition_results_table(model):
 
 def batch_table(model):
 
-    db = ctrl.DB()
+    db = DB()
 
     temp = np.array(map(lambda x: "{0:8.4f}".format(x), model.get_B_matrix(db.session).reshape(model.B.size)))
     data = temp.reshape(model.get_B_matrix(db.session).shape).tolist()
-    for row, chemical in zip(data, model.chemicals):
+    for row, chemical in zip(data, model.state.chemicals):
         row.insert(0, chemical.formula + " ({0:6.2f}%)".format(chemical.concentration * 100))
-    data.insert(0, ['Compound'] + [c.formula for c in model.components])
+    data.insert(0, ['Compound'] + [c.formula for c in model.state.components])
     tab = Table(data)
     tab.setStyle(tab_style)
     return tab
@@ -179,11 +179,11 @@ def results_table(model, scale=None):
     else:
         raise ValueError("wrong scale argument set: {0}".format(scale))
 
-    masssum = sum([s.mass for s in model.chemicals])
-    volusum = sum([s.volume for s in model.chemicals if s.volume is not None])
+    masssum = sum([s.mass for s in model.state.chemicals])
+    volusum = sum([s.volume for s in model.state.chemicals if s.volume is not None])
 
     data = [["Substance", "Formula", "Mass [g]", "Volume [cm3]", "Weighted Mass [g]"]]
-    for chem in model.chemicals:
+    for chem in model.state.chemicals:
         data.append([chem.listctrl_label(), chem.formula, "{0:10.4f}".format(chem.mass/scale), volume2str(chem.volume, scale=scale), ""])
     data.append(["Sum", "", "{0:10.4f}".format(masssum / scale),
                         "{0:10.4f}".format(volusum / scale), ""])
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from __future__ import print_function, unicode_literals
+
+import numpy as np
+
+__version__ = "0.3.1"
+
+
+def is_liquid(chemical):
+    '''
+    Return True if the volume of the `chemical` can be calculated from its
+    mass.
+    '''
+
+    return chemical.density is not None and chemical.physical_form == "liquid"
+
+
+def _frozen(values, dtype=float):
+    arr = np.array(values, dtype=dtype)
+    arr.setflags(write=False)
+    return arr
+
+
+class Recipe(object):
+    '''
+    Compiled, immutable mapping of the molar compositions of a fixed
+    selection of components to the masses of a fixed selection of chemicals
+
+        masses = P * (moles * molwt) / divisors
+
+    where P is the solution operator of the batch matrix and the divisors
+    are the concentrations of the reactants (1 for other kinds). A recipe
+    does not need a database session, it can be pickled and stored in a
+    `.npz` file, see `BatchCalculator.compile_recipe`.
+
+    Args:
+        operator : array_like
+            solution operator P, (number of chemicals, number of components)
+        molwt : array_like
+            molecular weights of the components
+        divisors : array_like
+            concentrations of the reactants and 1 for other chemicals
+        kinds : sequence of str
+            kinds of the chemicals
+        components : sequence of str
+            labels of the components
+        chemicals : sequence of str
+            labels of the chemicals
+        densities : array_like
+            densities of the liquid chemicals and NaN for the others, if not
+            given no volumes are calculated
+    '''
+
+    _fields = ("operator", "molwt", "divisors", "kinds", "components",
+               "chemicals", "densities")
+
+    def __init__(self, operator, molwt, divisors, kinds, components,
+                 chemicals, densities=None):
+
+        operator = np.atleast_2d(np.asarray(operator, dtype=float))
+        nchem, ncomp = operator.shape
+
+        if densities is None:
+            densities = np.nan * np.ones(nchem)
+
+        attrs = {
+            "operator": _frozen(operator),
+            "molwt": _frozen(molwt),
+            "divisors": _frozen(divisors),
+            "kinds": tuple(np.asarray(kinds).tolist()),
+            "components": tuple(np.asarray(components).tolist()),
+            "chemicals": tuple(np.asarray(chemicals).tolist()),
+            "densities": _frozen(densities),
+        }
+
+        for name, size in [("molwt", ncomp), ("components", ncomp),
+                           ("divisors", nchem), ("kinds", nchem),
+                           ("chemicals", nchem), ("densities", nchem)]:
+            if len(attrs[name]) != size:
+                raise ValueError("{0:s} should have {1:d} entries, got {2:d}".format(
+                    name, size, len(attrs[name])))
+
+        attrs["liquids"] = _frozen(np.flatnonzero(~np.isnan(attrs["densities"])),
+                                   dtype=int)
+        self.__dict__.update(attrs)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Recipe is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Recipe is immutable")
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, f) for f in self._fields))
+
+    def __repr__(self):
+        return "<Recipe(components={0}, chemicals={1})>".format(
+            list(self.components), list(self.chemicals))
+
+    def apply(self, moles):
+        '''
+        Calculate the masses of the chemicals for a molar composition or many
+        of them.
+
+        Args:
+            moles : array_like
+                1D array with the number of moles of each component or 2D
+                array with one composition per row
+
+        Returns:
+            masses of the chemicals with the same number of dimensions as
+            `moles`, one column per chemical for 2D input
+        '''
+
+        moles = np.asarray(moles, dtype=float)
+        if moles.ndim not in (1, 2) or moles.shape[-1] != len(self.components):
+            raise ValueError("compositions should have {0:d} columns, got shape {1}".format(
+                len(self.components), moles.shape))
+
+        return np.dot(moles * self.molwt, self.operator.T) / self.divisors
+
+    def volumes(self, masses):
+        '''
+        Return the volumes of the liquid chemicals (listed in `liquids`) for
+        the `masses` returned by `apply`.
+        '''
+
+        masses = np.asarray(masses, dtype=float)
+        return masses[..., self.liquids] / self.densities[self.liquids]
+
+    def to_npz(self, path):
+        '''
+        Save the recipe to a `.npz` file at `path`.
+        '''
+
+        np.savez(path, **dict((f, np.asarray(getattr(self, f)))
+                              for f in self._fields))
+
+    @classmethod
+    def from_npz(cls, path):
+        '''
+        Load the recipe from the `.npz` file at `path`.
+        '''
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**dict((f, data[f]) for f in cls._fields))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+from __future__ import print_function, unicode_literals
+
+import re
+
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+
+from batchcalc.model import Chemical, Component, Synthesis
+
+__version__ = "0.3.1"
+
+
+# full text indexes (see `update_indexes`) of the searchable models with the
+# weights of the indexed columns used for ranking
+INDEXES = {
+    Chemical: ("chemicals_fts", [(Chemical.name, 10.0),
+                                 (Chemical.short_name, 10.0),
+                                 (Chemical.formula, 5.0),
+                                 (Chemical.cas, 5.0),
+                                 (Chemical.smiles, 1.0)]),
+    Component: ("components_fts", [(Component.name, 10.0),
+                                   (Component.short_name, 10.0),
+                                   (Component.formula, 5.0)]),
+    Synthesis: ("synthesis_fts", [(Synthesis.name, 10.0),
+                                  (Synthesis.reference, 2.0),
+                                  (Synthesis.description, 1.0),
+                                  (Synthesis.target_material, 5.0)]),
+}
+
+
+def get_terms(keywords):
+    '''
+    Return the list of words of the `keywords` string, punctuation (as in
+    CAS numbers or formulas) separates the words.
+    '''
+
+    return re.findall(r"\w+", keywords, re.UNICODE)
+
+
+def get_match_query(keywords):
+    '''
+    Return the FTS5 query matching the records with words starting with
+    every word of `keywords`.
+    '''
+
+    return " ".join('"{0:s}"*'.format(term) for term in get_terms(keywords))
+
+
+# events of the triggers keeping the full text indexes in sync
+TRIGGER_EVENTS = ["insert", "delete", "update"]
+
+# whether the SQLite library has the FTS5 extension, None until checked
+FTS5 = None
+
+
+def has_fts5(conn):
+    '''
+    Return True if the SQLite library used by the connection (or session)
+    `conn` has the FTS5 extension, the compile options are checked once.
+    '''
+
+    global FTS5
+    if FTS5 is None:
+        options = [r[0] for r in conn.execute(text("PRAGMA compile_options"))]
+        FTS5 = "ENABLE_FTS5" in options
+    return FTS5
+
+
+def get_index_objects(model):
+    '''
+    Return the names of the full text index of the `model` and of its
+    triggers.
+    '''
+
+    name = INDEXES[model][0]
+    return [name] + ["{0:s}_{1:s}".format(name, event) for event in TRIGGER_EVENTS]
+
+
+def create_index(conn, model):
+    '''
+    Create the FTS5 index of the `model` kept in sync with its table by
+    triggers, and fill it with the existing rows. The index stores no copy
+    of the text (external content).
+    '''
+
+    name, columns = INDEXES[model]
+    columns = [col.name for col, _ in columns]
+    params = {
+        "fts": name,
+        "table": model.__tablename__,
+        "cols": ", ".join(columns),
+        "new": ", ".join("new." + c for c in columns),
+        "old": ", ".join("old." + c for c in columns),
+    }
+
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, "
+        "content='{table}', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        "INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new}); END",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        "INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE ON {table} BEGIN "
+        "INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        "INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new}); END",
+        "INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        conn.execute(text(statement.format(**params)))
+
+
+def update_indexes(engine):
+    '''
+    Bring the full text indexes of the database in line with the SQLite
+    library, called every time the database is opened. With FTS5 the
+    missing indexes are created (and filled), without it the triggers of
+    existing indexes are dropped, since they would make every change to the
+    indexed tables fail. The database is written to only when something
+    has to change.
+    '''
+
+    with engine.begin() as conn:
+        fts5 = has_fts5(conn)
+        existing = set(r[0] for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")))
+        for model in INDEXES:
+            objects = get_index_objects(model)
+            if fts5 and not existing.issuperset(objects):
+                create_index(conn, model)
+            elif not fts5:
+                for trigger in objects[1:]:
+                    if trigger in existing:
+                        conn.execute(text("DROP TRIGGER {0:s}".format(trigger)))
+
+
+def has_index(session, model):
+    '''
+    Return True if the full text index of the `model` can be used, i.e.
+    SQLite has FTS5 and the database has the index.
+    '''
+
+    if not has_fts5(session):
+        return False
+    name = INDEXES[model][0]
+    return session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                                "AND name = :name"), {"name": name}).first() is not None
+
+
+def search(query, model, keywords):
+    '''
+    Restrict the `query` of the `model` records to those matching all the
+    words of the `keywords` as prefixes, ordered from the best match. When
+    the database has no full text index (SQLite without FTS5) the records
+    containing the words are returned ordered by id.
+    '''
+
+    try:
+        name, columns = INDEXES[model]
+    except KeyError:
+        raise ValueError("cannot search {0}".format(model.__name__))
+
+    terms = get_terms(keywords)
+    if len(terms) == 0:
+        return query.order_by(model.id)
+
+    if has_index(query.session, model):
+        index = table(name, column("rowid"))
+        fts = literal_column(name)
+        rank = func.bm25(fts, *[weight for _, weight in columns])
+        return query.join(index, index.c.rowid == model.id).\
+            filter(fts.op("MATCH")(get_match_query(keywords))).\
+            order_by(rank, model.id)
+    else:
+        return query.filter(and_(*[or_(*[col.like("%{0:s}%".format(term))
+                                         for col, _ in columns])
+                                   for term in terms])).order_by(model.id)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from __future__ import print_function, unicode_literals
+
+import numpy as np
+
+from batchcalc.recipe import is_liquid
+
+__version__ = "0.3.1"
+
+
+# kinds of chemicals indexed by their codes in CalculationState.kinds
+KINDS = ("mixture", "solution", "reactant")
+
+
+class _RowView(object):
+    '''
+    Row of a CalculationState looking like the selected object, the
+    calculated quantities are read from the arrays of the state and all the
+    other attributes from the object.
+    '''
+
+    def __init__(self, state, index, obj):
+        self._state = state
+        self.index = index
+        self.object = obj
+
+    def __getattr__(self, name):
+        return getattr(self.object, name)
+
+    def __repr__(self):
+        return "<{0:s}({1!r})>".format(self.__class__.__name__, self.object)
+
+
+class ComponentView(_RowView):
+    '''Component row of a CalculationState'''
+
+    @property
+    def moles(self):
+        return float(self._state.moles[self.index])
+
+    @property
+    def mass(self):
+        return float(self._state.moles[self.index] * self._state.molwt[self.index])
+
+
+class ChemicalView(_RowView):
+    '''Chemical row of a CalculationState'''
+
+    @property
+    def mass(self):
+        return float(self._state.masses[self.index])
+
+    @property
+    def moles(self):
+        return float(self._state.masses[self.index] / self.object.molwt)
+
+    @property
+    def volume(self):
+        if np.isnan(self._state.density[self.index]):
+            return None
+        return float(self._state.masses[self.index] / self._state.density[self.index])
+
+
+class CalculationState(object):
+    '''
+    Results of a calculation for a selection of components and chemicals
+    stored as numpy arrays instead of attributes of the shared ORM objects.
+
+    The input values (moles of the components, masses of the chemicals) are
+    copied from the objects when the state is created, afterwards all the
+    calculations and scalings work in place on the arrays:
+
+        moles : moles of the components
+        molwt : molecular weights of the components
+        masses : masses of the chemicals
+        concentration : concentrations of the chemicals (NaN if not set)
+        density : densities of the liquid chemicals (NaN for the others)
+        kinds : codes of the kinds of chemicals, indices into KINDS
+
+    The `components` and `chemicals` lists hold row views, that can be
+    used in place of the ORM objects by the GUI and the writers.
+    '''
+
+    def __init__(self, components, chemicals):
+
+        self._objects = (tuple(components), tuple(chemicals))
+
+        self.moles = np.array([getattr(c, "moles", 1.0) for c in components],
+                              dtype=float)
+        self.molwt = np.array([c.molwt for c in components], dtype=float)
+        self.masses = np.array([getattr(c, "mass", 0.0) for c in chemicals],
+                               dtype=float)
+        self.concentration = np.array(
+            [np.nan if c.concentration is None else c.concentration
+             for c in chemicals], dtype=float)
+        self.density = np.array([c.density if is_liquid(c) else np.nan
+                                 for c in chemicals], dtype=float)
+        self.kinds = np.array([KINDS.index(c.kind) if c.kind in KINDS else -1
+                               for c in chemicals], dtype=np.int8)
+
+        self.components = [ComponentView(self, i, c)
+                           for i, c in enumerate(components)]
+        self.chemicals = [ChemicalView(self, i, c)
+                          for i, c in enumerate(chemicals)]
+
+    def matches(self, components, chemicals):
+        '''
+        Return True if the state was created for the same `components` and
+        `chemicals` objects.
+        '''
+
+        return all(len(a) == len(b) and all(x is y for x, y in zip(a, b))
+                   for a, b in zip(self._objects, (components, chemicals)))
+
+    @property
+    def reactants(self):
+        return self.kinds == KINDS.index("reactant")
+
+    @property
+    def divisors(self):
+        '''
+        Concentrations of the reactants and 1 for the other chemicals.
+        '''
+
+        return np.where(self.reactants, self.concentration, 1.0)
+
+    @property
+    def volumes(self):
+        '''
+        Volumes of the chemicals, NaN for the chemicals that are not liquid.
+        '''
+
+        return self.masses / self.density
+
+    def index(self, item, kind="chemicals"):
+        '''
+        Return the index of the `item` (object or its view) among the
+        `kind` ("chemicals" or "components") of the state.
+        '''
+
+        obj = item.object if isinstance(item, _RowView) else item
+        objects = self._objects[0 if kind == "components" else 1]
+        for i, o in enumerate(objects):
+            if o is obj:
+                return i
+        raise ValueError("{0!r} is not in the selected {1:s}".format(obj, kind))
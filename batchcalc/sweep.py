@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+#
+#    Zeolite Batch Calculator
+#
+# A program for calculating the correct amount of reagents (batch) for a
+# particular zeolite composition given by the molar ratio of its components.
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Lukasz Mentel
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from __future__ import print_function, unicode_literals
+
+import csv
+import io
+import multiprocessing
+import re
+import sys
+
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batchcalc.recipe import is_liquid
+
+__version__ = "0.3.1"
+
+
+_RANGE = re.compile(r'^(?P<start>-?\d+(\.\d*)?)\.\.(?P<stop>-?\d+(\.\d*)?)'
+                    r'(\s*step\s*(?P<step>\d+(\.\d*)?))?$')
+
+
+def parse_values(string):
+    '''
+    Parse the values of a single sweep axis, either a range
+    "start..stop [step s]" with inclusive `stop` (default step is 1) or
+    a list of numbers separated by commas or whitespace.
+    '''
+
+    string = string.strip()
+    m = _RANGE.match(string)
+    if m:
+        start = float(m.group('start'))
+        stop = float(m.group('stop'))
+        step = float(m.group('step')) if m.group('step') is not None else 1.0
+        if step <= 0.0 or stop < start:
+            raise ValueError("invalid range: {0:s}".format(string))
+        npoints = int(np.floor((stop - start) / step + 1.0e-9)) + 1
+        return start + step * np.arange(npoints, dtype=float)
+    else:
+        values = [float(x) for x in re.split(r'[,\s]+', string) if x != '']
+        if len(values) == 0:
+            raise ValueError("no values given: {0:s}".format(string))
+        return np.asarray(values, dtype=float)
+
+
+def parse_sweep(string):
+    '''
+    Parse the string specifying the sweep into an ordered dictionary mapping
+    the formulas of the components to the arrays of their mole numbers, e.g.
+
+        "SiO2: 10..60 step 2, H2O: 100..600 step 50, Na2O: 1, 1.5, 2"
+    '''
+
+    axes = OrderedDict()
+    for item in re.split(r',\s*(?=[A-Za-z\(])', string.strip()):
+        if item.strip() == '':
+            continue
+        formula, sep, values = item.partition(':')
+        if sep == '':
+            raise ValueError("missing ':' in sweep item: {0:s}".format(item))
+        axes[formula.strip()] = parse_values(values)
+    return axes
+
+
+def grid_compositions(base, columns, axes, start, stop):
+    '''
+    Return the 2D array of molar compositions for the flat indices in the
+    range [`start`, `stop`) of the grid spanned by `axes`, the values of the
+    i-th axis are put in the column `columns[i]` and the remaining columns
+    are taken from `base`.
+    '''
+
+    shape = tuple(len(v) for v in axes)
+    stop = min(stop, int(np.prod(shape, dtype=np.int64)))
+    moles = np.tile(base, (max(stop - start, 0), 1))
+    if stop > start:
+        indices = np.unravel_index(np.arange(start, stop), shape)
+        for col, values, idx in zip(columns, axes, indices):
+            moles[:, col] = values[idx]
+    return moles
+
+
+class SweepSnapshot(object):
+    '''
+    Read-only snapshot of the compiled Recipe and the grid needed to
+    evaluate chunks of a sweep without a database session, it is small and
+    picklable so it can be sent to worker processes.
+    '''
+
+    def __init__(self, recipe, base, columns, axes):
+
+        self.recipe = recipe
+        self.base = np.asarray(base, dtype=float)
+        self.columns = list(columns)
+        self.axes = [np.asarray(v, dtype=float) for v in axes]
+
+    def evaluate(self, start, stop):
+        '''
+        Return the rows of compositions, masses and volumes of liquids for the
+        grid indices in the range [`start`, `stop`).
+        '''
+
+        moles = grid_compositions(self.base, self.columns, self.axes, start,
+                                  stop)
+        masses = self.recipe.apply(moles)
+        volumes = self.recipe.volumes(masses)
+        return np.hstack((moles, masses, volumes))
+
+    def format_csv(self, start, stop, delimiter=','):
+        '''
+        Return the rows for the grid indices in the range [`start`, `stop`)
+        formatted as CSV text.
+        '''
+
+        fobj = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        writer = csv.writer(fobj, delimiter=str(delimiter), lineterminator='\n')
+        writer.writerows(self.evaluate(start, stop).tolist())
+        return fobj.getvalue()
+
+    def write_npy(self, path, start, stop):
+        '''
+        Write the rows for the grid indices in the range [`start`, `stop`)
+        to their slice of the existing `.npy` file at `path` and return the
+        number of rows written.
+        '''
+
+        rows = self.evaluate(start, stop)
+        out = np.load(path, mmap_mode='r+')
+        out[start:start + rows.shape[0]] = rows
+        out.flush()
+        del out
+        return rows.shape[0]
+
+
+# snapshot of the sweep evaluated by a worker process, set once per process
+# by `_init_worker` instead of being sent with every chunk
+_snapshot = None
+
+
+def _init_worker(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _evaluate(start, stop):
+    return _snapshot.evaluate(start, stop)
+
+
+def _format_csv(start, stop, delimiter):
+    return _snapshot.format_csv(start, stop, delimiter)
+
+
+def _write_npy(start, stop, path):
+    return _snapshot.write_npy(path, start, stop)
+
+
+def run_parallel(snapshot, chunks, workers=None, task=_evaluate, args=()):
+    '''
+    Run the `task` for the `chunks` ([start, stop) index ranges) of the
+    `snapshot` in a pool of `workers` processes (default: number of CPUs)
+    and yield the results in order. The task is called with the start, the
+    stop and the extra `args`, the default returns the rows of the chunk.
+
+    The snapshot is sent once to every process and at most two chunks per
+    worker are in flight at any time to keep the memory bounded.
+    '''
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(snapshot,)) as executor:
+        for start, stop in chunks:
+            pending.append(executor.submit(task, start, stop, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class CompositionSweep(object):
+    '''
+    Cartesian grid of molar compositions evaluated for a fixed selection of
+    chemicals and components.
+
+    The grid is never stored, compositions are generated lazily from the
+    flat grid indices and solved in chunks of `chunksize` rows using the
+    factorized batch matrix of the `calculator`. Components that are not
+    swept keep the number of moles given in `base` or, if not present there,
+    the number of moles set in the calculator.
+
+    Args:
+        calculator : BatchCalculator
+            calculator with the selected components and chemicals
+        axes : dict or str
+            mapping of component formulas (or labels) to sequences of mole
+            numbers, or a string understood by `parse_sweep`
+        base : str
+            composition of the fixed components in the format understood by
+            `BatchCalculator.parse_formulas`, e.g. "1.0 Al2O3 : 1.5 Na2O"
+        chunksize : int
+            number of compositions solved at once
+    '''
+
+    def __init__(self, calculator, axes, base=None, chunksize=10000):
+
+        self.calculator = calculator
+        self.chunksize = int(chunksize)
+
+        self.base = np.asarray([c.moles for c in calculator.components],
+                               dtype=float)
+        if base is not None:
+            for formula, nmol in calculator.parse_formulas(base):
+                self.base[self.get_column(formula)] = nmol
+
+        if not isinstance(axes, dict):
+            axes = parse_sweep(axes)
+
+        self.axes = OrderedDict()
+        self.columns = []
+        for name, values in axes.items():
+            self.columns.append(self.get_column(name))
+            self.axes[name] = np.asarray(values, dtype=float).ravel()
+
+        self.shape = tuple(len(v) for v in self.axes.values())
+
+    def __len__(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    def get_column(self, name):
+        '''
+        Return the column of the component matching `name` by formula or
+        label.
+        '''
+
+        for j, comp in enumerate(self.calculator.components):
+            if name in (comp.formula, comp.listctrl_label()):
+                return j
+        raise ValueError("component not selected: {0:s}".format(name))
+
+    def compositions(self, start=0, stop=None):
+        '''
+        Return the 2D array of molar compositions for the flat grid indices
+        in the range [`start`, `stop`).
+        '''
+
+        return grid_compositions(self.base, self.columns,
+                                 list(self.axes.values()), start,
+                                 len(self) if stop is None else stop)
+
+    def labels(self):
+        '''
+        Return the column labels of the output: compositions, masses and the
+        volumes of the liquid chemicals.
+        '''
+
+        labels = [c.listctrl_label() for c in self.calculator.components]
+        labels.extend("{0:s} mass [g]".format(c.listctrl_label())
+                      for c in self.calculator.chemicals)
+        labels.extend("{0:s} volume [cm3]".format(c.listctrl_label())
+                      for c in self.calculator.chemicals if is_liquid(c))
+        return labels
+
+    def snapshot(self, session):
+        '''
+        Return the SweepSnapshot with the compiled recipe of the calculator
+        needed to evaluate the grid.
+        '''
+
+        return SweepSnapshot(
+            recipe=self.calculator.compile_recipe(session),
+            base=self.base,
+            columns=self.columns,
+            axes=list(self.axes.values()))
+
+    def chunks(self):
+        '''
+        Return the list of the [start, stop) index ranges of the chunks.
+        '''
+
+        return [(start, min(start + self.chunksize, len(self)))
+                for start in range(0, len(self), self.chunksize)]
+
+    def run(self, session, workers=1):
+        '''
+        Generator yielding 2D arrays with the rows of the output (see
+        `labels`) for consecutive chunks of the grid.
+
+        With `workers` > 1 the chunks are evaluated in a pool of processes,
+        each receiving the read-only snapshot instead of a database session,
+        and the results are yielded in the grid order.
+        '''
+
+        snapshot = self.snapshot(session)
+
+        if workers is None or workers > 1:
+            for chunk in run_parallel(snapshot, self.chunks(), workers):
+                yield chunk
+        else:
+            for start, stop in self.chunks():
+                yield snapshot.evaluate(start, stop)
+
+    def to_csv(self, session, fobj, delimiter=',', workers=1):
+        '''
+        Stream the results to the CSV file `fobj` (path or file object) and
+        return the number of rows written. With `workers` > 1 the chunks are
+        also formatted in the worker processes.
+        '''
+
+        if not hasattr(fobj, 'write'):
+            with open(fobj, 'w') as fcsv:
+                return self.to_csv(session, fcsv, delimiter=delimiter,
+                                   workers=workers)
+
+        writer = csv.writer(fobj, delimiter=str(delimiter), lineterminator='\n')
+        writer.writerow(self.labels())
+
+        snapshot = self.snapshot(session)
+        if workers is None or workers > 1:
+            texts = run_parallel(snapshot, self.chunks(), workers,
+                                 task=_format_csv, args=(delimiter,))
+        else:
+            texts = (snapshot.format_csv(start, stop, delimiter)
+                     for start, stop in self.chunks())
+        for text in texts:
+            fobj.write(text)
+        return len(self)
+
+    def to_npy(self, session, path, workers=1):
+        '''
+        Stream the results to a memory mapped `.npy` file at `path` with the
+        columns ordered as in `labels` and return the number of rows written.
+        With `workers` > 1 every worker process writes its chunks directly
+        to the file.
+        '''
+
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=float,
+                                        shape=(len(self), len(self.labels())))
+        del out
+
+        snapshot = self.snapshot(session)
+        if workers is None or workers > 1:
+            counts = run_parallel(snapshot, self.chunks(), workers,
+                                  task=_write_npy, args=(path,))
+        else:
+            counts = (snapshot.write_npy(path, start, stop)
+                      for start, stop in self.chunks())
+        return sum(counts)
@@ -51,7 +51,7 @@ def get_report_as_string(flags, model):
     template = env.get_template('report_color.tex')
 
     flags['date'] = datetime.datetime.now().strftime("%H:%M:%S %d.%m.%Y")
-    flags['molar_ratios'] = r':'.join(['{0}{1}'.format(x.moles, x.tex_label()) for x in model.components])
+    flags['molar_ratios'] = r':'.join(['{0}{1}'.format(x.moles, x.tex_label()) for x in model.state.components])
 
     if flags["composition"]:
         flags['a_matrix'] = tex_A(model)
@@ -72,37 +72,37 @@ def get_report_as_string(flags, model):
 
 def tex_A(model):
 
-    tshape = u'{l' + u'R' * len(model.components) + u'}'
+    tshape = u'{l' + u'R' * len(model.state.components) + u'}'
     table = r'\begin{center}'+u'\n'+r'\begin{tabularx}{\textwidth}'+tshape+r'\toprule'+u'\n'
-    table += u'Compound &' + ' & '.join([r'\multicolumn{1}{c}{'+c.tex_label()+r'}' for c in model.components]) + r'\\ \midrule' + u'\n'
-    table += u'Mole ratio &' + ' & '.join(["{0:10.3f}".format(c.moles) for c in model.components]) + r'\\ ' + u'\n'
-    table += u'Weight [g] &' + ' & '.join(["{0:10.3f}".format(c.mass) for c in model.components]) + r'\\ ' + u'\n'
-    table += u'Mol. wt. [g/mol] &' + ' & '.join(["{0:10.3f}".format(c.molwt) for c in model.components]) + r'\\ ' + u'\n'
+    table += u'Compound &' + ' & '.join([r'\multicolumn{1}{c}{'+c.tex_label()+r'}' for c in model.state.components]) + r'\\ \midrule' + u'\n'
+    table += u'Mole ratio &' + ' & '.join(["{0:10.3f}".format(c.moles) for c in model.state.components]) + r'\\ ' + u'\n'
+    table += u'Weight [g] &' + ' & '.join(["{0:10.3f}".format(c.mass) for c in model.state.components]) + r'\\ ' + u'\n'
+    table += u'Mol. wt. [g/mol] &' + ' & '.join(["{0:10.3f}".format(c.molwt) for c in model.state.components]) + r'\\ ' + u'\n'
     return table + r'\bottomrule\end{tabularx}'+u'\n'+r'\end{center}'+u'\n'
 
 
 def tex_B(model):
 
-    tshape = u'{l'+u'C'*len(model.components)+u'}'
+    tshape = u'{l'+u'C'*len(model.state.components)+u'}'
     table = r'\begin{center}'+u'\n'+r'\begin{tabularx}{\textwidth}'+tshape+r'\toprule'+u'\n'
-    table += u'Compound' + u' & ' + u' & '.join([z.tex_label() for z in model.components]) + r'\\ \midrule' + u'\n'
-    for reactant, row in zip(model.chemicals, model.B):
+    table += u'Compound' + u' & ' + u' & '.join([z.tex_label() for z in model.state.components]) + r'\\ \midrule' + u'\n'
+    for reactant, row in zip(model.state.chemicals, model.B):
         table += reactant.tex_label() + u' & ' + u' & '.join(["{0:10.4f}".format(x) for x in row]) + r'\\' + u'\n'
     return table + r'\bottomrule\end{tabularx}'+u'\n'+r'\end{center}'+u'\n'
 
 
 def tex_X(model):
 
-    masssum = sum([s.mass for s in model.chemicals])
+    masssum = sum([s.mass for s in model.state.chemicals])
 
     table = r'\begin{center}'+u'\n'+r'\begin{tabularx}{\textwidth}{lRR|C|}\toprule'+u'\n'
     table += " & ".join([r'Substance', r'\multicolumn{1}{c}{Mass [g]}',
                          r'Scaled Mass [g]',
                          r'Weighted mass [g]']) + r'\\ \midrule' + u'\n'
-    for i, subs in enumerate(model.chemicals, start=1):
+    for i, subs in enumerate(model.state.chemicals, start=1):
         table += r"{l:>20s} & {v:>15.4f} & {s:>15.4f} & \\".format(
                     l=subs.tex_label(), v=subs.mass, s=subs.mass/model.scale_all)
-        if i < len(model.chemicals):
+        if i < len(model.state.chemicals):
             table += r'\cline{4-4}' + u'\n'
         else:
             table += u'\n'
@@ -114,7 +114,7 @@ def tex_X(model):
 def tex_X_rescale(model):
 
     masspar = sum([s.mass for s in model.selections])
-    masssum = sum([s.mass for s in model.chemicals])
+    masssum = sum([s.mass for s in model.state.chemicals])
 
     table = r'\begin{center}'+u'\n'+r'\begin{tabularx}{\textwidth}{lRR|C|}\toprule'+u'\n'
     table += " & ".join([r'Substance', r'\multicolumn{1}{c}{Mass [g]}',
@@ -127,8 +127,8 @@ def tex_X_rescale(model):
         else:
             table += u'\n'
     table += r'\midrule Sum & '+ "{0:>15.4f}".format(masspar) + ' & ' + "{0:>15.4f}".format(masspar/model.sample_scale) + r' & \\ '
-    nsel_ids = set([x.id for x in model.chemicals]).difference(set([x.id for x in model.selections]))
-    not_selected = [x for x in model.chemicals if x.id in nsel_ids]
+    nsel_ids = set([x.id for x in model.state.chemicals]).difference(set([x.id for x in model.selections]))
+    not_selected = [x for x in model.state.chemicals if x.id in nsel_ids]
     if len(not_selected) > 0:
         table += r'\midrule' + u'\n'
     for i, subs in enumerate(not_selected, start=1):
@@ -29,10 +29,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import csv
+import json
 import os
 import sys
 from collections import OrderedDict
-from ObjectListView import ColumnDefn
 
 
 __version__ = "0.3.1"
@@ -117,4 +118,59 @@ def get_columns(cols):
             list of keys from COLUMNS dict
     '''
 
+    from ObjectListView import ColumnDefn
+
     return [ColumnDefn(**COLUMNS[col]) for col in cols]
+
+
+def read_records(fobj, fmt, name="record"):
+    '''
+    Generator yielding the records read from a CSV or JSONL stream one at a
+    time as dictionaries, lines that cannot be parsed are yielded as
+    ValueError instances.
+
+    Args:
+        fobj : file like object
+        fmt : str
+            "csv" or "jsonl"
+        name : str
+            name of the records used in the error messages
+    '''
+
+    if fmt == "csv":
+        for row in csv.DictReader(fobj):
+            yield row
+    else:
+        for line in fobj:
+            if line.strip() == "":
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as err:
+                yield ValueError("invalid JSON: {0}".format(err))
+            else:
+                if isinstance(record, dict):
+                    yield record
+                else:
+                    yield ValueError("{0} should be a JSON object".format(name))
+
+
+def index_names(entries):
+    '''
+    Return a dictionary mapping the ids and the lower case names to the
+    values, on duplicates the first match wins and the earlier names take
+    precedence over the later ones.
+
+    Args:
+        entries : list of tuples
+            (value, id, names) for each record, `names` being a sequence of
+            str or None
+    '''
+
+    res = dict((str(ident), value) for value, ident, _ in entries)
+    for i in range(max([len(names) for _, _, names in entries] or [0])):
+        for value, _, names in entries:
+            name = names[i] if i < len(names) else None
+            if name is not None and name.strip():
+                res.setdefault(name.strip().lower(), value)
+    return res
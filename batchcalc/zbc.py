@@ -43,15 +43,19 @@ import wx
 import wx.grid as gridlib
 from wx.lib.wordwrap import wordwrap
 
-from ObjectListView import ObjectListView
+from ObjectListView import ObjectListView, OLVEvent
 
 from batchcalc.tex_writer import get_report_as_string
 from batchcalc.pdf_writer import create_pdf, create_pdf_composition
 from batchcalc.calculator import BatchCalculator
+from batchcalc.archive import export_database, import_database
 from batchcalc import controller as ctrl
+from batchcalc.db import refresh_catalog_version
+from batchcalc.model import Chemical, Component, Synthesis
+from batchcalc.pager import KeysetPager
 from batchcalc import dialogs
 
-from batchcalc.utils import get_columns
+from batchcalc.utils import COLUMNS, get_columns
 
 __version__ = "0.3.1"
 
@@ -66,8 +70,26 @@ def clean_tex(fname):
             os.remove(fil)
 
 
+def create_search_ctrl(frame):
+    '''
+    Return a search box calling the `onSearch` and `onSearchCancel` handlers
+    of the `frame`.
+    '''
+
+    search = wx.SearchCtrl(frame, style=wx.TE_PROCESS_ENTER)
+    search.ShowCancelButton(True)
+    search.Bind(wx.EVT_TEXT_ENTER, frame.onSearch)
+    search.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, frame.onSearch)
+    search.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, frame.onSearchCancel)
+    return search
+
+
 class AddModifyDBBaseFrame(wx.Frame):
 
+    # model of the records searched from the search box, no search box is
+    # shown if None
+    search_model = None
+
     def __init__(self, parent, cols=None, id=wx.ID_ANY, title="Edit Database",
                  pos=wx.DefaultPosition, size=(500, 300),
                  style=wx.DEFAULT_FRAME_STYLE, name=""):
@@ -100,6 +122,9 @@ class AddModifyDBBaseFrame(wx.Frame):
         showAllBtn.Bind(wx.EVT_BUTTON, self.onShowAllRecords)
         btnSizer.Add(showAllBtn, 0, wx.ALL, 5)
 
+        if self.search_model is not None:
+            self.search = create_search_ctrl(self)
+            mainSizer.Add(self.search, 0, wx.ALL | wx.EXPAND, 5)
         mainSizer.Add(self.olv, 1, wx.ALL | wx.EXPAND, 5)
         mainSizer.Add(btnSizer, 0, wx.CENTER)
         self.SetSizer(mainSizer)
@@ -123,7 +148,19 @@ class AddModifyDBBaseFrame(wx.Frame):
         """
         Searches database based on the user's filter choice and keyword
         """
-        print("searching")
+
+        keywords = self.search.GetValue()
+        if keywords.strip() == "":
+            self.show_all()
+        else:
+            db = ctrl.DB()
+            self.set_olv(db.search(self.search_model, keywords))
+
+    def onSearchCancel(self, event):
+        '''Clear the search box and show all the records'''
+
+        self.search.SetValue("")
+        self.show_all()
 
     def onShowAllRecords(self, event):
         '''Updates the record list to show all of them'''
@@ -203,6 +240,8 @@ class AddModifyBatchTableFrame(AddModifyDBBaseFrame):
 
 class AddModifyChemicalTableFrame(AddModifyDBBaseFrame):
 
+    search_model = Chemical
+
     def __init__(self, parent, **kwargs):
 
         super(AddModifyChemicalTableFrame, self).__init__(parent, **kwargs)
@@ -271,6 +310,8 @@ class AddModifyChemicalTableFrame(AddModifyDBBaseFrame):
 
 class AddModifyComponentTableFrame(AddModifyDBBaseFrame):
 
+    search_model = Component
+
     def __init__(self, parent, **kwargs):
 
         super(AddModifyComponentTableFrame, self).__init__(parent, **kwargs)
@@ -317,13 +358,6 @@ class AddModifyComponentTableFrame(AddModifyDBBaseFrame):
         ctrl.delete_component_record(db.session, sel_row.id)
         self.show_all()
 
-    def onSearch(self, event):
-        """
-        Searches database based on the user's filter choice and keyword
-        """
-
-        pass
-
     def onShowAllRecords(self, event):
         '''Updates the record list to show all of them'''
 
@@ -564,6 +598,9 @@ class ShowSynthesesFrame(wx.Frame):
                      "temperature", "descr"]
 
         self.model = BatchCalculator()
+        # only one page of syntheses is fetched at a time
+        self.pager = KeysetPager(ctrl.DB().query_synthesis_list, Synthesis,
+                                 page_size=100)
 
         mainSizer = wx.BoxSizer(wx.VERTICAL)
         btnSizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -572,6 +609,20 @@ class ShowSynthesesFrame(wx.Frame):
         self.olv.evenRowsBackColor = "#DCF0C7"
         self.olv.oddRowsBackColor = "#FFFFFF"
         self.olv.SetEmptyListMsg("No Records Found")
+        # sort in the database, not only the current page
+        self.olv.Bind(wx.EVT_LIST_COL_CLICK, self.onColumnClick)
+
+        # create the page navigation row
+
+        pageSizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.prevPageBtn = wx.Button(self, label="<")
+        self.prevPageBtn.Bind(wx.EVT_BUTTON, self.onPreviousPage)
+        pageSizer.Add(self.prevPageBtn, 0, wx.ALL, 5)
+        self.pageLabel = wx.StaticText(self, label="")
+        pageSizer.Add(self.pageLabel, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.nextPageBtn = wx.Button(self, label=">")
+        self.nextPageBtn.Bind(wx.EVT_BUTTON, self.onNextPage)
+        pageSizer.Add(self.nextPageBtn, 0, wx.ALL, 5)
 
         # create the button row
 
@@ -596,7 +647,10 @@ class ShowSynthesesFrame(wx.Frame):
         self.Bind(wx.EVT_CLOSE, self.OnCloseFrame)
         btnSizer.Add(cancelBtn, 0, wx.ALL, 5)
 
+        self.search = create_search_ctrl(self)
+        mainSizer.Add(self.search, 0, wx.ALL | wx.EXPAND, 5)
         mainSizer.Add(self.olv, 1, wx.ALL | wx.EXPAND, 5)
+        mainSizer.Add(pageSizer, 0, wx.CENTER)
         mainSizer.Add(btnSizer, 0, wx.CENTER)
         self.SetSizerAndFit(mainSizer)
 
@@ -605,7 +659,7 @@ class ShowSynthesesFrame(wx.Frame):
     def onEditRecord(self, event):
         'Edit a record'
 
-        sel_row = self.olv.GetSelectedObject()
+        sel_row = self.get_selected_synthesis()
         if sel_row is None:
             dialogs.show_message_dlg("No row selected", "Error")
             return
@@ -617,7 +671,7 @@ class ShowSynthesesFrame(wx.Frame):
                                                   add_record=False)
         dlg.ShowModal()
         dlg.Destroy()
-        self.show_all()
+        self.show_page(self.pager.refresh())
 
     def onExportRecord(self, event):
         '''
@@ -626,7 +680,7 @@ class ShowSynthesesFrame(wx.Frame):
 
         db = ctrl.DB()
 
-        sel_row = self.olv.GetSelectedObject()
+        sel_row = self.get_selected_synthesis()
         if sel_row is None:
             dialogs.show_message_dlg("No row selected", "Error")
             return
@@ -703,13 +757,13 @@ class ShowSynthesesFrame(wx.Frame):
             dialogs.show_message_dlg("No row selected", "Error")
             return
         ctrl.delete_synthesis_record(db.session, sel_row.id)
-        self.show_all()
+        self.show_page(self.pager.refresh())
 
     def onLoadRecord(self, event):
         'Load a record into the batch calculator'
 
         # reset the calcualtor state
-        sel_row = self.olv.GetSelectedObject()
+        sel_row = self.get_selected_synthesis()
         parent = self.GetParent()
         if sel_row is not None:
             # add component to the main frame
@@ -728,6 +782,26 @@ class ShowSynthesesFrame(wx.Frame):
             dialogs.show_message_dlg("No row selected", "Error")
             return
 
+    def onSearch(self, event):
+        '''Show the syntheses matching the keywords from the search box'''
+
+        keywords = self.search.GetValue()
+        if keywords.strip() == "":
+            self.show_all()
+        else:
+            db = ctrl.DB()
+            self.set_olv(db.search(Synthesis, keywords,
+                                   limit=self.pager.page_size))
+            self.prevPageBtn.Enable(False)
+            self.nextPageBtn.Enable(False)
+            self.pageLabel.SetLabel("Best matches")
+
+    def onSearchCancel(self, event):
+        '''Clear the search box and show all the syntheses'''
+
+        self.search.SetValue("")
+        self.show_all()
+
     def OnCloseFrame(self, event):
         '''Close the synthesis frame'''
 
@@ -740,12 +814,45 @@ class ShowSynthesesFrame(wx.Frame):
         self.olv.SetColumns(olv_cols)
         self.olv.SetObjects(syntheses)
 
-    def show_all(self):
-        '''Get all synthesis records and put them in the OLV'''
+    def get_selected_synthesis(self):
+        '''
+        Return the selected synthesis with its components and chemicals or
+        None, the list holds only the columns shown.
+        '''
+
+        sel_row = self.olv.GetSelectedObject()
+        if sel_row is None:
+            return None
+        return ctrl.DB().get_synthesis(sel_row.id)
+
+    def onColumnClick(self, event):
+        '''Sort by the clicked column, clicking again reverses the order'''
+
+        getter = COLUMNS[self.cols[event.GetColumn()]]["valueGetter"]
+        column = getattr(Synthesis, getter)
+        descending = column is self.pager.column and not self.pager.descending
+        self.show_page(self.pager.sort(column, descending))
+
+    def onNextPage(self, event):
+
+        self.show_page(self.pager.next())
+
+    def onPreviousPage(self, event):
+
+        self.show_page(self.pager.previous())
+
+    def show_page(self, syntheses):
+        '''Put a page of synthesis records in the OLV'''
 
-        db = ctrl.DB()
-        syntheses = db.get_syntheses()
         self.set_olv(syntheses)
+        self.prevPageBtn.Enable(self.pager.has_previous)
+        self.nextPageBtn.Enable(self.pager.has_next)
+        self.pageLabel.SetLabel("Page {0:d}".format(self.pager.page + 1))
+
+    def show_all(self):
+        '''Get the first page of synthesis records and put it in the OLV'''
+
+        self.show_page(self.pager.first())
 
 
 class CustomDataTable(gridlib.PyGridTableBase):
@@ -881,6 +988,9 @@ class InputPanel(wx.Panel):
         # Attributes
 
         self.model = model
+        # called with no arguments after the moles of a component were edited
+        self.on_moles_changed = None
+        self.edited_moles = None
 
         self.comp_cols = ["name", "formula", "molwt", "short", "category"]
         self.chem_cols = ["name", "formula", "conc", "molwt", "short", "kind",
@@ -941,6 +1051,58 @@ class InputPanel(wx.Panel):
 
         zeobtn.Bind(wx.EVT_BUTTON, self.OnAddRemoveComponents)
         rctbtn.Bind(wx.EVT_BUTTON, self.OnAddRemoveChemicals)
+        self.comp_olv.Bind(OLVEvent.EVT_CELL_EDIT_STARTED,
+                           self.OnComponentEditStarted)
+        self.comp_olv.Bind(OLVEvent.EVT_CELL_EDIT_FINISHING,
+                           self.OnComponentEditFinishing)
+
+    def OnComponentEditStarted(self, event):
+        '''
+        Follow the changes of the moles in the cell editor to update the
+        results on every keystroke.
+        '''
+
+        self.edited_moles = event.rowModel.moles
+        editor = event.editor
+        component = event.rowModel
+        editor.Bind(wx.EVT_TEXT,
+                    lambda evt: self.OnMolesText(evt, editor, component))
+        event.Skip()
+
+    def OnMolesText(self, event, editor, component):
+        '''
+        Update the masses for the current text of the moles cell editor.
+        '''
+
+        try:
+            moles = float(editor.GetValue())
+        except ValueError:
+            pass
+        else:
+            self.UpdateMoles(component, moles)
+        event.Skip()
+
+    def OnComponentEditFinishing(self, event):
+        '''
+        Restore the original moles if the edit was cancelled.
+        '''
+
+        if event.userCancelled and self.edited_moles is not None:
+            self.UpdateMoles(event.rowModel, self.edited_moles)
+        self.edited_moles = None
+        event.Skip()
+
+    def UpdateMoles(self, component, moles):
+        '''
+        Set the moles of the `component` and update the already calculated
+        masses without solving the whole system again.
+        '''
+
+        db = ctrl.DB()
+
+        if self.model.update_moles(db.session, component, moles) and \
+                self.on_moles_changed is not None:
+            self.on_moles_changed()
 
     def OnAddRemoveComponents(self, event):
         '''
@@ -1027,6 +1189,8 @@ class OutputPanel(wx.Panel):
 
         self.model = model
         self.gray = "#939393"
+        # chemical and its desired mass for the "item" scaling
+        self.rescale_item = None
 
         resulttxt = wx.StaticText(self, -1, label="Results")
         resulttxt.SetFont(wx.Font(12, wx.SWISS, wx.NORMAL, wx.BOLD))
@@ -1126,7 +1290,7 @@ class OutputPanel(wx.Panel):
         else:
             raise ValueError('wrong <scale_type>: {}'.format(scale_type))
 
-        self.resultOlv.SetObjects(self.model.chemicals)
+        self.resultOlv.SetObjects(self.model.state.chemicals)
         self.Layout()
 
     def rescale_all(self, statictext):
@@ -1148,9 +1312,7 @@ class OutputPanel(wx.Panel):
                                       "", wx.OK | wx.ICON_INFORMATION)
                 ed.ShowModal()
                 ed.Destroy()
-            newmasses = self.model.rescale_all()
-            for chemical, newmass in zip(self.model.chemicals, newmasses):
-                chemical.mass = newmass
+            self.model.rescale_all()
             statictext.SetLabel("{0:6.2f}".format(self.model.scale_all))
         dialog.Destroy()
 
@@ -1160,7 +1322,7 @@ class OutputPanel(wx.Panel):
         should be scaled, then rescale all the components and display them.
         '''
 
-        rtsd = dialogs.RescaleToItemDialog(self, self.model.chemicals,
+        rtsd = dialogs.RescaleToItemDialog(self, self.model.state.chemicals,
                                            cols=get_columns(["label", "mass"]),
                                            title="Choose chemical and desired mass")
 
@@ -1182,9 +1344,8 @@ class OutputPanel(wx.Panel):
                 dlg.ShowModal()
                 dlg.Destroy()
             else:
-                newmasses = self.model.rescale_to_chemical(item[0], mass)
-                for chemical, newmass in zip(self.model.chemicals, newmasses):
-                    chemical.mass = newmass
+                self.rescale_item = (item[0], mass)
+                self.model.rescale_to_chemical(item[0], mass)
                 statictext.SetLabel("{0:6.2f}".format(mass))
 
     def rescale_to_sample(self, statictext):
@@ -1218,17 +1379,40 @@ class OutputPanel(wx.Panel):
                 dlg.ShowModal()
                 dlg.Destroy()
             else:
-                newmasses = self.model.rescale_to_sample(selections)
-                for chemical, newmass in zip(self.model.chemicals, newmasses):
-                    chemical.mass = newmass
+                self.model.rescale_to_sample(selections)
                 statictext.SetLabel("{0:6.2f}".format(self.model.sample_size))
 
+    def RefreshResults(self):
+        '''
+        Re-apply the current scaling without asking for its parameters and
+        refresh the results after the masses were updated.
+        '''
+
+        scale_type = next(x[0] for x in self.scaling_ctrls if x[1].GetValue())
+
+        if scale_type == 'all':
+            self.model.rescale_all()
+        elif scale_type == 'sample' and len(self.model.selections) > 0:
+            self.model.rescale_to_sample(self.model.selections)
+        elif scale_type == 'item' and self.rescale_item is not None:
+            self.model.rescale_to_chemical(*self.rescale_item)
+
+        # the masses are calculated again in a new state when the selection
+        # or the catalog changed, its chemicals replace the ones shown
+        chemicals = self.model.state.chemicals
+        shown = self.resultOlv.GetObjects()
+        if len(shown) == len(chemicals) and \
+                all(a is b for a, b in zip(shown, chemicals)):
+            self.resultOlv.RefreshObjects(chemicals)
+        else:
+            self.resultOlv.SetObjects(chemicals)
+
     def SetResults(self):
         '''Set the OLV columns and put current Chemical objects in the OLV'''
 
         olv_cols = get_columns(["label", "mass", "volume"])
         self.resultOlv.SetColumns(olv_cols)
-        self.resultOlv.SetObjects(self.model.chemicals)
+        self.resultOlv.SetObjects(self.model.state.chemicals)
 
 
 class MolesOutputPanel(wx.Panel):
@@ -1283,7 +1467,7 @@ class MolesOutputPanel(wx.Panel):
         db = ctrl.DB()
 
         self.model.calculate_moles(db.session)
-        self.resultOlv.SetObjects(self.model.components)
+        self.resultOlv.SetObjects(self.model.state.components)
 
     def OnRescaleMoles(self, event):
         '''
@@ -1292,7 +1476,7 @@ class MolesOutputPanel(wx.Panel):
         them.
         '''
 
-        rtsd = dialogs.RescaleToItemDialog(self, self.model.components,
+        rtsd = dialogs.RescaleToItemDialog(self, self.model.state.components,
                                            cols=get_columns(["label", "moles"]),
                                            title="Choose one component and enter moles")
         result = rtsd.ShowModal()
@@ -1313,10 +1497,8 @@ class MolesOutputPanel(wx.Panel):
                 dlg.ShowModal()
                 dlg.Destroy()
             else:
-                newmoles = self.model.rescale_to_item(item[0], amount)
-                for c, m in zip(self.model.components, newmoles):
-                    c.moles = m
-                self.resultOlv.SetObjects(self.model.components)
+                self.model.rescale_to_item(item[0], amount)
+                self.resultOlv.SetObjects(self.model.state.components)
                 self.Layout()
 
     def SetResults(self):
@@ -1324,7 +1506,7 @@ class MolesOutputPanel(wx.Panel):
 
         olv_cols = get_columns(["label", "moles", "mass"])
         self.resultOlv.SetColumns(olv_cols)
-        self.resultOlv.SetObjects(self.model.components)
+        self.resultOlv.SetObjects(self.model.state.components)
 
     def update_olv(self):
         'update the OLVs'
@@ -1500,6 +1682,7 @@ class MainFrame(wx.Frame):
 
         self.inppanel = InputPanel(splitter, self.model)
         self.outpanel = OutputPanel(splitter, self.model)
+        self.inppanel.on_moles_changed = self.outpanel.RefreshResults
 
         splitter.SplitHorizontally(self.inppanel, self.outpanel)
         splitter.SetSashGravity(0.5)
@@ -1539,6 +1722,10 @@ class MainFrame(wx.Frame):
         dbm.AppendSeparator()
         mchangedb = dbm.Append(wx.ID_ANY, "Change db\t",
                                "Switch to a different database")
+        mexportdb = dbm.Append(wx.ID_ANY, "Export db\t",
+                               "Save the current database to an archive")
+        mimportdb = dbm.Append(wx.ID_ANY, "Import db\t",
+                               "Create a new database from an archive")
         dbm.AppendSeparator()
         maddchemicaldb = dbm.Append(wx.ID_ANY, "Edit Chemicals\t",
                                     "Edit chemicals records in the database")
@@ -1577,6 +1764,8 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.OnExportPdf, mepdf)
         self.Bind(wx.EVT_MENU, self.OnChangeDB, mchangedb)
         self.Bind(wx.EVT_MENU, self.OnNewDB, mnewdb)
+        self.Bind(wx.EVT_MENU, self.OnExportDB, mexportdb)
+        self.Bind(wx.EVT_MENU, self.OnImportDB, mimportdb)
         self.Bind(wx.EVT_MENU, self.OnAddChemicalToDB, maddchemicaldb)
         self.Bind(wx.EVT_MENU, self.OnAddComponentToDB, maddcomponentdb)
         self.Bind(wx.EVT_MENU, self.OnAddBatchToDB, maddbatchdb)
@@ -1585,6 +1774,7 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.OnShowSyntheses, synth_show)
         self.Bind(wx.EVT_MENU, self.OnSaveCalculation, synth_save)
         self.Bind(wx.EVT_MENU, self.OnAbout, about)
+        self.Bind(wx.EVT_ACTIVATE, self.OnActivate)
 
     def OnAbout(self, event):
         '''
@@ -1606,6 +1796,16 @@ class MainFrame(wx.Frame):
         # info.License = wordwrap(__doc__, 600, wx.ClientDC(self))
         wx.AboutBox(info)
 
+    def OnActivate(self, event):
+        '''
+        Pick up the changes made to the database by other programs (e.g.
+        zbc-import) when the window is activated.
+        '''
+
+        if event.GetActive():
+            refresh_catalog_version(ctrl.DB().session)
+        event.Skip()
+
     def OnAddBatchToDB(self, event):
         '''
         Add a Chemical to the Database
@@ -1775,6 +1975,77 @@ class MainFrame(wx.Frame):
 
         dlg.Destroy()
 
+    def OnExportDB(self, event):
+        '''
+        Save the current database to an archive.
+        '''
+
+        archwildcard = "Archive Files (*.tar)|*.tar|"     \
+                       "All files (*.*)|*.*"
+
+        dlg = wx.FileDialog(self, message="Export database to",
+                            defaultDir=os.getcwd(), defaultFile="",
+                            wildcard=archwildcard,
+                            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT | wx.FD_CHANGE_DIR)
+
+        if dlg.ShowModal() == wx.ID_OK:
+            path = dlg.GetPath()
+            db = ctrl.DB()
+            manifest = export_database(db.session, path)
+            nrows = sum(t["rows"] for t in manifest["tables"])
+            msg = wx.MessageDialog(None, "Exported {0:d} records".format(nrows),
+                                   "", wx.OK | wx.ICON_INFORMATION)
+            msg.ShowModal()
+            msg.Destroy()
+
+        dlg.Destroy()
+
+    def OnImportDB(self, event):
+        '''
+        Create a new database from an archive and switch to it.
+        '''
+
+        archwildcard = "Archive Files (*.tar)|*.tar|"     \
+                       "All files (*.*)|*.*"
+
+        dlg = wx.FileDialog(self, message="Choose database archive",
+                            defaultDir=os.getcwd(), defaultFile="",
+                            wildcard=archwildcard,
+                            style=wx.OPEN | wx.CHANGE_DIR)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        archpath = dlg.GetPath()
+        dlg.Destroy()
+
+        dbwildcard = "db Files (*.db)|*.db|"     \
+                     "All files (*.*)|*.*"
+
+        dlg = wx.FileDialog(self, message="Save new database as",
+                            defaultDir=os.getcwd(), defaultFile="",
+                            wildcard=dbwildcard,
+                            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT | wx.FD_CHANGE_DIR)
+
+        if dlg.ShowModal() == wx.ID_OK:
+            path = dlg.GetPath()
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                import_database(archpath, path)
+            except ValueError as err:
+                msg = wx.MessageDialog(None, str(err), "",
+                                       wx.OK | wx.ICON_ERROR)
+            else:
+                ctrl.DB().switch_session(path)
+                self.model = BatchCalculator()
+                self.update_all_objectlistviews()
+                msg = wx.MessageDialog(None, "Successfully imported the database",
+                                       "", wx.OK | wx.ICON_INFORMATION)
+            msg.ShowModal()
+            msg.Destroy()
+
+        dlg.Destroy()
+
     def OnOpen(self, evt):
         '''
         Open the open file dialog.
@@ -1797,12 +2068,20 @@ class MainFrame(wx.Frame):
 
             # open the file and read the actual data
             fp = open(path, 'rb')
+            data = pickle.load(fp)
+            fp.close()
+
             (self.model.components, self.model.chemicals,
              self.model.A, self.model.B, self.model.X,
              self.model.scale_all, self.model.sample_scale,
-             self.model.sample_size, self.model.selections) = pickle.load(fp)
+             self.model.sample_size, self.model.selections) = data[:9]
 
-            fp.close()
+            # the results are kept in the state, files saved before they
+            # were stored have only the selection
+            if len(data) > 9:
+                self.model.restore_state(*data[9:11])
+            else:
+                self.model.new_state()
 
             self.update_all_objectlistviews()
 
@@ -1837,7 +2116,8 @@ class MainFrame(wx.Frame):
                     self.model.chemicals,
                     self.model.A, self.model.B, self.model.X,
                     self.model.scale_all, self.model.sample_scale,
-                    self.model.sample_size, self.model.selections)
+                    self.model.sample_size, self.model.selections,
+                    self.model.state.masses, self.model.state.moles)
             fp = file(path, 'wb')  # Create file anew
             pickle.dump(data, fp, protocol=pickle.HIGHEST_PROTOCOL)
             fp.close()
@@ -1953,7 +2233,7 @@ class MainFrame(wx.Frame):
 
         self.inppanel.comp_olv.SetObjects(self.model.components)
         self.inppanel.chem_olv.SetObjects(self.model.chemicals)
-        self.outpanel.resultOlv.SetObjects(self.model.chemicals)
+        self.outpanel.resultOlv.SetObjects(self.model.state.chemicals)
 
 
 def ExceptionHook(exctype, value, trace):
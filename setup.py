@@ -29,17 +29,20 @@ setup(
     entry_points={
         'console_scripts': [
             'zbc = batchcalc.zbc:main',
+            'zbc-calc = batchcalc.cli:main',
+            'zbc-import = batchcalc.importer:main',
         ],
     },
     include_package_data=True,
     install_requires=[
         'numpy>=1.8.1',
-        'sqlalchemy>=0.9.7',
+        'sqlalchemy>=1.2',
         'jinja2>=2.7.3',
         'reportlab',
         'wxpython',
         'objectlistview',
         'six',
+        'futures; python_version < "3"',
     ],
     long_description=readme(),
     packages=["batchcalc"],
@@ -0,0 +1,122 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from batchcalc import archive, migrations
+from batchcalc.db import DB
+from batchcalc.model import Base, Chemical
+
+from test_batch_calculator import DBPATH
+
+
+def read_table(dbpath, table):
+    conn = sqlite3.connect(dbpath)
+    rows = conn.execute("SELECT {0:s} FROM {1:s} ORDER BY id".format(
+        ", ".join(c.name for c in table.columns), table.name)).fetchall()
+    conn.close()
+    return rows
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.archive = os.path.join(self.tmpdir, 'zeolite.tar')
+        self.dbpath = os.path.join(self.tmpdir, 'copy.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+
+        source = os.path.join(self.tmpdir, 'source.db')
+        shutil.copy(DBPATH, source)
+        db = DB()
+        db.switch_session(source)
+        try:
+            manifest = archive.export_database(db.session, self.archive, chunk_size=7)
+        finally:
+            db.switch_session(db.dbpath)
+        self.assertEqual(manifest["version"], archive.ARCHIVE_VERSION)
+        self.assertEqual(manifest["schema_version"], migrations.get_latest_version())
+        rows = dict((t["name"], t["rows"]) for t in manifest["tables"])
+        self.assertEqual(rows["chemicals"], len(read_table(source, Base.metadata.tables["chemicals"])))
+
+        with tarfile.open(self.archive) as tar:
+            self.assertIn("batch.jsonl.gz", tar.getnames())
+
+        counts = archive.import_database(self.archive, self.dbpath, chunk_size=7)
+        self.assertEqual(counts, rows)
+        for table in archive.get_tables():
+            self.assertEqual(read_table(self.dbpath, table),
+                             read_table(source, table), table.name)
+
+        with self.assertRaises(ValueError):
+            archive.import_database(self.archive, self.dbpath)
+
+    def test_uncommitted_changes(self):
+
+        shutil.copy(DBPATH, self.dbpath)
+        engine = create_engine("sqlite:///{0:s}".format(self.dbpath))
+        session = sessionmaker(bind=engine)()
+        chemical = session.query(Chemical).order_by(Chemical.id).first()
+        chemical.name = "renamed"
+        session.flush()
+
+        archive.export_database(session, self.archive)
+        with tarfile.open(self.archive) as tar:
+            rows = gzip.GzipFile(fileobj=tar.extractfile("chemicals.jsonl.gz")).read()
+        self.assertNotIn(b"renamed", rows)
+
+        # the change is still pending in the session and not in the database
+        self.assertTrue(session.in_transaction())
+        session.rollback()
+        session.close()
+        engine.dispose()
+        self.assertEqual(read_table(self.dbpath, Chemical.__table__),
+                         read_table(DBPATH, Chemical.__table__))
+
+    def test_read_only_unmigrated(self):
+
+        engine = create_engine("sqlite:///{0:s}".format(self.dbpath))
+        Base.metadata.create_all(engine)
+        engine.dispose()
+        engine = create_engine("sqlite:///file:{0:s}?mode=ro&uri=true".format(self.dbpath))
+        session = sessionmaker(bind=engine)()
+
+        manifest = archive.export_database(session, self.archive)
+        self.assertEqual(manifest["schema_version"], 0)
+        session.close()
+        engine.dispose()
+
+        conn = sqlite3.connect(self.dbpath)
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master")]
+        conn.close()
+        self.assertNotIn("schema_version", names)
+
+    def test_newer_archive(self):
+
+        manifest = json.dumps({"format": archive.ARCHIVE_FORMAT,
+                               "version": archive.ARCHIVE_VERSION + 1,
+                               "tables": []}).encode("utf-8")
+        with tarfile.open(self.archive, "w") as tar:
+            info = tarfile.TarInfo(archive.MANIFEST)
+            info.size = len(manifest)
+            tar.addfile(info, io.BytesIO(manifest))
+
+        with self.assertRaises(ValueError):
+            archive.import_database(self.archive, self.dbpath)
+        self.assertFalse(os.path.exists(self.dbpath))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,459 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import batchcalc
+from batchcalc import db as dbm, migrations
+from batchcalc.calculator import (BatchCalculator, BatchSolver, SolverCache,
+                                  calculate)
+from batchcalc.catalog import Selection, get_catalog
+from batchcalc.model import Chemical, Component
+
+
+DBPATH = os.path.join(os.path.dirname(batchcalc.__file__), 'data', 'zeolite.db')
+
+
+def get_test_session(dbpath):
+    '''Return a session bound to the database at `dbpath`.'''
+
+    engine = create_engine("sqlite:///{0:s}".format(dbpath), echo=False)
+    return sessionmaker(bind=engine, expire_on_commit=False,
+                        autoflush=False)()
+
+
+class QueryCounter(object):
+    '''Count the SQL statements executed on an engine.'''
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def callback(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self.callback)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, "before_cursor_execute", self.callback)
+
+
+class TestBatchMatrix(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.session = get_test_session(self.dbpath)
+        self.comps = dict((c.id, c) for c in self.session.query(Component))
+        self.chems = dict((c.id, c) for c in self.session.query(Chemical))
+        # load the kinds to keep the lazy loads out of the query counts
+        for chem in self.chems.values():
+            chem.kind
+
+        self.bc = BatchCalculator()
+        # Na2O, Al2O3, SiO2, H2O
+        self.bc.components = [self.comps[i] for i in (1, 3, 4, 5)]
+        # NaOH, sodium aluminate, fumed silica, water
+        self.bc.chemicals = [self.chems[i] for i in (1, 3, 9, 10)]
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_batch_matrix(self):
+
+        B = self.bc.get_B_matrix(self.session)
+        ref = np.array([[0.75929763, 0.0, 0.0, 0.24070237],
+                        [0.37805817, 0.62194183, 0.0, 0.0],
+                        [0.0, 0.0, 1.0, 0.0],
+                        [0.0, 0.0, 0.0, 1.0]])
+        np.testing.assert_allclose(B, ref, atol=1.0e-8)
+
+    def test_batch_matrix_query_count(self):
+
+        # the catalog is built with a fixed number of queries
+        dbm.bump_catalog_version()
+        with QueryCounter(self.session.bind) as counter:
+            get_catalog(self.session)
+        self.assertLessEqual(counter.count, 4)
+
+        for chemids in [(1, 9), (1, 3, 9, 10, 7, 8, 11, 15)]:
+            self.bc.chemicals = [self.chems[i] for i in chemids]
+            with QueryCounter(self.session.bind) as counter:
+                self.bc.get_B_matrix(self.session)
+            self.assertEqual(counter.count, 0)
+
+    def test_batch_matrix_concentration(self):
+
+        # changing the concentration of a solution changes its weight fractions
+        self.bc.chemicals[0].concentration = 0.5
+        B = self.bc.get_B_matrix(self.session)
+        self.chems[1].concentration = 0.98
+        self.assertAlmostEqual(B[0, 0] + B[0, 3], 1.0)
+        self.assertLess(B[0, 0], 0.75929763 - 0.1)
+
+    def test_calculate_masses(self):
+
+        for comp, moles in zip(self.bc.components, [1.5, 1.0, 30.0, 500.0]):
+            comp.moles = moles
+        self.bc.calculate_masses(self.session)
+        np.testing.assert_allclose(self.bc.state.masses,
+                                   [40.81333673, 163.94022,
+                                    1802.529, 8997.77613327])
+        # the results are not written to the shared ORM objects
+        self.assertTrue(all(c.mass == 0.0 for c in self.bc.chemicals))
+        self.assertEqual([c.mass for c in self.bc.state.chemicals],
+                         self.bc.state.masses.tolist())
+
+    def test_restore_state(self):
+
+        # the results saved in a .zbc file come back after opening it
+        for comp, moles in zip(self.bc.components, [1.5, 1.0, 30.0, 500.0]):
+            comp.moles = moles
+        self.bc.calculate_masses(self.session)
+        self.bc.rescale_all()
+        data = pickle.dumps((self.bc.components, self.bc.chemicals,
+                             self.bc.state.masses, self.bc.state.moles))
+
+        components, chemicals, masses, moles = pickle.loads(data)
+        bc = BatchCalculator()
+        bc.components, bc.chemicals = components, chemicals
+        self.assertTrue(all(c.mass == 0.0 for c in bc.state.chemicals))
+        state = bc.restore_state(masses, moles)
+        self.assertIs(bc.state, state)
+        np.testing.assert_allclose([c.mass for c in state.chemicals],
+                                   self.bc.state.masses)
+        np.testing.assert_allclose([c.moles for c in state.components],
+                                   [1.5, 1.0, 30.0, 500.0])
+
+    def test_rescale_in_place(self):
+
+        self.bc.calculate_masses(self.session)
+        state = self.bc.state
+        masses = state.masses
+        views = state.chemicals
+
+        self.bc.rescale_to_chemical(views[2], 10.0)
+        self.assertIs(self.bc.state.masses, masses)
+        self.assertAlmostEqual(views[2].mass, 10.0)
+
+        self.bc.sample_size = 5.0
+        self.bc.rescale_to_sample([views[0], self.bc.chemicals[1]])
+        self.assertAlmostEqual(views[0].mass + views[1].mass, 5.0)
+
+        # water is a liquid
+        self.assertAlmostEqual(views[3].volume, views[3].mass / views[3].density)
+
+    def test_calculate_masses_many(self):
+
+        moles = np.array([[1.5, 1.0, 30.0, 500.0],
+                          [1.5, 1.0, 20.0, 500.0],
+                          [1.5, 1.0, 30.0, 250.0]])
+        masses = self.bc.calculate_masses_many(self.session, moles)
+        self.assertEqual(masses.shape, (3, 4))
+
+        for row, target in zip(masses, moles):
+            for comp, nmol in zip(self.bc.components, target):
+                comp.moles = nmol
+            self.bc.calculate_masses(self.session)
+            np.testing.assert_allclose(row, self.bc.state.masses)
+
+    def test_calculate_masses_many_leaves_objects(self):
+
+        self.bc.calculate_masses_many(self.session, [[1.5, 1.0, 30.0, 500.0]])
+        self.assertTrue(all(c.moles == 1.0 for c in self.bc.components))
+        self.assertTrue(all(c.mass == 0.0 for c in self.bc.chemicals))
+
+    def test_calculate_masses_many_wrong_shape(self):
+
+        with self.assertRaises(ValueError):
+            self.bc.calculate_masses_many(self.session, [[1.0, 2.0]])
+
+    def test_calculate_moles_many(self):
+
+        moles = np.array([[1.5, 1.0, 30.0, 500.0],
+                          [3.0, 2.0, 40.0, 800.0]])
+        masses = self.bc.calculate_masses_many(self.session, moles)
+        np.testing.assert_allclose(
+            self.bc.calculate_moles_many(self.session, masses), moles)
+        self.assertTrue(all(c.moles == 1.0 for c in self.bc.components))
+
+        # normalized to 1 mole of Al2O3
+        alumina = self.bc.components[1]
+        res = self.bc.calculate_moles_many(self.session, masses,
+                                           reference=alumina)
+        np.testing.assert_allclose(res, [[1.5, 1.0, 30.0, 500.0],
+                                         [1.5, 1.0, 20.0, 400.0]])
+
+        for chemical, mass in zip(self.bc.chemicals, masses[1]):
+            chemical.mass = mass
+        self.bc.calculate_moles(self.session)
+        np.testing.assert_allclose(self.bc.state.moles, moles[1])
+
+    def test_calculate_moles_many_zero_reference(self):
+
+        masses = [[0.0, 0.0, 1800.0, 9000.0]]
+        with self.assertRaises(ValueError):
+            self.bc.calculate_moles_many(self.session, masses,
+                                         reference=self.bc.components[1])
+
+    def test_update_moles(self):
+
+        self.assertFalse(self.bc.update_moles(self.session,
+                                              self.bc.components[2], 30.0))
+        self.bc.calculate_masses(self.session)
+        with QueryCounter(self.session.bind) as counter:
+            for comp, moles in zip(self.bc.components, [1.5, 1.0, 30.0, 500.0]):
+                self.assertTrue(self.bc.update_moles(self.session, comp, moles))
+        self.assertEqual(counter.count, 0)
+        masses = self.bc.state.masses.copy()
+        np.testing.assert_allclose(masses, [40.81333673, 163.94022,
+                                            1802.529, 8997.77613327])
+
+        self.bc.calculate_masses(self.session)
+        np.testing.assert_allclose(self.bc.state.masses, masses)
+
+    def test_check_selection(self):
+
+        get_catalog(self.session)
+        with QueryCounter(self.session.bind) as counter:
+            self.bc.check_selection(self.session)
+        self.assertEqual(counter.count, 0)
+
+        # with fumed silica only Na2O, Al2O3 and H2O have no source
+        self.bc.chemicals = [self.chems[9]]
+        with self.assertRaises(ValueError) as ctx:
+            self.bc.check_selection(self.session)
+        self.assertIn("sodium oxide, aluminium oxide, water", str(ctx.exception))
+
+    def test_solver_reused(self):
+
+        self.bc.calculate_masses(self.session)
+        self.assertEqual(len(self.bc.solvers), 1)
+        self.bc.components[2].moles = 20.0
+        with QueryCounter(self.session.bind) as counter:
+            self.bc.calculate_masses(self.session)
+        self.assertEqual(counter.count, 0)
+        self.assertEqual(len(self.bc.solvers), 1)
+
+    def test_solver_invalidated(self):
+
+        self.bc.calculate_masses(self.session)
+        dbm.bump_catalog_version()
+        with QueryCounter(self.session.bind) as counter:
+            self.bc.calculate_masses(self.session)
+        self.assertGreater(counter.count, 0)
+
+        self.bc.chemicals[0].concentration = 0.5
+        self.bc.calculate_masses(self.session)
+        self.assertEqual(len(self.bc.solvers), 3)
+
+
+class TestCatalogErrors(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+        # invalid records: solutions without or with a zero concentration,
+        # a reactant whose components have no mass and a reactant without
+        # concentration, all sources of SiO2
+        conn = sqlite3.connect(cls.dbpath)
+        for cid, kind, conc in [(101, 2, None), (102, 2, 0.0), (103, 3, 1.0),
+                                (104, 3, None)]:
+            conn.execute("INSERT INTO chemicals (id, name, formula, molwt, kind_id, "
+                         "concentration) VALUES (?, ?, 'X', 1.0, ?, ?)",
+                         (cid, "bad {0:d}".format(cid), kind, conc))
+            coeffs = [0.0, 0.0] if cid == 103 else [1.0]
+            for comp, coeff in zip((4, 5), coeffs):
+                conn.execute("INSERT INTO batch (chemical_id, component_id, coefficient) "
+                             "VALUES (?, ?, ?)", (cid, comp, coeff))
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_invalid_chemicals(self):
+
+        session = get_test_session(self.dbpath)
+        dbm.bump_catalog_version()
+        catalog = get_catalog(session)
+        self.assertTrue(set([101, 102, 103, 104]).issubset(catalog.errors))
+
+        # unrelated selections are not affected
+        res = calculate(catalog, Selection((1, 3, 4, 5), (1, 3, 9, 10), None),
+                        [1.5, 1.0, 30.0, 500.0])
+        np.testing.assert_allclose(res.masses, [40.81333673, 163.94022,
+                                                1802.529, 8997.77613327])
+
+        for cid in (101, 102, 103, 104):
+            with self.assertRaises(ValueError) as ctx:
+                catalog.get_recipe(Selection((1, 3, 4, 5), (1, 3, cid, 10), None))
+            self.assertIn("chemical {0:d}".format(cid), str(ctx.exception))
+        session.close()
+
+
+class TestCatalogRefresh(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_changes_from_other_connections(self):
+
+        session = get_test_session(self.dbpath)
+        migrations.upgrade(session.get_bind())
+        dbm.refresh_catalog_version(session)
+        catalog = get_catalog(session)
+        self.assertFalse(dbm.refresh_catalog_version(session))
+        self.assertIs(get_catalog(session), catalog)
+        session.commit()
+
+        # another process adds a source of SiO2
+        conn = sqlite3.connect(self.dbpath)
+        conn.execute("INSERT INTO chemicals (id, name, formula, molwt, kind_id, "
+                     "concentration) VALUES (201, 'silica', 'SiO2', 60.08, 3, 1.0)")
+        conn.execute("INSERT INTO batch (chemical_id, component_id, coefficient) "
+                     "VALUES (201, 4, 1.0)")
+        conn.commit()
+        conn.close()
+
+        # seen only after a refresh, the calculations do not query for it
+        with QueryCounter(session.bind) as counter:
+            self.assertIs(get_catalog(session), catalog)
+        self.assertEqual(counter.count, 0)
+        self.assertTrue(dbm.refresh_catalog_version(session))
+        updated = get_catalog(session)
+        self.assertIsNot(updated, catalog)
+        self.assertIn(201, updated.sources[4])
+        self.assertNotIn(201, catalog.sources[4])
+        session.close()
+
+
+class TestReentrant(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        session = get_test_session(cls.dbpath)
+        cls.catalog = get_catalog(session)
+        session.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.selection = Selection((1, 3, 4, 5), (1, 3, 9, 10), None)
+
+    def test_calculate(self):
+
+        res = calculate(self.catalog, self.selection, [1.5, 1.0, 30.0, 500.0])
+        np.testing.assert_allclose(res.masses, [40.81333673, 163.94022,
+                                                1802.529, 8997.77613327])
+        self.assertIs(self.catalog.get_recipe(self.selection), res.recipe)
+
+        # a different concentration of the NaOH solution is a new recipe
+        other = Selection((1, 3, 4, 5), (1, 3, 9, 10), (0.5, None, None, None))
+        res2 = calculate(self.catalog, other, [1.5, 1.0, 30.0, 500.0])
+        self.assertIsNot(res2.recipe, res.recipe)
+        self.assertGreater(res2.masses[0], res.masses[0])
+
+    def test_uncovered(self):
+
+        with self.assertRaises(ValueError):
+            calculate(self.catalog, Selection((1, 3, 4, 5), (9,), None),
+                      [1.5, 1.0, 30.0, 500.0])
+
+    def test_threads(self):
+
+        moles = [[1.5, 1.0, 10.0 + i, 100.0 + 10 * i] for i in range(200)]
+        selections = [self.selection,
+                      Selection((1, 3, 4, 5), (1, 3, 9, 10), (0.4, None, None, None))]
+
+        def job(i):
+            return calculate(self.catalog, selections[i % 2], moles[i]).masses
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(job, range(len(moles))))
+
+        for i, masses in enumerate(results):
+            ref = self.catalog.get_recipe(selections[i % 2]).apply(moles[i])
+            np.testing.assert_allclose(masses, ref)
+
+
+class TestBatchSolver(unittest.TestCase):
+
+    def test_square(self):
+
+        B = np.array([[0.8, 0.0, 0.2], [0.4, 0.6, 0.0], [0.0, 0.0, 1.0]])
+        A = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+        X = BatchSolver(B).solve(A)
+        np.testing.assert_allclose(np.dot(B.T, X), A)
+
+    def test_overdetermined(self):
+
+        B = np.array([[0.8, 0.0, 0.2], [0.0, 0.6, 0.4]])
+        A = np.array([1.0, 2.0, 3.0])
+        X = BatchSolver(B).solve(A)
+        ref = np.linalg.lstsq(B.T, A, rcond=None)[0]
+        np.testing.assert_allclose(X, ref)
+
+    def test_lru_eviction(self):
+
+        cache = SolverCache(maxsize=2)
+        solvers = [BatchSolver(np.eye(2)) for _ in range(3)]
+        cache.put("a", solvers[0])
+        cache.put("b", solvers[1])
+        self.assertIs(cache.get("a"), solvers[0])
+        cache.put("c", solvers[2])
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertIn("c", cache)
+
+
+class TestHeadlessImport(unittest.TestCase):
+
+    def test_no_gui_modules(self):
+
+        code = ("import sys, batchcalc.calculator, batchcalc.db, batchcalc.sweep; "
+                "print(any(m in sys.modules for m in ('wx', 'ObjectListView')))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(batchcalc.__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(out.strip(), b'False')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import batchcalc
+from batchcalc import cli
+from batchcalc.db import open_session
+
+from test_batch_calculator import DBPATH
+
+
+class TestCli(unittest.TestCase):
+
+    composition = "1.5 Na2O : 1.0 Al2O3 : 30 SiO2 : 500 H2O"
+    chemicals = ["sodium hydroxide", "3", "fumed silica", "water"]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        cls.session = open_session(cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+        cls.session.get_bind().dispose()
+        shutil.rmtree(cls.tmpdir)
+
+    def run_cli(self, *args):
+        argv = [self.composition, "--db", self.dbpath, "-c"] + self.chemicals + list(args)
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            code = cli.main(argv)
+        return code, out.getvalue(), err.getvalue()
+
+    def masses(self, output):
+        rows = output.splitlines()[2:]
+        return [float(r.split('|')[1]) for r in rows]
+
+    def test_masses(self):
+        code, out, err = self.run_cli()
+        self.assertEqual(code, 0)
+        for ref, mass in zip([40.8133, 163.9402, 1802.5290, 8997.7761], self.masses(out)):
+            self.assertAlmostEqual(ref, mass, places=4)
+        self.assertIn("9024.8507", out)
+
+    def test_scale_all(self):
+        code, out, err = self.run_cli("--scale-all", "100")
+        for ref, mass in zip([0.4081, 1.6394, 18.0253, 89.9778], self.masses(out)):
+            self.assertAlmostEqual(ref, mass, places=4)
+
+    def test_sample_size(self):
+        code, out, err = self.run_cli("--sample-size", "10", "--sample-chemicals", "1", "3", "9")
+        self.assertAlmostEqual(sum(self.masses(out)[:3]), 10.0, places=3)
+
+    def test_rescale_to_chemical(self):
+        code, out, err = self.run_cli("--rescale-to", "water", "100")
+        self.assertAlmostEqual(self.masses(out)[3], 100.0, places=4)
+
+    def test_unknown_chemical(self):
+        self.chemicals = ["unobtainium"]
+        code, out, err = self.run_cli()
+        self.assertEqual(code, 1)
+        self.assertIn("unknown chemical", err)
+
+    def test_batch_jsonl(self):
+        jobs = io.StringIO(
+            '{"id": "a", "composition": "%s", "chemicals": ["sodium hydroxide", 3, "fumed silica", "water"]}\n'
+            '{"id": "b", "composition": "%s", "chemicals": "1;3;9;10", "scale_all": 100}\n'
+            'not json\n'
+            '{"composition": "1 Na2O", "chemicals": ["unobtainium"]}\n' % (self.composition, self.composition))
+        out = io.StringIO()
+        self.assertEqual(cli.run_batch(self.session, jobs, out), 2)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["job"] for r in results], [0, 1, 2, 3])
+        self.assertAlmostEqual(results[0]["chemicals"][3]["mass"], 8997.7761, places=4)
+        self.assertAlmostEqual(results[1]["chemicals"][3]["mass"], 89.9778, places=4)
+        self.assertIn("invalid JSON", results[2]["error"])
+        self.assertIn("unknown chemical", results[3]["error"])
+
+    def test_batch_invalid_jobs(self):
+        good = '{"composition": "%s", "chemicals": "1;3;9;10"' % self.composition
+        jobs = io.StringIO(
+            good + ', "rescale_to": "water", "rescale_mass": null}\n' +
+            '{"composition": 5, "chemicals": "1;3;9;10"}\n' +
+            good + ', "scale_all": 0}\n' +
+            good + ', "sample_size": "ten"}\n' +
+            good + '}\n')
+        out = io.StringIO()
+        self.assertEqual(cli.run_batch(self.session, jobs, out), 4)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertIn("missing rescale_mass", results[0]["error"])
+        self.assertIn("composition should be a string", results[1]["error"])
+        self.assertIn("should be a positive number", results[2]["error"])
+        self.assertIn("not a number", results[3]["error"])
+        self.assertAlmostEqual(results[4]["chemicals"][3]["mass"], 8997.7761, places=4)
+
+    def test_batch_csv(self):
+        jobs = io.StringIO(
+            'id,composition,chemicals,sample_size,sample_chemicals\n'
+            'x,%s,1;3;9;10,10,1;3;9\n'
+            'y,%s,1;3;9;10,,\n' % (self.composition, self.composition))
+        out = io.StringIO()
+        self.assertEqual(cli.run_batch(self.session, jobs, out, fmt="csv"), 0)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["id"] for r in results], ["x", "y"])
+        self.assertAlmostEqual(sum(c["mass"] for c in results[0]["chemicals"][:3]), 10.0)
+        self.assertAlmostEqual(results[1]["chemicals"][0]["mass"], 40.8133, places=4)
+
+    def test_db_only(self):
+        # the bundled database is not opened with --db
+        code = ("import batchcalc.cli, batchcalc.db as dbm; "
+                "batchcalc.cli.main(['1 SiO2', '--db', {0!r}, '-c', 'fumed silica']); "
+                "print(dbm.DB in dbm.Singleton._instances)".format(self.dbpath))
+        root = os.path.dirname(os.path.dirname(os.path.abspath(batchcalc.__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(out.splitlines()[-1].strip(), b'False')
+
+    def test_no_heavy_imports(self):
+        code = ("import sys, batchcalc.cli; "
+                "print(any(m in sys.modules for m in ('wx', 'reportlab', 'jinja2')))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(batchcalc.__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(out.strip(), b'False')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,330 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import event, text
+
+from batchcalc.db import (DB, add_category_record, bump_catalog_version,
+                          get_engine, get_loader_options)
+from batchcalc.model import Batch, Chemical, Component
+
+from test_batch_calculator import DBPATH
+
+
+def in_thread(func):
+    '''Run `func` in a new thread and return its result.'''
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TestDB(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        cls.otherpath = os.path.join(cls.tmpdir, 'other.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        shutil.copy(DBPATH, cls.otherpath)
+        DB().switch_session(cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        DB().switch_session(DB().dbpath)
+        shutil.rmtree(cls.tmpdir)
+
+    def test_singleton(self):
+
+        self.assertIs(DB(), DB())
+        self.assertIs(in_thread(DB), DB())
+
+    def test_bundled_not_modified(self):
+
+        with open(DBPATH, "rb") as fobj:
+            data = fobj.read()
+        db = DB()
+        db.switch_session(DBPATH)
+        try:
+            self.assertGreater(db.session.query(Component).count(), 0)
+        finally:
+            db.switch_session(self.dbpath)
+        with open(DBPATH, "rb") as fobj:
+            self.assertEqual(fobj.read(), data)
+
+    def test_thread_local_sessions(self):
+
+        db = DB()
+        self.assertIs(db.session, db.session)
+
+        def count():
+            session = db.session
+            n = session.query(Component).count()
+            db.remove_session()
+            return session, n
+
+        other, n = in_thread(count)
+        self.assertIsNot(other, db.session)
+        self.assertEqual(n, db.session.query(Component).count())
+
+    def test_switch_session(self):
+
+        db = DB()
+        event = threading.Event()
+        urls = []
+
+        def worker():
+            urls.append(str(db.session.get_bind().url))
+            event.wait()
+            urls.append(str(db.session.get_bind().url))
+            db.remove_session()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        db.switch_session(self.otherpath)
+        event.set()
+        thread.join()
+
+        try:
+            self.assertTrue(urls[0].endswith(self.dbpath))
+            self.assertTrue(urls[1].endswith(self.otherpath))
+            self.assertTrue(str(db.session.get_bind().url).endswith(self.otherpath))
+            self.assertEqual(db.session.query(Component).count(),
+                             in_thread(lambda: db.session.query(Component).count()))
+        finally:
+            db.switch_session(self.dbpath)
+
+    def test_more_threads_than_pool(self):
+
+        db = DB()
+        nthreads = db.engine.pool.size() + 20
+        barrier = threading.Barrier(nthreads, timeout=30)
+        counts = []
+
+        def worker():
+            try:
+                # every thread holds its connection until all have one
+                counts.append(db.session.query(Component).count())
+                barrier.wait()
+            finally:
+                db.remove_session()
+
+        threads = [threading.Thread(target=worker) for _ in range(nthreads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counts, [db.session.query(Component).count()] * nthreads)
+
+    def test_pool_size(self):
+
+        engine = get_engine(self.dbpath, pool_size=3)
+        self.assertEqual(engine.pool.size(), 3)
+        engine.dispose()
+
+
+class TestLoading(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        DB().switch_session(cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        DB().switch_session(DB().dbpath)
+        shutil.rmtree(cls.tmpdir)
+
+    def count_queries(self, func, statements=None, expunge=True):
+        '''Return the number of statements executed by `func`.'''
+
+        db = DB()
+        if expunge:
+            db.session.expunge_all()
+        if statements is None:
+            statements = []
+
+        def before(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before)
+        try:
+            func()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before)
+            if expunge:
+                db.session.expunge_all()
+        return len(statements)
+
+    def list_chemicals(self, loading):
+        for chemical in DB().get_chemicals(showall=True, loading=loading):
+            (chemical.kind, chemical.electrolyte, chemical.physical_form)
+
+    def test_strategies(self):
+
+        joined = self.count_queries(lambda: self.list_chemicals("joined"))
+        selectin = self.count_queries(lambda: self.list_chemicals("selectin"))
+        lazy = self.count_queries(lambda: self.list_chemicals("lazy"))
+        self.assertEqual(joined, 1)
+        self.assertLessEqual(selectin, 4)
+        self.assertGreater(lazy, selectin)
+
+    def test_default(self):
+
+        def list_components():
+            for component in DB().get_components():
+                component.category
+
+        self.assertEqual(DB.loading, "joined")
+        self.assertEqual(self.count_queries(list_components), 1)
+
+    def test_chemical_sources(self):
+
+        db = DB()
+        components = db.session.query(Component).filter(Component.id.in_([1, 3, 4, 5])).all()
+        expected = sorted(set(b.chemical_id for b in db.session.query(Batch).all()
+                              if b.component_id in (1, 3, 4, 5)))
+
+        def count(statements=None):
+            return self.count_queries(lambda: db.get_chemicals(components),
+                                      statements, expunge=False)
+
+        statements = []
+        self.assertEqual(count(statements), 1)
+        self.assertIn("DISTINCT", statements[0])
+        self.assertIn(" IN ", statements[0])
+
+        chemicals = db.get_chemicals(components[::-1])
+        self.assertEqual([c.id for c in chemicals], expected)
+        self.assertEqual(count(), 0)
+
+        bump_catalog_version()
+        self.assertEqual(count(), 1)
+        db.session.expunge(chemicals[0])
+        self.assertEqual(count(), 1)
+        self.assertEqual(len(db.get_chemicals([])), db.session.query(Chemical).count())
+
+    def test_unknown_strategy(self):
+
+        with self.assertRaises(ValueError):
+            get_loader_options(Chemical, "eager")
+
+
+class TestReferenceCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        DB().switch_session(cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        DB().switch_session(DB().dbpath)
+        shutil.rmtree(cls.tmpdir)
+
+    def test_hits_and_misses(self):
+
+        db = DB()
+        db.references.reset_stats()
+        kinds = db.get_kinds()
+        self.assertEqual([k.name for k in kinds], ["mixture", "solution", "reactant"])
+        self.assertIs(db.get_kinds()[0], kinds[0])
+        db.get_electrolytes()
+        self.assertEqual(db.references.cache_info(), (1, 2))
+
+        # other threads have their own sessions and records
+        other = in_thread(lambda: (db.get_kinds(), db.remove_session())[0])
+        self.assertIsNot(other[0], kinds[0])
+        self.assertEqual(db.references.cache_info().misses, 3)
+
+    def test_hits_without_queries(self):
+
+        db = DB()
+        getters = [db.get_kinds, db.get_electrolytes, db.get_physical_forms]
+        for get in getters:
+            get()
+        statements = []
+
+        def before(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before)
+        try:
+            for _ in range(10):
+                for get in getters:
+                    get()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before)
+        self.assertEqual(statements, [])
+
+    def test_invalidation(self):
+
+        db = DB()
+        ncat = len(db.get_categories())
+        db.references.reset_stats()
+        add_category_record(db.session, "reference cache test")
+        categories = db.get_categories()
+        self.assertEqual(len(categories), ncat + 1)
+        self.assertEqual(db.references.cache_info(), (0, 1))
+
+
+class TestSQLiteProfile(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    @staticmethod
+    def get_pragmas(engine, names):
+        with engine.connect() as conn:
+            return [conn.execute(text("PRAGMA {0:s}".format(n))).scalar()
+                    for n in names]
+
+    def test_performance(self):
+
+        engine = get_engine(self.dbpath, "performance")
+        names = ["journal_mode", "synchronous", "cache_size", "temp_store",
+                 "busy_timeout"]
+        self.assertEqual(self.get_pragmas(engine, names),
+                         ["wal", 1, -65536, 2, 5000])
+        engine.dispose()
+
+    def test_custom(self):
+
+        engine = get_engine(self.dbpath, {"cache_size": -1000})
+        self.assertEqual(self.get_pragmas(engine, ["cache_size"]), [-1000])
+        engine.dispose()
+
+    def test_bundled_keeps_journal(self):
+
+        engine = get_engine(DBPATH, "performance")
+        self.assertEqual(self.get_pragmas(engine, ["journal_mode", "synchronous",
+                                                   "busy_timeout"]),
+                         ["delete", 2, 5000])
+        engine.dispose()
+
+    def test_synchronous_without_wal(self):
+
+        engine = get_engine(self.dbpath, {"synchronous": "NORMAL"})
+        self.assertEqual(self.get_pragmas(engine, ["synchronous"]), [2])
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from batchcalc import importer
+from batchcalc.db import DB, get_catalog_version
+from batchcalc.model import Batch, Chemical, Component
+
+from test_batch_calculator import DBPATH
+
+
+CHEMICALS_CSV = """name,formula,molwt,short_name,concentration,kind,electrolyte,physical_form,density
+sodium silicate solution,Na2SiO3,122.06,,0.27,solution,strong base,liquid,1.39
+tetraethyl orthosilicate,Si(OC2H5)4,208.33,TEOS,1.0,reactant,Undefined,liquid,0.933
+unknown kind,X,1.0,,1.0,plasma,,,
+no molwt,Y,,,1.0,mixture,,,
+"""
+
+COMPONENTS_JSONL = """{"name": "germanium dioxide", "formula": "GeO2", "molwt": 104.61, "category": "zeolite"}
+{"name": "gallium oxide", "formula": "Ga2O3", "molwt": "187.44", "category": "zeolite"}
+not json
+{"name": "bad category", "formula": "Z", "molwt": 1.0, "category": "nonexistent"}
+{"name": "no category", "formula": "Z", "molwt": 1.0, "category": "Undefined"}
+"""
+
+
+class TestImporter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        DB().switch_session(cls.dbpath)
+        cls.session = DB().session
+
+    @classmethod
+    def tearDownClass(cls):
+        DB().switch_session(DB().dbpath)
+        shutil.rmtree(cls.tmpdir)
+
+    def test_import_chemicals(self):
+
+        nchem = self.session.query(Chemical).count()
+        version = get_catalog_version()
+        rows = importer.read_rows(io.StringIO(CHEMICALS_CSV), "csv")
+        report = importer.import_rows(self.session, "chemicals", rows, batch_size=1)
+
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual([n for n, _ in report.errors], [3, 4])
+        self.assertIn("unknown kind: plasma", report.errors[0][1])
+        self.assertIn("missing molwt", report.errors[1][1])
+        self.assertEqual(self.session.query(Chemical).count(), nchem + 2)
+        self.assertNotEqual(get_catalog_version(), version)
+
+        teos = self.session.query(Chemical).filter(Chemical.short_name == "TEOS").one()
+        self.assertEqual(teos.kind, "reactant")
+        self.assertEqual(teos.physical_form, "liquid")
+        self.assertIsNone(teos._electrolyte_id)
+        self.assertAlmostEqual(teos.density, 0.933)
+
+    def test_import_components_and_batch(self):
+
+        rows = importer.read_rows(io.StringIO(COMPONENTS_JSONL), "jsonl")
+        report = importer.import_rows(self.session, "components", rows)
+        self.assertEqual(report.inserted, 2)
+        # the category is optional in the model but not in the database
+        self.assertEqual([n for n, _ in report.errors], [3, 4, 5])
+        self.assertIn("NOT NULL", report.errors[2][1])
+
+        gallia = self.session.query(Component).filter(Component.formula == "Ga2O3").one()
+        self.assertEqual(gallia.category, "zeolite")
+
+        links = [{"chemical": "water", "component": "GeO2", "coefficient": 1.0},
+                 {"chemical": "water", "component": "ga2o3", "coefficient": "2"},
+                 {"chemical": "water", "component": "XeO4", "coefficient": 1.0}]
+        report = importer.import_rows(self.session, "batch", links)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.errors, [(3, "unknown component: XeO4")])
+        self.assertEqual(self.session.query(Batch).filter(
+            Batch.component_id == gallia.id).one().coefficient, 2.0)
+
+    def test_rejected_by_database(self):
+
+        values = importer.convert_component(
+            {"name": "ok", "formula": "Ok", "molwt": 1.0, "category": "zeolite"}, importer.ReferenceLookup(self.session))
+        bad = dict(values, formula=None)
+        errors = []
+        inserted = importer.insert_rows(self.session, Component.__table__,
+                                        [(1, values), (2, bad), (3, values)], errors)
+        self.assertEqual(inserted, 2)
+        self.assertEqual([n for n, _ in errors], [2])
+
+    def test_unknown_table(self):
+
+        with self.assertRaises(ValueError):
+            importer.import_rows(self.session, "syntheses", [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from batchcalc import migrations
+
+from test_batch_calculator import DBPATH
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dbpath = os.path.join(self.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, self.dbpath)
+
+        # turn the copy into a database from before the migrations
+        conn = sqlite3.connect(self.dbpath)
+        conn.execute("DROP TABLE IF EXISTS schema_version")
+        for (name,) in conn.execute("SELECT name FROM sqlite_master "
+                                    "WHERE type = 'index' AND name LIKE 'ix_%'").fetchall():
+            conn.execute("DROP INDEX {0:s}".format(name))
+        conn.commit()
+        conn.close()
+
+        self.engine = create_engine("sqlite:///{0:s}".format(self.dbpath))
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def get_indexes(self):
+        conn = sqlite3.connect(self.dbpath)
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master "
+                                            "WHERE type = 'index' AND name LIKE 'ix_%'")]
+        conn.close()
+        return sorted(names)
+
+    def test_upgrade(self):
+
+        self.assertEqual(self.get_indexes(), [])
+        self.assertEqual(migrations.upgrade(self.engine),
+                         [m.version for m in migrations.MIGRATIONS])
+        self.assertEqual(self.get_indexes(),
+                         ["ix_batch_chemical_id", "ix_batch_component_id",
+                          "ix_synthesischemicals_synthesis_id",
+                          "ix_synthesiscomponents_synthesis_id"])
+        with self.engine.connect() as conn:
+            self.assertEqual(migrations.get_schema_version(conn),
+                             migrations.get_latest_version())
+
+        # nothing left to do
+        self.assertEqual(migrations.upgrade(self.engine), [])
+
+    def test_covering_index(self):
+
+        migrations.upgrade(self.engine)
+        conn = sqlite3.connect(self.dbpath)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT chemical_id FROM batch "
+                            "WHERE component_id = 4").fetchall()
+        conn.close()
+        self.assertIn("COVERING INDEX ix_batch_component_id", str(plan))
+
+    def test_bundled_latest(self):
+
+        # the bundled database is never upgraded when opened
+        engine = create_engine("sqlite:///{0:s}".format(DBPATH))
+        with engine.connect() as conn:
+            self.assertEqual(migrations.read_schema_version(conn),
+                             migrations.get_latest_version())
+        engine.dispose()
+
+    def test_duplicate_version(self):
+
+        with self.assertRaises(ValueError):
+            migrations.migration(1, "duplicate")(lambda conn: None)
+
+
+if __name__ == "__main__":
+    unittest.main()
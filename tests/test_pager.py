@@ -0,0 +1,92 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from batchcalc.db import DB
+from batchcalc.model import Synthesis
+from batchcalc.pager import KeysetPager
+
+from test_batch_calculator import DBPATH
+
+
+class TestKeysetPager(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+        # syntheses with repeated and missing temperatures
+        conn = sqlite3.connect(cls.dbpath)
+        conn.executemany("INSERT INTO synthesis (name, temperature) VALUES (?, ?)",
+                         [("synthesis {0:02d}".format(i), None if i % 5 == 0 else float(i % 4))
+                          for i in range(47)])
+        conn.commit()
+        conn.close()
+        DB().switch_session(cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        DB().switch_session(DB().dbpath)
+        shutil.rmtree(cls.tmpdir)
+
+    def all_pages(self, pager, records):
+        pages = [records]
+        while pager.has_next:
+            pages.append(pager.next())
+        return pages
+
+    def check_order(self, column, descending):
+
+        db = DB()
+        pager = KeysetPager(db.query_synthesis_list, Synthesis, page_size=10)
+        pages = self.all_pages(pager, pager.sort(column, descending))
+        ids = [s.id for page in pages for s in page]
+
+        order = [column.desc(), Synthesis.id.desc()] if descending else [column, Synthesis.id]
+        expected = [s.id for s in db.session.query(Synthesis).order_by(*order)]
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(p) for p in pages], [10] * 4 + [8])
+        self.assertEqual(pager.page, 4)
+
+    def test_sort_by_id(self):
+        self.check_order(Synthesis.id, False)
+        self.check_order(Synthesis.id, True)
+
+    def test_sort_with_ties_and_nulls(self):
+        self.check_order(Synthesis.temperature, False)
+        self.check_order(Synthesis.temperature, True)
+        self.check_order(Synthesis.name, True)
+
+    def test_previous(self):
+
+        pager = KeysetPager(DB().query_synthesis_list, Synthesis, page_size=10)
+        first = [s.id for s in pager.first()]
+        self.assertFalse(pager.has_previous)
+        second = [s.id for s in pager.next()]
+        self.assertNotEqual(first, second)
+        self.assertEqual([s.id for s in pager.previous()], first)
+        self.assertEqual([s.id for s in pager.previous()], first)
+        self.assertEqual(pager.page, 0)
+
+    def test_details_loaded_on_demand(self):
+
+        db = DB()
+        db.session.expunge_all()
+        pager = KeysetPager(db.query_synthesis_list, Synthesis, page_size=5)
+        record = pager.first()[0]
+        self.assertNotIn("components", record.__dict__)
+        self.assertNotIn("stirring", record.__dict__)
+
+        synthesis = db.get_synthesis(record.id)
+        self.assertIs(synthesis, record)
+        self.assertEqual(len(synthesis.components), 5)
+        self.assertIn("components", synthesis.__dict__)
+        self.assertTrue(all("component" in c.__dict__ for c in synthesis.components))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import batchcalc
+from batchcalc.calculator import BatchCalculator
+from batchcalc.model import Chemical, Component
+from batchcalc.recipe import Recipe
+
+from test_batch_calculator import DBPATH, get_test_session
+
+
+REFMASSES = [40.81333673, 163.94022, 1802.529, 8997.77613327]
+
+
+class TestRecipe(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+        session = get_test_session(cls.dbpath)
+        comps = dict((c.id, c) for c in session.query(Component))
+        chems = dict((c.id, c) for c in session.query(Chemical))
+        cls.bc = BatchCalculator()
+        cls.bc.components = [comps[i] for i in (1, 3, 4, 5)]
+        cls.bc.chemicals = [chems[i] for i in (1, 3, 9, 10)]
+        cls.recipe = cls.bc.compile_recipe(session)
+        cls.kinds = tuple(c.kind for c in cls.bc.chemicals)
+        session.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_apply(self):
+
+        masses = self.recipe.apply([1.5, 1.0, 30.0, 500.0])
+        self.assertEqual(masses.shape, (4,))
+        np.testing.assert_allclose(masses, REFMASSES)
+
+    def test_apply_many(self):
+
+        moles = np.array([[1.5, 1.0, 30.0, 500.0],
+                          [1.5, 1.0, 20.0, 250.0]])
+        masses = self.recipe.apply(moles)
+        self.assertEqual(masses.shape, (2, 4))
+        np.testing.assert_allclose(masses[0], REFMASSES)
+        np.testing.assert_allclose(masses[1], self.recipe.apply(moles[1]))
+
+    def test_wrong_shape(self):
+
+        self.assertRaises(ValueError, self.recipe.apply, [1.0, 2.0])
+
+    def test_labels(self):
+
+        self.assertEqual(len(self.recipe.components), 4)
+        self.assertEqual(len(self.recipe.chemicals), 4)
+        self.assertEqual(self.recipe.kinds, self.kinds)
+
+    def test_immutable(self):
+
+        with self.assertRaises(AttributeError):
+            self.recipe.molwt = None
+        with self.assertRaises(ValueError):
+            self.recipe.operator[0, 0] = 1.0
+
+    def test_pickle(self):
+
+        recipe = pickle.loads(pickle.dumps(self.recipe))
+        np.testing.assert_allclose(recipe.apply([1.5, 1.0, 30.0, 500.0]),
+                                   REFMASSES)
+        self.assertEqual(recipe.chemicals, self.recipe.chemicals)
+
+    def test_npz(self):
+
+        path = os.path.join(self.tmpdir, 'recipe.npz')
+        self.recipe.to_npz(path)
+        recipe = Recipe.from_npz(path)
+        np.testing.assert_allclose(recipe.apply([1.5, 1.0, 30.0, 500.0]),
+                                   REFMASSES)
+        np.testing.assert_array_equal(recipe.densities, self.recipe.densities)
+        self.assertEqual(recipe.components, self.recipe.components)
+        self.assertEqual(recipe.kinds, self.recipe.kinds)
+
+    def test_no_database_modules(self):
+
+        code = ("import sys, batchcalc.recipe; "
+                "print('sqlalchemy' in sys.modules)")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(batchcalc.__file__)))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(out.strip(), b'False')
+
+
+if __name__ == "__main__":
+    unittest.main()
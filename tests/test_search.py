@@ -0,0 +1,129 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from batchcalc import search
+from batchcalc.db import (DB, add_chemical_record, delete_chemical_record,
+                          modify_chemical_record)
+from batchcalc.model import Chemical, Component, Synthesis
+
+from test_batch_calculator import DBPATH
+
+
+class TestSearch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+        DB().switch_session(cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        DB().switch_session(DB().dbpath)
+        shutil.rmtree(cls.tmpdir)
+
+    def names(self, model, keywords):
+        return [r.name for r in DB().search(model, keywords)]
+
+    def test_match_query(self):
+
+        self.assertEqual(search.get_match_query("7732-18"), '"7732"* "18"*')
+        self.assertEqual(search.get_match_query('na"OH'), '"na"* "OH"*')
+        self.assertEqual(search.get_match_query("  "), "")
+
+    def test_prefixes(self):
+
+        self.assertEqual(self.names(Chemical, "sod hydr"), ["sodium hydroxide"])
+        self.assertEqual(self.names(Chemical, "7732-18"), ["water"])
+        self.assertIn("fumed silica", self.names(Chemical, "SILIC"))
+        self.assertEqual(self.names(Component, "alumin"), ["aluminium oxide"])
+        self.assertEqual(self.names(Synthesis, "zsm"), ["ZSM-22"])
+        self.assertEqual(len(self.names(Chemical, "")), DB().session.query(Chemical).count())
+        self.assertEqual(self.names(Chemical, "unobtainium"), [])
+
+    def test_ranking(self):
+
+        # name matches weigh more than SMILES matches
+        db = DB()
+        add_chemical_record(db.session, {"name": "ranking test", "formula": "X",
+                                         "molwt": 1.0, "kind": "reactant",
+                                         "smiles": "zzrank"})
+        add_chemical_record(db.session, {"name": "zzrank", "formula": "X",
+                                         "molwt": 1.0, "kind": "reactant"})
+        self.assertEqual(self.names(Chemical, "zzra"), ["zzrank", "ranking test"])
+        self.assertEqual(len(db.search(Chemical, "zzra", limit=1)), 1)
+
+    def test_triggers(self):
+
+        db = DB()
+        add_chemical_record(db.session, {"name": "trigger test", "formula": "Qx2",
+                                         "molwt": 1.0, "kind": "reactant"})
+        chemical = db.search(Chemical, "qx2")[0]
+        modify_chemical_record(db.session, chemical.id,
+                               {"name": "renamed test", "formula": "Qx2",
+                                "molwt": 1.0, "kind": "reactant"})
+        self.assertEqual(self.names(Chemical, "trigger"), [])
+        self.assertEqual(self.names(Chemical, "renamed"), ["renamed test"])
+        delete_chemical_record(db.session, chemical.id)
+        self.assertEqual(self.names(Chemical, "qx2"), [])
+
+    def test_without_index(self):
+
+        dbpath = os.path.join(self.tmpdir, 'nofts.db')
+        shutil.copy(self.dbpath, dbpath)
+        conn = sqlite3.connect(dbpath)
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute("DROP TRIGGER {0:s}".format(name))
+        conn.execute("DROP TABLE chemicals_fts")
+        conn.commit()
+        conn.close()
+
+        # a plain engine, so that opening the database does not restore the index
+        engine = create_engine("sqlite:///{0:s}".format(dbpath))
+        session = sessionmaker(bind=engine)()
+        self.assertFalse(search.has_index(session, Chemical))
+        query = search.search(session.query(Chemical), Chemical, "silic")
+        self.assertEqual([c.name for c in query.all()],
+                         ["colloidal silica AM-30", "colloidal silica HS-40", "fumed silica"])
+        session.close()
+        engine.dispose()
+
+    def test_without_fts5(self):
+
+        # the index shipped in a database opened with SQLite without FTS5
+        dbpath = os.path.join(self.tmpdir, 'nofts5.db')
+        shutil.copy(self.dbpath, dbpath)
+        db = DB()
+        search.FTS5 = False
+        try:
+            db.switch_session(dbpath)
+            conn = sqlite3.connect(dbpath)
+            triggers = [r[0] for r in conn.execute("SELECT name FROM sqlite_master "
+                                                   "WHERE type = 'trigger' AND name LIKE '%_fts_%'")]
+            conn.close()
+            self.assertEqual(triggers, [])
+            self.assertFalse(search.has_index(db.session, Chemical))
+
+            add_chemical_record(db.session, {"name": "no fts test", "formula": "Qy2",
+                                             "molwt": 1.0, "kind": "reactant"})
+            chemical = db.search(Chemical, "qy2")[0]
+            modify_chemical_record(db.session, chemical.id,
+                                   {"name": "no fts renamed", "formula": "Qy2",
+                                    "molwt": 1.0, "kind": "reactant"})
+            self.assertEqual(self.names(Chemical, "fts ren"), ["no fts renamed"])
+            delete_chemical_record(db.session, chemical.id)
+            self.assertEqual(self.names(Chemical, "qy2"), [])
+        finally:
+            search.FTS5 = None
+            db.switch_session(self.dbpath)
+
+
+if __name__ == "__main__":
+    unittest.main()
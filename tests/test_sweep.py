@@ -0,0 +1,111 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from batchcalc.calculator import BatchCalculator
+from batchcalc.model import Chemical, Component
+from batchcalc.sweep import CompositionSweep, parse_sweep, parse_values
+
+from test_batch_calculator import DBPATH, get_test_session
+
+
+class TestParseSweep(unittest.TestCase):
+
+    def test_range(self):
+        np.testing.assert_allclose(parse_values("10..60 step 2"),
+                                   np.arange(10.0, 61.0, 2.0))
+
+    def test_range_default_step(self):
+        np.testing.assert_allclose(parse_values("1..3"), [1.0, 2.0, 3.0])
+
+    def test_list(self):
+        np.testing.assert_allclose(parse_values("1, 1.5 2"), [1.0, 1.5, 2.0])
+
+    def test_sweep(self):
+        axes = parse_sweep("SiO2: 10..60 step 2, H2O: 100..600 step 50, Na2O: 1, 1.5")
+        self.assertEqual(list(axes.keys()), ["SiO2", "H2O", "Na2O"])
+        self.assertEqual([len(v) for v in axes.values()], [26, 11, 2])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, parse_sweep, "SiO2 10..60")
+        self.assertRaises(ValueError, parse_values, "60..10")
+
+
+class TestCompositionSweep(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmpdir, 'zeolite.db')
+        shutil.copy(DBPATH, cls.dbpath)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.session = get_test_session(self.dbpath)
+        comps = dict((c.id, c) for c in self.session.query(Component))
+        chems = dict((c.id, c) for c in self.session.query(Chemical))
+        self.bc = BatchCalculator()
+        self.bc.components = [comps[i] for i in (1, 3, 4, 5)]
+        self.bc.chemicals = [chems[i] for i in (1, 3, 9, 10)]
+        self.sweep = CompositionSweep(self.bc, "SiO2: 10..60 step 10, H2O: 100..500 step 100",
+                                      base="1.5 Na2O : 1 Al2O3", chunksize=7)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_compositions(self):
+        self.assertEqual(len(self.sweep), 30)
+        moles = self.sweep.compositions()
+        self.assertEqual(moles.shape, (30, 4))
+        np.testing.assert_allclose(moles[6], [1.5, 1.0, 20.0, 200.0])
+
+    def test_run(self):
+        rows = np.vstack(list(self.sweep.run(self.session)))
+        # water is the only liquid
+        self.assertEqual(rows.shape, (30, 4 + 4 + 1))
+        ref = self.bc.calculate_masses_many(self.session, rows[:, :4])
+        np.testing.assert_allclose(rows[:, 4:8], ref)
+        np.testing.assert_allclose(rows[:, 8], ref[:, 3] / 0.997)
+
+    def test_run_parallel(self):
+        serial = np.vstack(list(self.sweep.run(self.session)))
+        parallel = np.vstack(list(self.sweep.run(self.session, workers=2)))
+        np.testing.assert_allclose(parallel, serial)
+
+    def test_to_csv(self):
+        out = io.StringIO()
+        self.assertEqual(self.sweep.to_csv(self.session, out), 30)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 31)
+        self.assertEqual(lines[0].split(',')[:4],
+                         ["sodium oxide", "aluminium oxide", "silicone dioxide", "water"])
+
+    def test_to_csv_parallel(self):
+        serial, parallel = io.StringIO(), io.StringIO()
+        self.sweep.to_csv(self.session, serial)
+        self.assertEqual(self.sweep.to_csv(self.session, parallel, workers=2), 30)
+        self.assertEqual(parallel.getvalue(), serial.getvalue())
+
+    def test_to_npy_parallel(self):
+        path = os.path.join(self.tmpdir, 'parallel.npy')
+        self.assertEqual(self.sweep.to_npy(self.session, path, workers=2), 30)
+        ref = np.vstack(list(self.sweep.run(self.session)))
+        np.testing.assert_allclose(np.load(path), ref)
+
+    def test_to_npy(self):
+        path = os.path.join(self.tmpdir, 'sweep.npy')
+        self.assertEqual(self.sweep.to_npy(self.session, path), 30)
+        data = np.load(path)
+        ref = np.vstack(list(self.sweep.run(self.session)))
+        np.testing.assert_allclose(data, ref)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+'''
+Benchmark of the loading strategies of the DB listing methods (see
+batchcalc.db.LOADERS) on copies of the bundled database extended with a
+growing number of chemicals, components and batch links. For each listing
+the number of SQL statements and the time needed to read all the columns
+displayed by the AddModify*TableFrame windows are reported. Joined loading
+needs a single statement whatever the number of rows, select-in loading adds
+one statement per relationship and up to 500 related records.
+
+Usage:
+
+    python utils/bench_loading.py [--rows N [N ...]] [--repeat N] [strategy ...]
+'''
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from sqlalchemy import event
+
+from batchcalc import db as dbm
+from batchcalc import importer
+from batchcalc.utils import get_resource_path
+
+from bench_sqlite import LISTINGS, list_records
+
+
+def add_records(db, nrows):
+    '''
+    Import `nrows` chemicals, components and batch links between them.
+    '''
+
+    session = db.session
+    importer.import_rows(session, "chemicals", (
+        {"name": "bench chemical {0:d}".format(i), "formula": "X", "molwt": 1.0,
+         "kind": "reactant", "physical_form": "solid"} for i in range(nrows)))
+    importer.import_rows(session, "components", (
+        {"name": "bench component {0:d}".format(i), "formula": "X{0:d}".format(i),
+         "molwt": 1.0, "category": "zeolite"} for i in range(nrows)))
+    importer.import_rows(session, "batch", (
+        {"chemical": "bench chemical {0:d}".format(i),
+         "component": "X{0:d}".format(i), "coefficient": 1.0} for i in range(nrows)))
+
+
+def count_statements(db, method, cols):
+    '''Return the number of statements executed by the listing.'''
+
+    statements = []
+
+    def before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before)
+    try:
+        list_records(db, method, cols)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before)
+    return len(statements)
+
+
+def run(nrows, strategies, repeat):
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        dbpath = os.path.join(tmpdir, 'zeolite.db')
+        shutil.copy(get_resource_path('data', 'zeolite.db'), dbpath)
+        db = dbm.DB()
+        db.switch_session(dbpath)
+        add_records(db, nrows)
+
+        results = []
+        for name, method, cols in LISTINGS:
+            if name not in ("batches", "chemicals", "components"):
+                continue
+            row = []
+            for strategy in strategies:
+                db.loading = strategy
+                nstat = count_statements(db, method, cols)
+                time = min(timeit.repeat(lambda: list_records(db, method, cols),
+                                         number=1, repeat=repeat))
+                row.append((nstat, time))
+            results.append((name, row))
+        del db.loading
+        db.remove_session()
+        db.engine.dispose()
+        return results
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("strategies", nargs="*",
+                        default=["lazy", "joined", "selectin"])
+    parser.add_argument("--rows", type=int, nargs="+", default=[0, 100, 1000, 5000],
+                        help="numbers of records added to each table")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of repetitions of the listings")
+    args = parser.parse_args()
+
+    print("{0:<24s}".format("") +
+          "".join("{0:>22s}".format(s) for s in args.strategies))
+    for nrows in args.rows:
+        for name, row in run(nrows, args.strategies, args.repeat):
+            print("{0:<24s}".format("{0:s} +{1:d}".format(name, nrows)) +
+                  "".join("{0:>8d} stmts {1:>8.1f}ms".format(n, 1000.0 * t)
+                          for n, t in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+'''
+Benchmark of the SQLite profiles (see batchcalc.db.SQLITE_PROFILES) on a
+copy of the bundled database:
+
+    * bulk import - records added one at a time with a commit each, as done
+      by the add_*_record functions behind the GUI dialogs
+    * listings - the queries of the AddModify*TableFrame windows, touching
+      every attribute displayed in their columns
+
+Usage:
+
+    python utils/bench_sqlite.py [--records N] [--repeat N] [profile ...]
+'''
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from batchcalc import db as dbm
+from batchcalc.utils import COLUMNS, get_resource_path
+
+# listing method of DB and the columns of the frame using it
+LISTINGS = [
+    ("batches", "get_batches", ["id", "chemical", "component", "coeff", "reaction"]),
+    ("chemicals", "get_chemicals", ["id", "name", "formula", "conc", "molwt",
+                                    "short", "kind", "physform", "elect", "cas",
+                                    "pk", "density", "smiles"]),
+    ("components", "get_components", ["id", "name", "formula", "molwt", "short",
+                                      "category"]),
+    ("categories", "get_categories", ["id", "categobj"]),
+    ("reactions", "get_reactions", ["id", "reaction"]),
+    ("syntheses", "get_syntheses", ["id", "name", "target", "laborant",
+                                    "reference", "temperature", "descr"]),
+]
+
+
+def list_records(db, method, cols):
+    '''Run the listing query and read all the displayed values.'''
+
+    if method == "get_chemicals":
+        records = db.get_chemicals(showall=True)
+    else:
+        records = getattr(db, method)()
+    getters = [COLUMNS[c]["valueGetter"] for c in cols]
+    for record in records:
+        for getter in getters:
+            value = getattr(record, getter)
+            if callable(value):
+                value()
+    # drop the loaded objects to measure the queries and not the identity map
+    db.session.expunge_all()
+    return len(records)
+
+
+def bulk_import(db, nrecords):
+    '''Add `nrecords` category records, each in its own transaction.'''
+
+    for i in range(nrecords):
+        dbm.add_category_record(db.session, "benchmark category {0:d}".format(i))
+
+
+def run(profile, nrecords, repeat):
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        dbpath = os.path.join(tmpdir, 'zeolite.db')
+        shutil.copy(get_resource_path('data', 'zeolite.db'), dbpath)
+        db = dbm.DB()
+        db.switch_session(dbpath, profile=profile)
+
+        results = [("import {0:d} records".format(nrecords),
+                    timeit.timeit(lambda: bulk_import(db, nrecords), number=1))]
+        for name, method, cols in LISTINGS:
+            time = min(timeit.repeat(lambda: list_records(db, method, cols),
+                                     number=1, repeat=repeat))
+            results.append(("list {0:s}".format(name), time))
+        db.remove_session()
+        db.engine.dispose()
+        return results
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("profiles", nargs="*",
+                        default=sorted(dbm.SQLITE_PROFILES.keys()))
+    parser.add_argument("--records", type=int, default=500,
+                        help="number of records to import")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of repetitions of the listings")
+    args = parser.parse_args()
+
+    timings = [(profile, run(profile, args.records, args.repeat))
+               for profile in args.profiles]
+
+    print("{0:<24s}".format("") + "".join("{0:>14s}".format(p) for p, _ in timings))
+    for i, (label, _) in enumerate(timings[0][1]):
+        print("{0:<24s}".format(label) +
+              "".join("{0:>12.2f}ms".format(1000.0 * t[i][1]) for _, t in timings))
+
+
+if __name__ == "__main__":
+    main()